@@ -1,7 +1,9 @@
 from pymongo.errors import OperationFailure
 from raven.contrib.django.raven_compat.models import sentry_exception_handler
 
+from framework.mongo import handlers as mongo_handlers
 from framework.transactions import commands, messages, utils
+from website import settings
 
 from flask import _app_ctx_stack, Flask
 
@@ -67,12 +69,20 @@ class FlaskRequestMiddleware(object):
         ## Called on every request, so self.flask_ctx should always be defined
         self.flask_ctx = dummy_app.test_request_context()
         self.flask_ctx.push()
+        if settings.DB_POOLED_CLIENT:
+            mongo_handlers.connection_before_request()
 
     def process_exception(self, request, exception):
         if _app_ctx_stack.top is not None:
+            self._release_client()
             self.flask_ctx.pop()
 
     def process_response(self, request, response):
         if _app_ctx_stack.top is not None:
+            self._release_client()
             self.flask_ctx.pop()
         return response
+
+    def _release_client(self):
+        if settings.DB_POOLED_CLIENT:
+            mongo_handlers.connection_teardown_request()
@@ -55,7 +55,11 @@ class NodeList(generics.ListCreateAPIView, ODMFilterMixin):
         user = self.request.user
         permission_query = Q('is_public', 'eq', True)
         if not user.is_anonymous():
-            permission_query = (Q('is_public', 'eq', True) | Q('contributors', 'icontains', user._id))
+            permission_query = (
+                Q('is_public', 'eq', True) |
+                Q('contributors', 'icontains', user._id) |
+                Q('inherited_admin_ids', 'eq', user._id)
+            )
 
         query = base_query & permission_query
         return query
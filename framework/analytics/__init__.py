@@ -2,10 +2,15 @@
 # encoding: utf-8
 
 import functools
+import collections
 from datetime import datetime
 
 from framework.mongo import database
 from framework.sessions import session
+from framework.analytics.sketch import BloomFilter
+from framework.analytics.buffer import page_counter_buffer, write_page_counters
+
+from website import settings
 
 from flask import request
 
@@ -13,16 +18,16 @@ from flask import request
 collection = database['pagecounters']
 
 
-def increment_user_activity_counters(user_id, action, date, db=None):
+def increment_user_activity_counters(user_id, action, date, amount=1, db=None):
     db = db or database  # default to local proxy
     collection = database['useractivitycounters']
     date = date.strftime('%Y/%m/%d')
     query = {
         '$inc': {
-            'total': 1,
-            'date.{0}.total'.format(date): 1,
-            'action.{0}.total'.format(action): 1,
-            'action.{0}.date.{1}'.format(action, date): 1,
+            'total': amount,
+            'date.{0}.total'.format(date): amount,
+            'action.{0}.total'.format(action): amount,
+            'action.{0}.date.{1}'.format(action, date): amount,
         }
     }
     collection.update(
@@ -45,6 +50,139 @@ def get_total_activity_count(user_id, db=None):
     return 0
 
 
+def increment_node_log_counters(node_id, user_id=None, amount=1, db=None):
+    """Add ``amount`` to the number of logs of a node, in total and for the
+    user who created the logs.
+    """
+    db = db or database
+    collection = db['nodelogcounters']
+    increments = {'total': amount}
+    if user_id:
+        increments['users.{0}'.format(user_id)] = amount
+    collection.update(
+        {'_id': node_id},
+        {'$inc': increments},
+        upsert=True,
+        manipulate=False,
+    )
+
+
+def copy_node_log_counters(source_id, target_id, db=None):
+    """Add the log counts of node ``source_id`` to those of ``target_id``,
+    e.g. when a fork shares the history of its original.
+    """
+    db = db or database
+    collection = db['nodelogcounters']
+    source = collection.find_one({'_id': source_id})
+    if not source:
+        return
+    increments = {'total': source.get('total', 0)}
+    for user_id, count in source.get('users', {}).items():
+        increments['users.{0}'.format(user_id)] = count
+    collection.update(
+        {'_id': target_id},
+        {'$inc': increments},
+        upsert=True,
+        manipulate=False,
+    )
+
+
+def insert_node_log_counters(counters, db=None):
+    """Store the log counts of new nodes with a single bulk insert.
+
+    :param dict counters: Mapping of node ids to dictionaries with the total
+        number of logs under ``'total'`` and counts per user id under
+        ``'users'``, as returned by `get_node_log_counters`
+    """
+    if not counters:
+        return
+    db = db or database
+    collection = db['nodelogcounters']
+    collection.insert(
+        [
+            {'_id': node_id, 'total': counts['total'], 'users': counts['users']}
+            for node_id, counts in counters.items()
+        ],
+        manipulate=False,
+    )
+
+
+def get_node_log_counters(node_ids, db=None):
+    """Return the log counts of ``node_ids`` with a single query.
+
+    :return dict: Mapping of node ids to dictionaries with the total number of
+        logs under ``'total'`` and counts per user id under ``'users'``
+    """
+    db = db or database
+    collection = db['nodelogcounters']
+    return {
+        result['_id']: {
+            'total': result.get('total', 0),
+            'users': result.get('users', {}),
+        }
+        for result in collection.find({'_id': {'$in': list(node_ids)}})
+    }
+
+
+def get_node_log_counts(node_id, user_id=None, db=None):
+    """Return the total number of logs of a node and the number created by
+    ``user_id``.
+    """
+    counters = get_node_log_counters([node_id], db=db).get(node_id)
+    if not counters:
+        return 0, 0
+    return counters['total'], counters['users'].get(user_id, 0)
+
+
+def update_cocontributor_counts(before, after, db=None):
+    """Update the number of nodes each pair of users contributes to together,
+    after the contributors of a node change from ``before`` to ``after``.
+
+    :param before: Ids of the node's previous contributors
+    :param after: Ids of the node's current contributors
+    """
+    db = db or database
+    collection = db['cocontributorcounters']
+    before, after = set(before), set(after)
+    increments = collections.defaultdict(dict)
+    for user_id in after - before:
+        for other_id in after - {user_id}:
+            increments[user_id][other_id] = 1
+            increments[other_id][user_id] = 1
+    for user_id in before - after:
+        for other_id in before - {user_id}:
+            increments[user_id][other_id] = -1
+            increments[other_id][user_id] = -1
+    for user_id, counts in increments.items():
+        collection.update(
+            {'_id': user_id},
+            {'$inc': {
+                'counts.{0}'.format(other_id): amount
+                for other_id, amount in counts.items()
+            }},
+            upsert=True,
+            manipulate=False,
+        )
+
+
+def get_cocontributor_counts(user_id, db=None):
+    """Return the number of nodes ``user_id`` contributes to together with each
+    other user, with a single query.
+
+    :return dict: Mapping of user ids to numbers of shared nodes
+    """
+    db = db or database
+    collection = db['cocontributorcounters']
+    result = collection.find_one({'_id': user_id}, {'counts': 1})
+    if not result:
+        return {}
+    return {
+        other_id: count
+        for other_id, count in result.get('counts', {}).items()
+        if count > 0
+    }
+
+
 def clean_page(page):
     return page.replace(
         '.', '_'
@@ -79,7 +217,6 @@ def update_counter(page, db=None):
     :param db: MongoDB database or `None`
     """
     db = db or database
-    collection = db['pagecounters']
 
     date = datetime.utcnow()
     date = date.strftime('%Y/%m/%d')
@@ -88,33 +225,29 @@ def update_counter(page, db=None):
 
     d = {'$inc': {}}
 
+    # Pages visited by this session are kept in fixed-size Bloom filters;
+    # the session is only modified on the first visit to a page
     visited_by_date = session.data.get('visited_by_date')
-    if not visited_by_date:
-        visited_by_date = {'date': date, 'pages': []}
-
-    if date == visited_by_date['date']:
-        if page not in visited_by_date['pages']:
-            d['$inc']['date.%s.unique' % date] = 1
-            visited_by_date['pages'].append(page)
-            session.data['visited_by_date'] = visited_by_date
-    else:
-        visited_by_date['date'] = date
-        visited_by_date['pages'] = []
+    if not visited_by_date or visited_by_date['date'] != date:
+        visited_by_date = {'date': date, 'pages': None}
+
+    visited_today = BloomFilter.load(visited_by_date['pages'])
+    if visited_today.add(page):
         d['$inc']['date.%s.unique' % date] = 1
-        visited_by_date['pages'].append(page)
+        visited_by_date['pages'] = visited_today.dump()
         session.data['visited_by_date'] = visited_by_date
 
     d['$inc']['date.%s.total' % date] = 1
 
-    visited = session.data.get('visited')  # '/project/x/, project/y/'
-    if not visited:
-        visited = []
-    if page not in visited:
+    visited = BloomFilter.load(session.data.get('visited'))
+    if visited.add(page):
         d['$inc']['unique'] = 1
-        visited.append(page)
-        session.data['visited'] = visited
+        session.data['visited'] = visited.dump()
     d['$inc']['total'] = 1
-    collection.update({'_id': page}, d, True, False)
+    if settings.ANALYTICS_BUFFER_PAGE_COUNTERS:
+        page_counter_buffer.add(page, d['$inc'])
+    else:
+        write_page_counters({page: d['$inc']}, db=db)
 
 
 def update_counters(rex, db=None):
@@ -142,15 +275,17 @@ def get_basic_counters(page, db=None):
     unique = 0
     total = 0
     collection = database['pagecounters']
+    page = clean_page(page)
     result = collection.find_one(
-        {'_id': clean_page(page)},
+        {'_id': page},
         {'total': 1, 'unique': 1}
     )
-    if result:
-        if 'unique' in result:
-            unique = result['unique']
-        if 'total' in result:
-            total = result['total']
+    # Include increments buffered by this process but not yet written
+    pending = page_counter_buffer.pending(page)
+    if result or pending:
+        result = result or {}
+        unique = result.get('unique', 0) + pending['unique']
+        total = result.get('total', 0) + pending['total']
         return unique, total
     else:
         return None, None
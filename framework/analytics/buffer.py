@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""In-process buffer for page counter increments. Increments for the same
+page are summed in memory and written to `pagecounters` in one batch by a
+background thread, every `ANALYTICS_BUFFER_FLUSH_INTERVAL` seconds, when the
+buffer holds `ANALYTICS_BUFFER_MAX_PAGES` pages, or when the process exits.
+Increments buffered when a process is killed without exiting are lost; the
+flush interval bounds how many.
+"""
+
+import os
+import atexit
+import logging
+import threading
+import collections
+
+from framework.mongo import database
+from framework.mongo.handlers import pooled_client
+
+from website import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def write_page_counters(counters, db=None):
+    """Apply summed increments to `pagecounters`.
+
+    :param dict counters: Mapping of page keys to mappings of counter fields
+        to increments
+    :param db: MongoDB database or `None`
+    """
+    db = db or database
+    collection = db['pagecounters']
+    if hasattr(collection, 'initialize_unordered_bulk_op'):
+        bulk = collection.initialize_unordered_bulk_op()
+        for page, increments in counters.items():
+            bulk.find({'_id': page}).upsert().update({'$inc': dict(increments)})
+        bulk.execute()
+    else:
+        # pymongo < 2.7 has no bulk write API
+        for page, increments in counters.items():
+            collection.update({'_id': page}, {'$inc': dict(increments)}, True, False)
+
+
+def get_flush_database():
+    """Return the database through the process-wide client rather than the
+    client attached to the current request, so that buffered writes do not
+    run on a request's pinned socket or inside its transaction.
+    """
+    return pooled_client.get()[settings.DB_NAME]
+
+
+class CounterBuffer(object):
+    """Sum page counter increments in memory. A daemon thread, started on
+    first use in each process, writes them every ``interval`` seconds, or
+    as soon as the buffer holds ``max_pages`` pages, so writes never happen
+    inside the request that added the increments. Increments that cannot be
+    written are put back into the buffer and retried by the next flush.
+    """
+    def __init__(self, max_pages=None, interval=None):
+        self.max_pages = max_pages or settings.ANALYTICS_BUFFER_MAX_PAGES
+        self.interval = interval or settings.ANALYTICS_BUFFER_FLUSH_INTERVAL
+        self._lock = threading.Lock()
+        self._full = threading.Event()
+        self._pending = collections.defaultdict(collections.Counter)
+        self._flusher = None
+        self._pid = os.getpid()
+
+    def add(self, page, increments):
+        """Buffer ``increments`` for ``page``, waking the flusher if the
+        buffer is full.
+        """
+        self._ensure_flusher()
+        with self._lock:
+            self._pending[page].update(increments)
+            full = len(self._pending) >= self.max_pages
+        if full:
+            self._full.set()
+
+    def _check_fork(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            # Forked: increments inherited from the parent are written by
+            # the parent, and its lock and thread are not usable here
+            self._lock = threading.Lock()
+            self._full = threading.Event()
+            self._pending = collections.defaultdict(collections.Counter)
+            self._flusher = None
+            self._pid = pid
+
+    def _ensure_flusher(self):
+        self._check_fork()
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._run,
+                    name='page-counter-flusher',
+                )
+                self._flusher.daemon = True
+                self._flusher.start()
+
+    def _run(self):
+        while True:
+            self._full.wait(self.interval)
+            self._full.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not flush page counters')
+
+    def pending(self, page):
+        """Return increments for ``page`` that have not been written yet."""
+        with self._lock:
+            return collections.Counter(self._pending.get(page, {}))
+
+    def drain(self):
+        self._check_fork()
+        with self._lock:
+            pending = self._pending
+            self._pending = collections.defaultdict(collections.Counter)
+        return {page: dict(increments) for page, increments in pending.items()}
+
+    def restore(self, counters):
+        """Put drained ``counters`` back into the buffer."""
+        with self._lock:
+            for page, increments in counters.items():
+                self._pending[page].update(increments)
+
+    def flush(self, db=None):
+        """Write all buffered increments, or hand them to a Celery task if
+        `ANALYTICS_FLUSH_WITH_CELERY` is set. On error, the increments are
+        put back into the buffer before the error is raised.
+        """
+        counters = self.drain()
+        if not counters:
+            return
+        try:
+            if settings.ANALYTICS_FLUSH_WITH_CELERY:
+                from framework.analytics.tasks import flush_page_counters
+                if settings.USE_CELERY:
+                    flush_page_counters.delay(counters)
+                else:
+                    flush_page_counters(counters)
+            else:
+                write_page_counters(counters, db=db or get_flush_database())
+        except Exception:
+            self.restore(counters)
+            raise
+
+
+page_counter_buffer = CounterBuffer()
+
+
+@atexit.register
+def flush_on_exit():
+    try:
+        page_counter_buffer.flush()
+    except Exception:
+        logger.exception('Could not flush page counters on exit')
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Fixed-size Bloom filter used to remember which pages a session has
+visited. The filter is stored in the session as a base64 string, so its size
+does not grow with the number of pages visited. False positives cause a
+small fraction of first visits to be counted as repeat visits.
+"""
+
+import math
+import base64
+import struct
+import hashlib
+
+from website import settings
+
+
+class BloomFilter(object):
+    """Bloom filter sized to hold ``capacity`` items with a false positive
+    rate of at most ``error_rate``. Once more items have been added, the
+    fraction of set bits exceeds its expected value at capacity and the
+    filter is cleared before the next item is added, so that the false
+    positive rate stays bounded; items added before the reset are then
+    counted again once.
+
+    :param int capacity: Number of items the filter is sized for
+    :param float error_rate: False positive rate at ``capacity``
+    """
+    def __init__(self, capacity=None, error_rate=None, bits=None):
+        self.capacity = capacity or settings.ANALYTICS_VISITED_FILTER_CAPACITY
+        self.error_rate = error_rate or settings.ANALYTICS_VISITED_FILTER_ERROR_RATE
+        size = -self.capacity * math.log(self.error_rate) / math.log(2) ** 2
+        self.size = int(math.ceil(size / 8)) * 8
+        self.hashes = max(1, int(round(float(self.size) / self.capacity * math.log(2))))
+        self.max_fill = 1 - math.exp(-float(self.hashes) * self.capacity / self.size)
+        self.bits = bits if bits is not None else bytearray(self.size // 8)
+
+    @classmethod
+    def load(cls, value):
+        """Build a filter from a value stored in the session: a string
+        produced by `dump`, or a list of pages from the previous
+        representation. Filters dumped with a different size are discarded.
+        """
+        if isinstance(value, list):
+            bloom = cls()
+            for item in value:
+                bloom.add(item)
+            return bloom
+        if value:
+            bits = bytearray(base64.b64decode(value))
+            bloom = cls()
+            if len(bits) == len(bloom.bits):
+                bloom.bits = bits
+            return bloom
+        return cls()
+
+    def dump(self):
+        return base64.b64encode(bytes(self.bits))
+
+    def fill_ratio(self):
+        """Return the fraction of bits that are set."""
+        return sum(bin(byte).count('1') for byte in self.bits) / float(self.size)
+
+    def clear(self):
+        self.bits = bytearray(self.size // 8)
+
+    def _positions(self, item):
+        if isinstance(item, unicode):
+            item = item.encode('utf-8')
+        # Derive the hash positions from two halves of one digest
+        first, second = struct.unpack('<QQ', hashlib.md5(item).digest())
+        return [
+            (first + index * second) % self.size
+            for index in range(self.hashes)
+        ]
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position // 8] & (1 << (position % 8))
+            for position in self._positions(item)
+        )
+
+    def add(self, item):
+        """Add ``item`` to the filter, clearing the filter first if it holds
+        more items than its capacity.
+
+        :return bool: Whether ``item`` was not already in the filter
+        """
+        if item in self:
+            return False
+        if self.fill_ratio() > self.max_fill:
+            self.clear()
+        for position in self._positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+        return True
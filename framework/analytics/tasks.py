@@ -30,3 +30,9 @@ def update_node(self, node_id, updated_fields=None):
         piwik._update_node_object(node, updated_fields)
     except Exception as error:
         raise self.retry(exc=error)
+
+
+@app.task(ignore_result=True)
+def flush_page_counters(counters):
+    from framework.analytics.buffer import write_page_counters
+    write_page_counters(counters)
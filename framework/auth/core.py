@@ -5,7 +5,6 @@ import urlparse
 import itertools
 import datetime as dt
 
-import bson
 import pytz
 import itsdangerous
 
@@ -22,6 +21,7 @@ from framework.sentry import log_exception
 from framework.addons import AddonModelMixin
 from framework.sessions.model import Session
 from framework.sessions.utils import remove_sessions_for_user
+from framework.sessions.stores import get_session_store
 from framework.exceptions import PermissionsError
 from framework.guid.model import GuidStoredObject
 from framework.bcrypt import generate_password_hash, check_password_hash
@@ -473,7 +473,7 @@ class User(GuidStoredObject, AddonModelMixin):
         except itsdangerous.BadSignature:
             return None
 
-        user_session = Session.load(token)
+        user_session = get_session_store().load(token)
 
         if user_session is None:
             return None
@@ -1097,14 +1097,11 @@ class User(GuidStoredObject, AddonModelMixin):
         # timezone aware utcnow
         utcnow = dt.datetime.utcnow().replace(tzinfo=pytz.utc)
         since_date = since or (utcnow - dt.timedelta(days=60))
+        # Log dates are naive UTC datetimes
+        since_date = since_date.astimezone(pytz.utc).replace(tzinfo=None)
         for config in self.watched:
-            # Extract the timestamps for each log from the log_id (fast!)
-            # The first 4 bytes of Mongo's ObjectId encodes time
-            # This prevents having to load each Log Object and access their
-            # date fields
-            node_log_ids = [log_id for log_id in config.node.logs._to_primary_keys()
-                                   if bson.ObjectId(log_id).generation_time > since_date and
-                                   log_id not in log_ids]
+            node_log_ids = [log_id for log_id in config.node.logs.since(since_date).get_keys()
+                                   if log_id not in log_ids]
             # Log ids in reverse chronological order
             log_ids = _merge_into_reversed(log_ids, node_log_ids)
         return (l_id for l_id in log_ids)
@@ -1262,9 +1259,16 @@ class User(GuidStoredObject, AddonModelMixin):
             projects_contributed_to = set(self.node__contributed)
             return projects_contributed_to.intersection(other_user.node__contributed)
 
+    def get_cocontributor_counts(self):
+        """Returns a dictionary mapping the ids of users who share projects with
+        this user to the number of shared projects, read from the counters
+        maintained by `Node.save`
+        """
+        return analytics.get_cocontributor_counts(self._id)
+
     def n_projects_in_common(self, other_user):
         """Returns number of "shared projects" (projects that both users are contributors for)"""
-        return len(self.get_projects_in_common(other_user, primary_keys=True))
+        return self.get_cocontributor_counts().get(other_user._id, 0)
 
 
 def _merge_into_reversed(*iterables):
@@ -16,6 +16,7 @@ from framework.auth import exceptions
 from framework.exceptions import HTTPError
 from framework.auth import (logout, get_user, DuplicateEmailError)
 from framework.auth.decorators import collect_auth, must_be_logged_in
+from framework.transactions.handlers import force_auto_transaction
 from framework.auth.forms import (
     MergeAccountForm, RegistrationForm, ResendConfirmationForm,
     ResetPasswordForm, ForgotPasswordForm
@@ -30,6 +31,7 @@ from website.util import web_url_for
 from website.util.sanitize import strip_html
 
 
+@force_auto_transaction
 @collect_auth
 def reset_password(auth, **kwargs):
     if auth.logged_in:
@@ -154,6 +156,7 @@ def auth_logout(redirect_url=None):
     return resp
 
 
+@force_auto_transaction
 def confirm_email_get(**kwargs):
     """View for email confirmation links.
     Authenticates and redirects to user settings page if confirmation is
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 import random
 
-from modularodm import fields
+from modularodm import fields, Q
+from pymongo.errors import DuplicateKeyError
 
 from framework.mongo import StoredObject
 
@@ -77,6 +78,44 @@ class GuidStoredObject(StoredObject):
             # Set primary key to GUID key
             self._primary_key = guid._primary_key
 
+    @classmethod
+    def create_guids(cls, count):
+        """Create ``count`` GUIDs for new records of this schema with one bulk
+        insert, for callers that insert the records themselves rather than
+        saving them one at a time.
+
+        :return list: Primary keys of the GUIDs, to be used as the primary keys
+            of the new records
+        """
+        keys = []
+        while len(keys) < count:
+            candidates = set(
+                ''.join(random.sample(ALPHABET, 5))
+                for _ in range(count - len(keys))
+            ).difference(keys)
+            candidates.difference_update(
+                BlacklistGuid.find(Q('_id', 'in', list(candidates))).get_keys()
+            )
+            candidates.difference_update(
+                Guid.find(Q('_id', 'in', list(candidates))).get_keys()
+            )
+            if not candidates:
+                continue
+            try:
+                Guid._storage[0].store.insert(
+                    [
+                        Guid(_id=key, referent=(key, cls._name)).to_storage()
+                        for key in candidates
+                    ],
+                    manipulate=False,
+                )
+            except DuplicateKeyError:
+                # Another request took one of the candidates; the ones
+                # inserted before it are left unused
+                continue
+            keys.extend(candidates)
+        return keys
+
     def save(self, *args, **kwargs):
         """Ensure GUID on save."""
         self._ensure_guid()
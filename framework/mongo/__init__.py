@@ -1,9 +1,123 @@
 # -*- coding: utf-8 -*-
 
-from modularodm import FlaskStoredObject as StoredObject
+from modularodm import FlaskStoredObject, Q
 
 from bson import ObjectId
 from .handlers import client, database, set_up_storage
+from .identity_map import get_identity_map
+from .profiler import get_current_profile
+
+
+class StoredObject(FlaskStoredObject):
+    """Base class for OSF models. modular-odm keeps loaded records in its
+    request-local `_object_cache`, which `load` checks by primary key. Records
+    built from `find` results also reuse the cached instance for their
+    primary key, refreshed with the fetched data, so each primary key maps to
+    a single instance per request.
+    """
+
+    _meta = {
+        'abstract': True,
+    }
+
+    @classmethod
+    def load(cls, key=None, data=None, *args, **kwargs):
+        identity_map = get_identity_map()
+        if data is not None:
+            profile = get_current_profile()
+            if profile is not None:
+                profile.record_documents(cls._name)
+            data_key = data.get(cls._primary_name)
+            cached = cls._load_from_cache(data_key) if data_key is not None else None
+            if cached is not None:
+                cls._refresh_cached(cached, data)
+                return cached
+        elif key is not None:
+            key = cls._check_pk_type(key)
+            if identity_map is not None:
+                identity_map.record(cls._name, cls._load_from_cache(key) is not None)
+        return super(StoredObject, cls).load(key, data, *args, **kwargs)
+
+    @classmethod
+    def _refresh_cached(cls, record, data):
+        """Update the cached ``record`` with storage ``data`` fetched by a
+        query, as `reload` does. Records with unsaved changes are left as
+        they are.
+        """
+        cached_data = cls._get_cached_data(record._storage_key)
+        if record.get_changed_fields(cached_data, record.to_storage()):
+            return
+        for key, value in data.items():
+            field_object = cls._fields.get(key)
+            if field_object is not None:
+                if value is not None:
+                    value = field_object.from_storage(value)
+                field_object.__set__(record, value, safe=True)
+            elif key == '__backrefs':
+                setattr(record, '_StoredObject__backrefs', value)
+        record._stored_key = record._primary_key
+        cls._set_cache(record._storage_key, record, data)
+
+    @classmethod
+    def load_many(cls, keys):
+        """Load the records for ``keys`` with a single `$in` query, skipping
+        keys already in the object cache. Records are returned in the order of
+        ``keys``; keys that do not match a record are omitted.
+
+        :param keys: Iterable of primary keys
+        :return list: Loaded records
+        """
+        keys = [cls._check_pk_type(key) for key in keys]
+        identity_map = get_identity_map()
+        found = {}
+        missing = []
+        for key in keys:
+            if key in found:
+                continue
+            record = cls._load_from_cache(key)
+            if identity_map is not None:
+                identity_map.record(cls._name, record is not None)
+            if record is not None:
+                found[key] = record
+            else:
+                missing.append(key)
+        if missing:
+            for record in cls.find(Q(cls._primary_name, 'in', missing)):
+                found[record._primary_key] = record
+        return [found[key] for key in keys if key in found]
+
+
+def prefetch(records, *field_names):
+    """Load the targets of the foreign fields ``field_names`` for all of
+    ``records`` with one query per field, so that dereferencing those fields
+    afterwards is served from the object cache. ::
+
+        nodes = prefetch(Node.find(query), 'contributors', 'creator')
+
+    :param records: Iterable of records of a single schema
+    :param field_names: Names of `ForeignField` or `ForeignList` fields
+    :return list: The records, as a list
+    """
+    records = list(records)
+    if not records:
+        return records
+    fields = records[0]._fields
+    for name in field_names:
+        field = fields[name]
+        if not field._is_foreign:
+            raise ValueError('Field {0} is not a foreign field'.format(name))
+        if field._list:
+            keys = set()
+            for record in records:
+                keys.update(getattr(record, name)._to_primary_keys())
+            schema = field._field_instance.base_class
+        else:
+            keys = set(record.to_storage().get(name) for record in records)
+            keys.discard(None)
+            schema = field.base_class
+        schema.load_many(keys)
+    return records
+
 
 __all__ = [
     'StoredObject',
@@ -11,4 +125,39 @@ __all__ = [
     'client',
     'database',
     'set_up_storage',
+    'get_identity_map',
+    'prefetch',
 ]
+
+
+def add_backrefs(records, backref_key, parent_name, parent_field_name, keys):
+    """Add the primary keys ``keys`` of ``parent_name`` records to the
+    back-references of ``records`` with a single multi-document update,
+    where `StoredObject._set_backref` saves each record once per key. The
+    in-memory records are updated as well, so that saving them later does not
+    overwrite the new back-references. ::
+
+        add_backrefs([user], 'contributed', 'node', 'contributors', node_ids)
+
+    :param records: Records of a single schema
+    :param str backref_key: Back-reference name, e.g. ``'contributed'``
+    :param str parent_name: Schema name of the referring records
+    :param str parent_field_name: Name of the referring field
+    :param keys: Primary keys of the referring records
+    """
+    records = list(records)
+    keys = list(keys)
+    if not records or not keys:
+        return
+    schema = type(records[0])
+    path = '__backrefs.{0}.{1}.{2}'.format(backref_key, parent_name, parent_field_name)
+    schema._storage[0].store.update(
+        {schema._primary_name: {'$in': [record._storage_key for record in records]}},
+        {'$addToSet': {path: {'$each': keys}}},
+        multi=True,
+    )
+    for record in records:
+        backrefs = getattr(record, '_StoredObject__backrefs')
+        refs = backrefs.setdefault(backref_key, {}).setdefault(
+            parent_name, {}).setdefault(parent_field_name, [])
+        refs.extend(key for key in keys if key not in refs)
@@ -1,21 +1,41 @@
 # -*- coding: utf-8 -*-
 
+import os
 import logging
+import threading
 
 import pymongo
 from flask import g
 from werkzeug.local import LocalProxy
 
 from website import settings
+from framework.mongo.profiler import profiled_storage_class
 
 
 logger = logging.getLogger(__name__)
 
 
+def get_client_options():
+    """Build keyword arguments for `MongoClient` from settings. Wait queue
+    options are only passed if set, since older versions of pymongo do not
+    accept them.
+    """
+    options = {'max_pool_size': settings.DB_MAX_POOL_SIZE}
+    if settings.DB_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options['waitQueueTimeoutMS'] = settings.DB_WAIT_QUEUE_TIMEOUT_MS
+    if settings.DB_WAIT_QUEUE_MULTIPLE is not None:
+        options['waitQueueMultiple'] = settings.DB_WAIT_QUEUE_MULTIPLE
+    return options
+
+
 def get_mongo_client():
     """Create MongoDB client and authenticate database.
     """
-    client = pymongo.MongoClient(settings.DB_HOST, settings.DB_PORT)
+    client = pymongo.MongoClient(
+        settings.DB_HOST,
+        settings.DB_PORT,
+        **get_client_options()
+    )
 
     db = client[settings.DB_NAME]
 
@@ -25,20 +45,101 @@ def get_mongo_client():
     return client
 
 
+class PooledClient(object):
+    """Process-wide MongoDB client. The client is created lazily and
+    recreated if the current process is not the one that created it, so that
+    forked workers never share sockets with their parent.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+        self.clients_created = 0
+        self.checkouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def get(self):
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    if self._pid != pid:
+                        # Counters were inherited from the parent process
+                        self.checkouts = self.in_use = self.peak_in_use = 0
+                    self._client = get_mongo_client()
+                    self._pid = pid
+                    self.clients_created += 1
+        return self._client
+
+    def checkout(self):
+        """Return the shared client and pin a socket to the current thread
+        until `checkin` is called, so that TokuMX transaction commands issued
+        during a request share a connection.
+        """
+        client = self.get()
+        client.start_request()
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return client
+
+    def checkin(self, client):
+        client.end_request()
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def stats(self):
+        """Return connection pool metrics for the current process.
+        ``checkouts``, ``in_use`` and ``peak_in_use`` count requests that
+        checked out the client, not sockets; ``idle_sockets`` is the number of
+        sockets in pymongo's pool that are not in use.
+        """
+        pool = getattr(self._client, '_MongoClient__pool', None)
+        return {
+            'pid': self._pid,
+            'clients_created': self.clients_created,
+            'checkouts': self.checkouts,
+            'in_use': self.in_use,
+            'peak_in_use': self.peak_in_use,
+            'max_pool_size': settings.DB_MAX_POOL_SIZE,
+            'idle_sockets': len(getattr(pool, 'sockets', ())),
+            'wait_queue_timeout_ms': settings.DB_WAIT_QUEUE_TIMEOUT_MS,
+            'wait_queue_multiple': settings.DB_WAIT_QUEUE_MULTIPLE,
+        }
+
+
+pooled_client = PooledClient()
+
+
+def get_pool_stats():
+    return pooled_client.stats()
+
+
 def connection_before_request():
     """Attach MongoDB client to `g`.
     """
-    g._mongo_client = get_mongo_client()
+    if settings.DB_POOLED_CLIENT:
+        g._mongo_client = pooled_client.checkout()
+    else:
+        g._mongo_client = get_mongo_client()
 
 
 def connection_teardown_request(error=None):
-    """Close MongoDB client if attached to `g`.
+    """Release MongoDB client if attached to `g`: return its socket to the
+    shared pool in pooled mode, else close it.
     """
     try:
-        g._mongo_client.close()
+        client = g._mongo_client
     except AttributeError:
         if not settings.DEBUG_MODE:
             logger.error('MongoDB client not attached to request.')
+        return
+    if settings.DB_POOLED_CLIENT:
+        pooled_client.checkin(client)
+    else:
+        client.close()
 
 
 handlers = {
@@ -47,8 +148,9 @@ handlers = {
 }
 
 
-# Set up getters for `LocalProxy` objects
-_mongo_client = get_mongo_client()
+# Set up getters for `LocalProxy` objects. In pooled mode, the default client
+# is created on first use so that it is never inherited by forked workers.
+_mongo_client = None if settings.DB_POOLED_CLIENT else get_mongo_client()
 
 
 def _get_current_client():
@@ -58,6 +160,8 @@ def _get_current_client():
     try:
         return g._mongo_client
     except (AttributeError, RuntimeError):
+        if settings.DB_POOLED_CLIENT:
+            return pooled_client.get()
         return _mongo_client
 
 
@@ -91,6 +195,9 @@ def set_up_storage(schemas, storage_class, prefix='', addons=None, **kwargs):
     _schemas = []
     _schemas.extend(schemas)
 
+    if settings.ENABLE_QUERY_PROFILER:
+        storage_class = profiled_storage_class(storage_class)
+
     for addon in (addons or []):
         _schemas.extend(addon.models)
 
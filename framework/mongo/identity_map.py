@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Request-scoped hit and miss counts for the identity map. modular-odm keeps
+records loaded during a request in the request-local `_object_cache`, so that
+repeated calls to `load` for the same key return the same instance without
+going back to the storage backend; `StoredObject` counts how often lookups by
+primary key are served from it.
+"""
+
+import logging
+import collections
+
+from flask import g
+
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityMap(object):
+
+    def __init__(self):
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+
+    def record(self, name, hit):
+        """Count a lookup by primary key for schema ``name`` as a hit or a
+        miss.
+        """
+        if hit:
+            self.hits[name] += 1
+        else:
+            self.misses[name] += 1
+
+    def stats(self):
+        names = set(self.hits) | set(self.misses)
+        return {
+            name: {'hits': self.hits[name], 'misses': self.misses[name]}
+            for name in names
+        }
+
+
+def get_identity_map():
+    """Return the identity map counts for the current request, creating them
+    if necessary. Return `None` outside of a request context.
+    """
+    try:
+        return g._identity_map
+    except AttributeError:
+        g._identity_map = IdentityMap()
+        return g._identity_map
+    except RuntimeError:
+        return None
+
+
+def identity_map_teardown_request(error=None):
+    """Log hit and miss counts and discard them.
+    """
+    identity_map = getattr(g, '_identity_map', None)
+    if identity_map is None:
+        return
+    logger.debug('Identity map stats: {0!r}'.format(identity_map.stats()))
+    del g._identity_map
+
+
+handlers = {
+    'teardown_request': identity_map_teardown_request,
+}
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Per-request database profiling. Storage backends created by
+`set_up_storage` record the number of queries, documents returned, and time
+spent per collection; repeated single-key loads from the same collection are
+reported as likely N+1 query patterns.
+"""
+
+import json
+import time
+import logging
+import collections
+
+from flask import g, request
+
+from website import settings
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-OSF-Query-Profile'
+
+
+class QueryProfile(object):
+
+    def __init__(self):
+        self.queries = collections.Counter()
+        self.writes = collections.Counter()
+        self.documents = collections.Counter()
+        self.time = collections.Counter()
+        self.single_key_loads = collections.defaultdict(collections.Counter)
+        # Guard against counting backend methods that call one another
+        self.depth = 0
+
+    def record(self, collection, elapsed, write=False):
+        if write:
+            self.writes[collection] += 1
+        else:
+            self.queries[collection] += 1
+        self.time[collection] += elapsed
+
+    def record_documents(self, collection, count=1):
+        self.documents[collection] += count
+
+    def record_single_key_load(self, collection, key):
+        self.single_key_loads[collection][key] += 1
+
+    def n_plus_one(self):
+        """Return collections loaded one key at a time at least
+        `QUERY_PROFILER_N_PLUS_ONE_THRESHOLD` times, with the number of such
+        loads and the number of distinct keys loaded.
+        """
+        threshold = settings.QUERY_PROFILER_N_PLUS_ONE_THRESHOLD
+        return {
+            collection: {
+                'loads': sum(keys.values()),
+                'keys': len(keys),
+            }
+            for collection, keys in self.single_key_loads.items()
+            if sum(keys.values()) >= threshold
+        }
+
+    def summary(self):
+        collections_ = set(self.queries) | set(self.writes)
+        return {
+            'queries': sum(self.queries.values()),
+            'writes': sum(self.writes.values()),
+            'documents': sum(self.documents.values()),
+            'time_ms': round(sum(self.time.values()) * 1000, 2),
+            'collections': {
+                collection: {
+                    'queries': self.queries[collection],
+                    'writes': self.writes[collection],
+                    'documents': self.documents[collection],
+                    'time_ms': round(self.time[collection] * 1000, 2),
+                }
+                for collection in collections_
+            },
+            'n_plus_one': self.n_plus_one(),
+        }
+
+
+def get_current_profile():
+    """Return the query profile for the current request, or `None` if
+    profiling is not active.
+    """
+    try:
+        return getattr(g, '_query_profile', None)
+    except RuntimeError:
+        return None
+
+
+def _profiled(method_name, write=False, single_key=False):
+    def wrapped(self, *args, **kwargs):
+        method = getattr(super(ProfiledStorageMixin, self), method_name)
+        profile = get_current_profile()
+        if profile is None or profile.depth:
+            return method(*args, **kwargs)
+        collection = getattr(self, 'collection', None)
+        profile.depth += 1
+        start = time.time()
+        try:
+            ret = method(*args, **kwargs)
+        finally:
+            profile.depth -= 1
+            profile.record(collection, time.time() - start, write=write)
+        if single_key:
+            # `get` is called with (primary_name, key)
+            profile.record_single_key_load(collection, args[-1])
+            if ret is not None:
+                profile.record_documents(collection)
+        return ret
+    wrapped.__name__ = method_name
+    return wrapped
+
+
+class ProfiledStorageMixin(object):
+    """Mixin for modular-odm storage backends that records backend calls on
+    the current request's `QueryProfile`. Documents returned by `find` are
+    counted as they are loaded by `StoredObject.load`, since the underlying
+    cursors are lazy.
+    """
+    get = _profiled('get', single_key=True)
+    find = _profiled('find')
+    find_one = _profiled('find_one')
+    insert = _profiled('insert', write=True)
+    update = _profiled('update', write=True)
+    remove = _profiled('remove', write=True)
+
+
+def profiled_storage_class(storage_class):
+    """Create a subclass of ``storage_class`` that records queries."""
+    return type(
+        'Profiled{0}'.format(storage_class.__name__),
+        (ProfiledStorageMixin, storage_class),
+        {},
+    )
+
+
+def profiler_before_request():
+    g._query_profile = QueryProfile()
+
+
+def profiler_after_request(response):
+    """Report the query profile: as a response header in debug mode, else as
+    a structured log line.
+    """
+    profile = get_current_profile()
+    if profile is None:
+        return response
+    summary = profile.summary()
+    g._query_profile = None
+    if settings.DEBUG_MODE:
+        response.headers[PROFILE_HEADER] = json.dumps(summary, sort_keys=True)
+    else:
+        summary['endpoint'] = request.endpoint
+        summary['method'] = request.method
+        logger.info(json.dumps(summary, sort_keys=True))
+    return response
+
+
+handlers = {
+    'before_request': profiler_before_request,
+    'after_request': profiler_after_request,
+}
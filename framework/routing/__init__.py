@@ -130,6 +130,9 @@ def process_rules(app, rules, prefix=''):
     :param prefix: Optional prefix for rule URLs
 
     """
+    # Avoid circular imports
+    from framework.transactions.handlers import retry_on_lock_error
+
     for rule in rules:
 
         # Handle view function
@@ -163,6 +166,9 @@ def process_rules(app, rules, prefix=''):
             rule.view_kwargs,
             debug_mode=app.debug
         )
+        # Commit the request transaction when the view returns, and re-run
+        # the view after a lock conflict
+        wrapped_view_func = retry_on_lock_error(wrapped_view_func)
 
         # Add routes
         for url in rule.routes:
@@ -16,6 +16,7 @@ from framework.flask import redirect
 from website import settings
 
 from .model import Session
+from .stores import get_session_store
 
 
 def add_key_to_url(url, scheme, key):
@@ -95,12 +96,12 @@ def create_session(response, data=None):
     current_session = get_session()
     if current_session:
         current_session.data.update(data or {})
-        current_session.save()
+        get_session_store().save(current_session)
         cookie_value = itsdangerous.Signer(settings.SECRET_KEY).sign(current_session._id)
     else:
         session_id = str(bson.objectid.ObjectId())
         session = Session(_id=session_id, data=data or {})
-        session.save()
+        get_session_store().save(session)
         cookie_value = itsdangerous.Signer(settings.SECRET_KEY).sign(session_id)
         set_session(session)
     if response is not None:
@@ -184,7 +185,7 @@ def before_request():
     if cookie:
         try:
             session_id = itsdangerous.Signer(settings.SECRET_KEY).unsign(cookie)
-            session = Session.load(session_id) or Session(_id=session_id)
+            session = get_session_store().load(session_id) or Session(_id=session_id)
             set_session(session)
             return
         except:
@@ -193,6 +194,6 @@ def before_request():
 
 def after_request(response):
     if session.data.get('auth_user_id'):
-        session.save()
+        get_session_store().save(session)
 
     return response
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import copy
+import datetime
+
 from bson import ObjectId
 from modularodm import fields
 
 from framework.mongo import StoredObject
+from website import settings
 
 
 class Session(StoredObject):
@@ -13,6 +17,44 @@ class Session(StoredObject):
     date_modified = fields.DateTimeField(auto_now=True)
     data = fields.DictionaryField()
 
+    def __init__(self, *args, **kwargs):
+        super(Session, self).__init__(*args, **kwargs)
+        self._mark_clean()
+
     @property
     def is_authenticated(self):
         return 'auth_user_id' in self.data
+
+    @property
+    def is_dirty(self):
+        """Whether `data` has changed since the session was loaded or last
+        saved.
+        """
+        return self.data != self._clean_data
+
+    @property
+    def is_stale(self):
+        """Whether `date_modified` is older than `SESSION_REFRESH_INTERVAL`.
+        """
+        if self.date_modified is None:
+            return True
+        age = datetime.datetime.utcnow() - self.date_modified
+        return age > settings.SESSION_REFRESH_INTERVAL
+
+    def _mark_clean(self):
+        self._clean_data = copy.deepcopy(self.data)
+
+    def save(self, *args, **kwargs):
+        ret = super(Session, self).save(*args, **kwargs)
+        self._mark_clean()
+        return ret
+
+    def save_if_changed(self):
+        """Save the session if `data` has changed or `date_modified` is stale.
+
+        :return bool: Whether the session was saved
+        """
+        if self.is_dirty or self.is_stale:
+            self.save()
+            return True
+        return False
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""Session storage backends. The backend used by the application is chosen
+by `settings.SESSION_STORE`:
+
+* ``'mongo'``: Load and save sessions directly from the database.
+* ``'lru'``: Keep recently used sessions in a bounded, per-process LRU cache
+  in front of the database. Writes go through to the database. Every cache
+  hit is checked against the session's `date_modified` in the database, so
+  that sessions removed or changed by other processes (e.g. revoked on
+  logout or password change) are never served from the cache.
+* ``'ttl'``: Expire sessions with a TTL index on `date_modified` instead of
+  the `clear_sessions` task.
+"""
+
+import copy
+import time
+import logging
+import datetime
+import threading
+import collections
+
+from modularodm import Q
+from pymongo.errors import OperationFailure
+
+from website import settings
+
+from .model import Session
+
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore(object):
+    """Base class for session backends. Tracks how many loads found a
+    session.
+    """
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _record(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / total if total else None,
+        }
+
+    def setup(self):
+        """Prepare the backend; called once when the store is created."""
+        pass
+
+    def load(self, session_id):
+        """Return the `Session` with primary key ``session_id``, or `None`."""
+        raise NotImplementedError
+
+    def save(self, session):
+        """Persist ``session`` if it has changed.
+
+        :return bool: Whether the session was written
+        """
+        raise NotImplementedError
+
+    def remove_for_user(self, user_id):
+        """Remove all sessions belonging to the user with ``user_id``."""
+        raise NotImplementedError
+
+
+class MongoSessionStore(SessionStore):
+
+    def _load(self, session_id):
+        return Session.load(session_id)
+
+    def load(self, session_id):
+        session = self._load(session_id)
+        self._record(session is not None)
+        return session
+
+    def save(self, session):
+        return session.save_if_changed()
+
+    def remove_for_user(self, user_id):
+        Session.remove(Q('data.auth_user_id', 'eq', user_id))
+
+
+class LRUSessionStore(MongoSessionStore):
+    """Write-through LRU cache of session documents. A cached session is
+    only used if its `date_modified` matches the database, which costs an
+    `_id` lookup returning a single field instead of loading the document.
+    Hits and misses count cache lookups; misses fall back to the database.
+
+    :param int max_size: Maximum number of cached sessions
+    :param timedelta max_age: Maximum age of a cached session
+    """
+    def __init__(self, max_size, max_age):
+        super(LRUSessionStore, self).__init__()
+        self.max_size = max_size
+        self.max_age = max_age.total_seconds()
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+
+    def _get(self, session_id):
+        with self._lock:
+            entry = self._cache.pop(session_id, None)
+            if entry is None:
+                return None
+            cached_at, data = entry
+            if time.time() - cached_at > self.max_age:
+                return None
+            # Reinsert to mark as most recently used
+            self._cache[session_id] = entry
+            return copy.deepcopy(data)
+
+    def _discard(self, session_id):
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def _is_current(self, data):
+        """Whether the cached session ``data`` matches the stored session.
+        """
+        stored = Session._storage[0].store.find_one(
+            {'_id': data['_id']},
+            {'date_modified': True},
+        )
+        if stored is None:
+            return False
+        return _truncate(stored.get('date_modified')) == _truncate(data.get('date_modified'))
+
+    def _put(self, session):
+        data = copy.deepcopy(session.to_storage())
+        with self._lock:
+            self._cache.pop(session._id, None)
+            self._cache[session._id] = (time.time(), data)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def load(self, session_id):
+        data = self._get(session_id)
+        if data is not None:
+            if self._is_current(data):
+                self._record(True)
+                return Session.load(data=data)
+            self._discard(session_id)
+        self._record(False)
+        session = self._load(session_id)
+        if session is not None:
+            self._put(session)
+        return session
+
+    def save(self, session):
+        saved = super(LRUSessionStore, self).save(session)
+        if saved:
+            self._put(session)
+        return saved
+
+    def remove_for_user(self, user_id):
+        super(LRUSessionStore, self).remove_for_user(user_id)
+        with self._lock:
+            for session_id, (_, data) in self._cache.items():
+                if data.get('data', {}).get('auth_user_id') == user_id:
+                    del self._cache[session_id]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+class TTLSessionStore(MongoSessionStore):
+    """Let the database expire sessions whose `date_modified` is older than
+    ``ttl``. Since the database removes expired documents periodically,
+    expired sessions that have not been removed yet are not returned.
+
+    :param timedelta ttl: Session lifetime since last modification
+    """
+    def __init__(self, ttl):
+        super(TTLSessionStore, self).__init__()
+        if ttl <= settings.SESSION_REFRESH_INTERVAL:
+            raise ValueError('Session TTL must be longer than SESSION_REFRESH_INTERVAL')
+        self.ttl = ttl
+
+    def setup(self):
+        """Create the TTL index. If an index on `date_modified` already
+        exists with a different TTL, update its TTL instead. An existing
+        index without a TTL cannot be converted and must be dropped by hand
+        before switching to this backend.
+        """
+        collection = Session._storage[0].store
+        expire_after = int(self.ttl.total_seconds())
+        try:
+            collection.ensure_index('date_modified', expireAfterSeconds=expire_after)
+        except OperationFailure:
+            try:
+                collection.database.command(
+                    'collMod', collection.name,
+                    index={
+                        'keyPattern': {'date_modified': 1},
+                        'expireAfterSeconds': expire_after,
+                    },
+                )
+            except OperationFailure:
+                logger.error(
+                    'Could not create or update the TTL index on {0}.date_modified; '
+                    'drop the existing index and restart'.format(collection.name)
+                )
+                raise
+
+    def load(self, session_id):
+        session = self._load(session_id)
+        if session is not None and session.date_modified is not None:
+            if datetime.datetime.utcnow() - session.date_modified > self.ttl:
+                session = None
+        self._record(session is not None)
+        return session
+
+
+def _truncate(value):
+    """Truncate datetime ``value`` to the millisecond precision of the
+    database.
+    """
+    if value is None:
+        return None
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def create_session_store(name):
+    if name == 'mongo':
+        return MongoSessionStore()
+    if name == 'lru':
+        return LRUSessionStore(
+            max_size=settings.SESSION_CACHE_SIZE,
+            max_age=settings.SESSION_CACHE_MAX_AGE,
+        )
+    if name == 'ttl':
+        return TTLSessionStore(ttl=settings.SESSION_TTL)
+    raise ValueError('Unknown session store {0!r}'.format(name))
+
+
+_session_store = None
+
+
+def get_session_store():
+    """Return the session store configured by `settings.SESSION_STORE`."""
+    global _session_store
+    if _session_store is None:
+        store = create_session_store(settings.SESSION_STORE)
+        store.setup()
+        _session_store = store
+    return _session_store
@@ -1,6 +1,4 @@
-from modularodm import Q
-
-from .model import Session
+from .stores import get_session_store
 
 
 def remove_sessions_for_user(user):
@@ -8,4 +6,4 @@ def remove_sessions_for_user(user):
 
     :param User user:
     """
-    Session.remove(Q('data.auth_user_id', 'eq', user._id))
+    get_session_store().remove_for_user(user._id)
@@ -2,6 +2,9 @@
 
 import logging
 import functools
+import threading
+import contextlib
+import collections
 
 from flask import g
 from celery import group
@@ -11,15 +14,22 @@ from website import settings
 
 logger = logging.getLogger(__name__)
 
+_update_counts_lock = threading.Lock()
+# Number of updates passed to `enqueue_update` within requests, and of those,
+# how many were collapsed into an update already queued for the same key
+_update_counts = collections.Counter()
+
 
 def celery_before_request():
     g._celery_tasks = []
+    g._queued_updates = collections.OrderedDict()
 
 
 def celery_teardown_request(error=None):
     if error is not None:
         return
     try:
+        flush_updates()
         tasks = g._celery_tasks
         if tasks:
             if settings.USE_CELERY:
@@ -44,6 +54,84 @@ def enqueue_task(signature):
         signature()
 
 
+@contextlib.contextmanager
+def task_request_context():
+    """Run the body in a test request context with its own task queue, for
+    Celery tasks that call code expecting a request (URL building, status
+    messages, queued tasks). Queued tasks run when the body exits without an
+    error.
+
+    When Celery runs tasks synchronously, the task runs within the request
+    that queued it, and the test request context shares that request's ``g``;
+    the request's queues are restored when the body exits.
+    """
+    # Avoid circular imports
+    from framework.flask import app
+    with app.test_request_context():
+        outer = dict(
+            (name, getattr(g, name))
+            for name in ('_celery_tasks', '_queued_updates')
+            if hasattr(g, name)
+        )
+        celery_before_request()
+        try:
+            yield
+            celery_teardown_request()
+        finally:
+            for name, value in outer.items():
+                setattr(g, name, value)
+
+
+def enqueue_update(key, callback, fields=None):
+    """Run ``callback`` once at the end of the request for each ``key``,
+    however many times the update is queued, with the union of the ``fields``
+    passed for that key. Outside of a request, run ``callback`` immediately.
+
+    :param key: Hashable identifying the update, e.g. ``('search', node_id)``
+    :param callback: Called with a set of changed fields
+    :param fields: Optional iterable of changed fields
+    """
+    fields = set(fields or [])
+    try:
+        updates = g._queued_updates
+    except (RuntimeError, AttributeError):
+        callback(fields)
+        return
+    with _update_counts_lock:
+        _update_counts['queued'] += 1
+        if key in updates:
+            _update_counts['collapsed'] += 1
+    if key in updates:
+        updates[key][1].update(fields)
+    else:
+        updates[key] = (callback, fields)
+
+
+def flush_updates():
+    """Run updates queued by `enqueue_update`. Updates queued while flushing
+    are run in the same flush.
+    """
+    while getattr(g, '_queued_updates', None):
+        updates = g._queued_updates
+        g._queued_updates = collections.OrderedDict()
+        for key, (callback, fields) in updates.items():
+            try:
+                callback(fields)
+            except Exception:
+                logger.exception('Update {0!r} failed'.format(key))
+
+
+def update_stats():
+    """Return the number of updates queued and collapsed since the process
+    started.
+    """
+    with _update_counts_lock:
+        return {
+            'queued': _update_counts['queued'],
+            'collapsed': _update_counts['collapsed'],
+        }
+
+
 def queued_task(task):
     """Decorator that adds the wrapped task to the queue on ``g`` if Celery is
     enabled, else runs the task synchronously. Can only be applied to Celery
@@ -27,6 +27,9 @@ def show_live(database=None):
 
 
 def disconnect(database=None):
+    if osfsettings.DB_POOLED_CLIENT:
+        # The shared client is released by `connection_teardown_request`
+        return
     database = database or proxy_database
     try:
         database.connection.close()
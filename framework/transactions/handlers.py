@@ -1,27 +1,52 @@
 # -*- coding: utf-8 -*-
 
+import time
 import httplib
 import logging
+import functools
+import threading
+import contextlib
+import collections
 
-from flask import request, current_app
+from flask import g, request, current_app
 from pymongo.errors import OperationFailure
 
-from framework.transactions import utils, commands, messages
+from framework.mongo import StoredObject
+from framework.tasks import handlers as task_handlers
+from framework.transactions import utils, commands, messages, retry
+from framework.transactions.context import TokuTransaction
 
 from website import settings
 
 
 LOCK_ERROR_CODE = httplib.BAD_REQUEST
 NO_AUTO_TRANSACTION_ATTR = '_no_auto_transaction'
+FORCE_AUTO_TRANSACTION_ATTR = '_force_auto_transaction'
+
+# Requests using these methods run without a transaction unless the view is
+# decorated with `force_auto_transaction`
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
 
 logger = logging.getLogger(__name__)
 
+# Number of transaction commands not sent for read-only requests, by command
+skipped_commands = collections.Counter()
+_skipped_commands_lock = threading.Lock()
+
 
 def no_auto_transaction(func):
     setattr(func, NO_AUTO_TRANSACTION_ATTR, True)
     return func
 
 
+def force_auto_transaction(func):
+    """Run the decorated view in a transaction even for safe HTTP methods.
+    Use for views that write to the database on GET, e.g. confirmation links.
+    """
+    setattr(func, FORCE_AUTO_TRANSACTION_ATTR, True)
+    return func
+
+
 def view_has_annotation(attr):
     try:
         endpoint = request.url_rule.endpoint
@@ -31,11 +56,33 @@ def view_has_annotation(attr):
     return getattr(view, attr, False)
 
 
+def is_read_only_request():
+    """Whether the current request should skip the automatic transaction
+    because its HTTP method is safe.
+    """
+    if not settings.SKIP_SAFE_METHOD_TRANSACTIONS:
+        return False
+    try:
+        method = request.method
+    except RuntimeError:
+        return False
+    if method not in SAFE_METHODS:
+        return False
+    return not view_has_annotation(FORCE_AUTO_TRANSACTION_ATTR)
+
+
+def record_skipped(*commands):
+    with _skipped_commands_lock:
+        skipped_commands.update(commands)
+
+
 def transaction_before_request():
     """Setup transaction before handling the request.
     """
     if view_has_annotation(NO_AUTO_TRANSACTION_ATTR):
         return None
+    # Roll back any transaction left open on the connection, even for
+    # read-only requests, which would otherwise read inside it
     try:
         commands.rollback()
         logger.error('Transaction already in progress; rolling back.')
@@ -43,27 +90,106 @@ def transaction_before_request():
         message = utils.get_error_message(error)
         if messages.NO_TRANSACTION_ERROR not in message:
             raise
+    if is_read_only_request():
+        record_skipped('beginTransaction')
+        return None
     commands.begin()
 
 
-def transaction_after_request(response):
-    """Teardown transaction after handling the request. Rollback if an
-    uncaught exception occurred, else commit. If the commit fails due to a lock
-    error, rollback and return error response.
+def uses_auto_transaction():
+    return not (
+        view_has_annotation(NO_AUTO_TRANSACTION_ATTR) or
+        is_read_only_request()
+    )
+
+
+@contextlib.contextmanager
+def safe_request_transaction():
+    """Make a rare write in a view that usually only reads. Requests without
+    an automatic transaction, such as GET requests, run the write in a
+    transaction of its own; other writes join the request transaction. Use
+    instead of `force_auto_transaction` where forcing a transaction would
+    cost every request one, e.g. for a dashboard created on first view.
     """
-    if view_has_annotation(NO_AUTO_TRANSACTION_ATTR):
-        return response
+    if uses_auto_transaction():
+        yield
+    else:
+        with TokuTransaction():
+            yield
+
+
+def end_transaction(response):
+    """Commit the request transaction, or roll it back if ``response`` is a
+    server error. Return `False` if the commit failed because of a lock
+    conflict, in which case the transaction is rolled back.
+    """
+    g._transaction_ended = True
     if response.status_code >= 500:
         commands.rollback()
-    else:
-        try:
-            commands.commit()
-        except OperationFailure as error:
-            message = utils.get_error_message(error)
-            if 'lock not granted' in message.lower():
-                commands.rollback()
+        return True
+    try:
+        commands.commit()
+    except OperationFailure as error:
+        message = utils.get_error_message(error)
+        if 'lock not granted' in message.lower():
+            commands.rollback()
+            return False
+        raise
+    retry.metrics.record_commit(request.endpoint)
+    return True
+
+
+def retry_on_lock_error(func):
+    """Commit the request transaction as soon as the view ``func`` returns,
+    and re-run the view in a fresh transaction if the commit fails because of
+    a lock conflict, as many times as the retry policy allows, after the
+    policy's backoff. Only the view
+    is re-run: the request handlers, including the session save, run once,
+    after the transaction has ended. Return an error response once the
+    policy's attempts are exhausted.
+    """
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        attempt = 1
+        policy = retry.get_policy()
+        while True:
+            response = current_app.make_response(func(*args, **kwargs))
+            if not uses_auto_transaction() or end_transaction(response):
+                return response
+            endpoint = request.endpoint
+            retry.metrics.record_conflict(endpoint)
+            if not policy.should_retry(attempt):
+                retry.metrics.record_failure(endpoint)
+                logger.warning('Lock conflict on {0}; giving up after {1} attempts'.format(endpoint, attempt))
                 return utils.handle_error(LOCK_ERROR_CODE)
-            raise
+            retry.metrics.record_retry(endpoint)
+            time.sleep(policy.backoff(attempt))
+            attempt += 1
+            # Records loaded during the failed attempt may hold rolled-back
+            # changes, and tasks it queued must not run
+            StoredObject._clear_caches()
+            task_handlers.celery_before_request()
+            commands.begin()
+    return wrapped
+
+
+def transaction_after_request(response):
+    """Teardown transaction after handling the request, unless the view
+    already ended it (see `retry_on_lock_error`). Rollback if an uncaught
+    exception occurred, else commit. If the commit fails due to a lock error,
+    rollback and return an error response.
+    """
+    if view_has_annotation(NO_AUTO_TRANSACTION_ATTR):
+        return response
+    if is_read_only_request():
+        record_skipped('commitTransaction')
+        return response
+    if getattr(g, '_transaction_ended', False):
+        return response
+    if not end_transaction(response):
+        retry.metrics.record_conflict(request.endpoint)
+        retry.metrics.record_failure(request.endpoint)
+        return utils.handle_error(LOCK_ERROR_CODE)
     return response
 
 
@@ -74,6 +200,8 @@ def transaction_teardown_request(error=None):
     """
     if view_has_annotation(NO_AUTO_TRANSACTION_ATTR):
         return None
+    if is_read_only_request() or getattr(g, '_transaction_ended', False):
+        return None
     if error is not None:
         if not settings.DEBUG_MODE:
             logger.error('Uncaught error in `transaction_teardown_request`; '
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Retry policy and metrics for requests whose transaction fails to commit
+because of a TokuMX lock conflict.
+"""
+
+import random
+import threading
+import collections
+
+from website import settings
+
+
+class RetryPolicy(object):
+    """Bounded retries with jittered exponential backoff, so that requests
+    that conflicted do not collide again in lockstep.
+
+    :param int max_attempts: Total number of attempts, including the first
+    :param float base: Backoff before the first retry, in seconds
+    :param float cap: Maximum backoff, in seconds
+    """
+    def __init__(self, max_attempts, base, cap):
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+
+    def should_retry(self, attempt):
+        return attempt < self.max_attempts
+
+    def backoff(self, attempt):
+        """Return the delay before retrying after failed attempt number
+        ``attempt``, drawn uniformly between zero and the exponential bound.
+        """
+        return random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+
+
+def get_policy():
+    return RetryPolicy(
+        max_attempts=settings.TRANSACTION_RETRY_ATTEMPTS,
+        base=settings.TRANSACTION_RETRY_BACKOFF,
+        cap=settings.TRANSACTION_RETRY_MAX_BACKOFF,
+    )
+
+
+class LockConflictMetrics(object):
+    """Per-endpoint counts of commits, lock conflicts, retries, and requests
+    that failed after exhausting their retries.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commits = collections.Counter()
+        self.conflicts = collections.Counter()
+        self.retries = collections.Counter()
+        self.failures = collections.Counter()
+
+    def _increment(self, counter, endpoint):
+        with self._lock:
+            counter[endpoint] += 1
+
+    def record_commit(self, endpoint):
+        self._increment(self.commits, endpoint)
+
+    def record_conflict(self, endpoint):
+        self._increment(self.conflicts, endpoint)
+
+    def record_retry(self, endpoint):
+        self._increment(self.retries, endpoint)
+
+    def record_failure(self, endpoint):
+        self._increment(self.failures, endpoint)
+
+    def stats(self):
+        endpoints = set(self.commits) | set(self.conflicts)
+        ret = {}
+        for endpoint in endpoints:
+            attempts = self.commits[endpoint] + self.conflicts[endpoint]
+            ret[endpoint] = {
+                'commits': self.commits[endpoint],
+                'conflicts': self.conflicts[endpoint],
+                'retries': self.retries[endpoint],
+                'failures': self.failures[endpoint],
+                'conflict_rate': float(self.conflicts[endpoint]) / attempts,
+            }
+        return ret
+
+    def reset(self):
+        with self._lock:
+            for counter in (self.commits, self.conflicts, self.retries, self.failures):
+                counter.clear()
+
+
+metrics = LockConflictMetrics()
@@ -43,11 +43,11 @@ def get_parent(node):
 def do_migration(records, dry=False):
     for node in records:
         logs = list(NodeLog.find(Q('was_connected_to', 'contains', node)))
-        existing_logs = node.logs
+        existing_logs = list(node.logs)
         for log in logs:
-            if not log.node__logged:
+            log_node = log.logged_node
+            if log_node is None:
                 continue
-            log_node = log.node__logged[0]
             # if the log_node is not contained in the node parent list then it doesn't belong to this node
             if log_node not in get_all_parents(node):
                 logger.info('Excluding log {} from list because it is not associated with node {}'.format(log, node))
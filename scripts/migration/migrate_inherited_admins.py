@@ -0,0 +1,62 @@
+"""Sets Node.inherited_admin_ids from the permissions of each node's
+ancestors. Run after `migrate_node_ancestors`. Nodes are updated directly in
+the database so that search and Piwik updates are not triggered.
+
+Dry run: python -m scripts.migration.migrate_inherited_admins dry
+"""
+
+import logging
+import sys
+
+from modularodm import Q
+
+from website import models
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Set up storage backends
+    init_app(routes=False)
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    count = 0
+    for node in get_child_nodes():
+        inherited_admin_ids = get_inherited_admin_ids(node)
+        if list(node.inherited_admin_ids) == inherited_admin_ids:
+            continue
+        logger.info('Setting inherited_admin_ids of node {} to {}'.format(node._id, inherited_admin_ids))
+        if not dry_run:
+            set_inherited_admin_ids(node, inherited_admin_ids)
+        count += 1
+    logger.info('{} nodes migrated'.format(count))
+
+
+def get_child_nodes():
+    return models.Node.find(Q('ancestor_ids', 'ne', []))
+
+
+def get_inherited_admin_ids(node):
+    admin_ids = set()
+    for parent in models.Node.load_many(node.ancestor_ids):
+        admin_ids.update(
+            user_id for user_id, perms in parent.permissions.iteritems()
+            if 'admin' in perms
+        )
+    return sorted(admin_ids)
+
+
+def set_inherited_admin_ids(node, inherited_admin_ids):
+    models.Node._storage[0].store.update(
+        {'_id': node._id},
+        {'$set': {'inherited_admin_ids': inherited_admin_ids}},
+    )
+    node.reload()
+
+
+if __name__ == '__main__':
+    main()
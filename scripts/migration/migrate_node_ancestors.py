@@ -0,0 +1,65 @@
+"""Sets Node.ancestor_ids from the `parent` back-references of existing
+nodes. Nodes are updated directly in the database so that search and Piwik
+updates are not triggered.
+
+Dry run: python -m scripts.migration.migrate_node_ancestors dry
+"""
+
+import logging
+import sys
+
+from modularodm import Q
+
+from website import models
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Set up storage backends
+    init_app(routes=False)
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    count = 0
+    for node in get_child_nodes():
+        ancestor_ids = get_ancestor_ids(node)
+        if list(node.ancestor_ids) == ancestor_ids:
+            continue
+        logger.info('Setting ancestor_ids of node {} to {}'.format(node._id, ancestor_ids))
+        if not dry_run:
+            set_ancestor_ids(node, ancestor_ids)
+        count += 1
+    logger.info('{} nodes migrated'.format(count))
+
+
+def get_child_nodes():
+    return models.Node.find(Q('__backrefs.parent.node.nodes', 'ne', None))
+
+
+def get_ancestor_ids(node):
+    """Return the ids of the nodes above ``node``, nearest first. As with
+    `Node.parent_node`, ancestry stops at a deleted node.
+    """
+    ancestor_ids = []
+    while node.node__parent:
+        node = node.node__parent[0]
+        if node.is_deleted:
+            break
+        ancestor_ids.append(node._id)
+    return ancestor_ids
+
+
+def set_ancestor_ids(node, ancestor_ids):
+    models.Node._storage[0].store.update(
+        {'_id': node._id},
+        {'$set': {'ancestor_ids': ancestor_ids}},
+    )
+    node.reload()
+
+
+if __name__ == '__main__':
+    main()
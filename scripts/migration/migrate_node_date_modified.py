@@ -0,0 +1,72 @@
+"""Sets Node.date_modified, which used to be computed from the node's logs,
+to the date of each node's latest log, or to its creation date if it has no
+logs. Every node is recomputed, since nodes saved before this migration ran
+have `date_modified` set to their creation date. Nodes are updated directly
+in the database so that search and Piwik updates are not triggered.
+
+Run this migration before `migrate_node_logs`. Logs are looked up both in
+the lists embedded in node documents and by `NodeLog.node_ids`, so running
+it afterwards gives the same result, but it does not use `Node.logs`, which
+only finds migrated logs.
+
+Dry run: python -m scripts.migration.migrate_node_date_modified dry
+"""
+
+import logging
+import sys
+
+from framework.mongo import database
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Set up storage backends
+    init_app(routes=False)
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    count = 0
+    for node in get_nodes(database):
+        date_modified = get_date_modified(database, node)
+        if date_modified == node.get('date_modified'):
+            continue
+        logger.info('Setting date_modified of node {} to {}'.format(node['_id'], date_modified))
+        if not dry_run:
+            set_date_modified(database, node['_id'], date_modified)
+        count += 1
+    logger.info('{} nodes migrated'.format(count))
+
+
+def get_nodes(db):
+    return db['node'].find(
+        {},
+        {'logs': True, 'date_created': True, 'date_modified': True},
+    )
+
+
+def get_date_modified(db, node):
+    """Return the date of the latest log of the node document ``node``, or
+    its creation date if it has no logs.
+    """
+    query = {'node_ids': node['_id']}
+    if node.get('logs'):
+        query = {'$or': [query, {'_id': {'$in': node['logs']}}]}
+    latest = list(db['nodelog'].find(query, {'date': True}).sort('date', -1).limit(1))
+    if latest:
+        return latest[0]['date']
+    return node.get('date_created')
+
+
+def set_date_modified(db, node_id, date_modified):
+    db['node'].update(
+        {'_id': node_id},
+        {'$set': {'date_modified': date_modified}},
+    )
+
+
+if __name__ == '__main__':
+    main()
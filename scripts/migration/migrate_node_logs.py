@@ -0,0 +1,70 @@
+"""Moves the log ids embedded in node documents to `NodeLog.node_ids`, then
+removes the embedded lists. Nodes are processed oldest first, so the first
+entry in `node_ids` is the node each log was created for rather than a fork
+or registration that copied it. Run `migrate_node_date_modified` first.
+
+Dry run: python -m scripts.migration.migrate_node_logs dry
+"""
+
+import logging
+import sys
+
+from framework.mongo import database
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+
+# Number of log ids per update
+CHUNK_SIZE = 1000
+
+
+def main():
+    # Set up storage backends
+    init_app(routes=False)
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    count = 0
+    for node in get_nodes_with_embedded_logs(database):
+        logger.info('Moving {} logs of node {}'.format(len(node['logs']), node['_id']))
+        if not dry_run:
+            migrate_node(database, node)
+        count += 1
+    if not dry_run:
+        remove_log_backrefs(database)
+    logger.info('{} nodes migrated'.format(count))
+
+
+def get_nodes_with_embedded_logs(db):
+    return db['node'].find(
+        {'logs': {'$exists': True}},
+        {'logs': True},
+    ).sort('date_created', 1)
+
+
+def migrate_node(db, node):
+    log_ids = node['logs']
+    for start in range(0, len(log_ids), CHUNK_SIZE):
+        db['nodelog'].update(
+            {'_id': {'$in': log_ids[start:start + CHUNK_SIZE]}},
+            {'$addToSet': {'node_ids': node['_id']}},
+            multi=True,
+        )
+    db['node'].update({'_id': node['_id']}, {'$unset': {'logs': True}})
+
+
+def remove_log_backrefs(db):
+    """Remove the `logged` back-references left by the old `Node.logs`
+    field.
+    """
+    db['nodelog'].update(
+        {'__backrefs.logged': {'$exists': True}},
+        {'$unset': {'__backrefs.logged': True}},
+        multi=True,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Sets Node.private_link_keys, the keys of the active private links that
+include each node, from the private links. Nodes are updated directly in the
+database so that search and Piwik updates are not triggered. Nodes that no
+link includes are left alone; their keys default to an empty list.
+
+Dry run: python -m scripts.migration.migrate_private_link_keys dry
+"""
+
+import logging
+import sys
+from collections import defaultdict
+
+from framework.mongo import database
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Set up storage backends
+    init_app(routes=False)
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    count = 0
+    for node_id, keys in get_private_link_keys(database).items():
+        logger.info('Setting private_link_keys of node {} to {}'.format(node_id, keys))
+        if not dry_run:
+            set_private_link_keys(database, node_id, keys)
+        count += 1
+    logger.info('{} nodes migrated'.format(count))
+
+
+def get_private_link_keys(db):
+    """Return the keys of the active private links of each node included in
+    a link, by node id.
+    """
+    keys = defaultdict(list)
+    links = db['privatelink'].find(
+        {'is_deleted': {'$ne': True}},
+        {'key': True, 'nodes': True},
+    )
+    for link in links:
+        for node_id in link.get('nodes') or []:
+            keys[node_id].append(link['key'])
+    return keys
+
+
+def set_private_link_keys(db, node_id, keys):
+    db['node'].update(
+        {'_id': node_id},
+        {'$set': {'private_link_keys': keys}},
+    )
+
+
+if __name__ == '__main__':
+    main()
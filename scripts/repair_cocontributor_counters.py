@@ -0,0 +1,58 @@
+"""Recomputes the number of nodes each pair of users contributes to together,
+stored in `cocontributorcounters`, from the contributors of every node.
+Counters are maintained by `Node.save`; run this to build them for existing
+nodes or if the counts drift.
+
+Dry run: python -m scripts.repair_cocontributor_counters dry
+"""
+
+import collections
+import logging
+import sys
+
+from framework.mongo import database
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Set up storage backends
+    init_app(routes=False)
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    counters = count_cocontributors(database)
+    for user_id, counts in counters.items():
+        logger.info('User {} shares nodes with {} users'.format(user_id, len(counts)))
+        if not dry_run:
+            set_cocontributor_counts(database, user_id, counts)
+    if not dry_run:
+        # Users who no longer share any nodes
+        database['cocontributorcounters'].remove({'_id': {'$nin': list(counters)}})
+    logger.info('{} users repaired'.format(len(counters)))
+
+
+def count_cocontributors(db):
+    counters = collections.defaultdict(collections.Counter)
+    for node in db['node'].find({}, {'contributors': True}):
+        contributor_ids = set(node.get('contributors') or [])
+        for user_id in contributor_ids:
+            for other_id in contributor_ids - {user_id}:
+                counters[user_id][other_id] += 1
+    return {user_id: dict(counts) for user_id, counts in counters.items()}
+
+
+def set_cocontributor_counts(db, user_id, counts):
+    db['cocontributorcounters'].update(
+        {'_id': user_id},
+        {'$set': {'counts': counts}},
+        upsert=True,
+        manipulate=False,
+    )
+
+
+if __name__ == '__main__':
+    main()
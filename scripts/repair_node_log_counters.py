@@ -0,0 +1,64 @@
+"""Recomputes the per-node and per-user log counts in `nodelogcounters` from
+the logs of each node. Counters are maintained by `Node.add_log`; run this
+after migrating logs or if the counts drift.
+
+Dry run: python -m scripts.repair_node_log_counters dry
+"""
+
+import collections
+import logging
+import sys
+
+from framework.mongo import database
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Set up storage backends
+    init_app(routes=False)
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    count = 0
+    for node in database['node'].find({}, {'log_sources': True, 'logs': True}):
+        counters = count_node_logs(database, node['_id'], node.get('log_sources'), node.get('logs'))
+        logger.info('Node {} has {} logs'.format(node['_id'], counters['total']))
+        if not dry_run:
+            set_node_log_counters(database, node['_id'], counters)
+        count += 1
+    logger.info('{} nodes repaired'.format(count))
+
+
+def count_node_logs(db, node_id, log_sources=None, legacy_log_ids=None):
+    """Count the logs of a node, including those shared from the nodes in its
+    `log_sources` and those embedded in unmigrated node documents.
+    """
+    clauses = [{'node_ids': node_id}]
+    for source in log_sources or []:
+        clauses.append({'node_ids': source['node'], 'date': {'$lte': source['until']}})
+    if legacy_log_ids:
+        clauses.append({'_id': {'$in': legacy_log_ids}})
+    users = collections.Counter()
+    total = 0
+    for log in db['nodelog'].find({'$or': clauses}, {'user': True}):
+        total += 1
+        if log.get('user'):
+            users[log['user']] += 1
+    return {'total': total, 'users': dict(users)}
+
+
+def set_node_log_counters(db, node_id, counters):
+    db['nodelogcounters'].update(
+        {'_id': node_id},
+        {'$set': counters},
+        upsert=True,
+        manipulate=False,
+    )
+
+
+if __name__ == '__main__':
+    main()
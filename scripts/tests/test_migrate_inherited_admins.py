@@ -0,0 +1,45 @@
+from nose.tools import *  # noqa
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory, NodeFactory, UserFactory
+from website.models import Node
+
+from scripts.migration.migrate_inherited_admins import (
+    get_child_nodes,
+    get_inherited_admin_ids,
+    set_inherited_admin_ids,
+)
+
+
+class TestMigrateInheritedAdmins(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateInheritedAdmins, self).setUp()
+        self.project = ProjectFactory()
+        self.user = UserFactory()
+        self.component = NodeFactory(parent=self.project, creator=self.user)
+        Node._storage[0].store.update(
+            {},
+            {'$unset': {'inherited_admin_ids': True}},
+            multi=True,
+        )
+        for node in (self.project, self.component):
+            node.reload()
+
+    def tearDown(self):
+        super(TestMigrateInheritedAdmins, self).tearDown()
+        Node.remove()
+
+    def test_get_child_nodes(self):
+        assert_equal(list(get_child_nodes()), [self.component])
+
+    def test_get_inherited_admin_ids(self):
+        assert_equal(
+            get_inherited_admin_ids(self.component),
+            [self.project.creator._id],
+        )
+
+    def test_set_inherited_admin_ids(self):
+        assert_false(self.component.is_admin_parent(self.project.creator))
+        set_inherited_admin_ids(self.component, get_inherited_admin_ids(self.component))
+        assert_true(self.component.is_admin_parent(self.project.creator))
@@ -0,0 +1,50 @@
+from nose.tools import *  # noqa
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory, NodeFactory
+from website.models import Node
+
+from scripts.migration.migrate_node_ancestors import (
+    get_child_nodes,
+    get_ancestor_ids,
+    set_ancestor_ids,
+)
+
+
+class TestMigrateNodeAncestors(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateNodeAncestors, self).setUp()
+        self.project = ProjectFactory()
+        self.component = NodeFactory(parent=self.project)
+        self.subcomponent = NodeFactory(parent=self.component)
+        Node._storage[0].store.update(
+            {},
+            {'$unset': {'ancestor_ids': True}},
+            multi=True,
+        )
+        for node in (self.project, self.component, self.subcomponent):
+            node.reload()
+
+    def tearDown(self):
+        super(TestMigrateNodeAncestors, self).tearDown()
+        Node.remove()
+
+    def test_get_child_nodes(self):
+        assert_equal(
+            set(get_child_nodes()),
+            {self.component, self.subcomponent},
+        )
+
+    def test_get_ancestor_ids(self):
+        assert_equal(get_ancestor_ids(self.project), [])
+        assert_equal(
+            get_ancestor_ids(self.subcomponent),
+            [self.component._id, self.project._id],
+        )
+
+    def test_set_ancestor_ids(self):
+        ancestor_ids = get_ancestor_ids(self.subcomponent)
+        set_ancestor_ids(self.subcomponent, ancestor_ids)
+        assert_equal(self.subcomponent.ancestor_ids, ancestor_ids)
+        assert_equal(self.subcomponent.root, self.project)
@@ -0,0 +1,59 @@
+import datetime
+
+from nose.tools import *  # noqa
+
+from framework.mongo import database
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+from website.models import Node
+
+from scripts.migration.migrate_node_date_modified import (
+    get_nodes,
+    get_date_modified,
+    set_date_modified,
+)
+
+
+class TestMigrateNodeDateModified(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateNodeDateModified, self).setUp()
+        self.node = ProjectFactory()
+        self.log_date = self.node.logs[-1].date
+        # Nodes saved before the migration have their creation date
+        Node._storage[0].store.update(
+            {'_id': self.node._id},
+            {'$set': {'date_modified': self.node.date_created - datetime.timedelta(days=1)}},
+        )
+
+    def tearDown(self):
+        super(TestMigrateNodeDateModified, self).tearDown()
+        Node.remove()
+
+    def _get_document(self):
+        return database['node'].find_one({'_id': self.node._id})
+
+    def test_get_nodes_includes_nodes_with_date_modified(self):
+        assert_in(self.node._id, [node['_id'] for node in get_nodes(database)])
+
+    def test_get_date_modified(self):
+        assert_equal(get_date_modified(database, self._get_document()), self.log_date)
+
+    def test_get_date_modified_embedded_logs(self):
+        # Before migrate_node_logs runs, logs are listed on the node
+        log_ids = [log._id for log in self.node.logs]
+        database['nodelog'].update(
+            {'_id': {'$in': log_ids}},
+            {'$unset': {'node_ids': True}},
+            multi=True,
+        )
+        database['node'].update(
+            {'_id': self.node._id},
+            {'$set': {'logs': log_ids}},
+        )
+        assert_equal(get_date_modified(database, self._get_document()), self.log_date)
+
+    def test_set_date_modified(self):
+        set_date_modified(database, self.node._id, self.log_date)
+        self.node.reload()
+        assert_equal(self.node.date_modified, self.log_date)
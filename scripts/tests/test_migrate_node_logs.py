@@ -0,0 +1,63 @@
+from nose.tools import *  # noqa
+
+from framework.mongo import database
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory, NodeLogFactory
+from website.models import Node, NodeLog
+
+from scripts.migration.migrate_node_logs import (
+    get_nodes_with_embedded_logs,
+    migrate_node,
+    remove_log_backrefs,
+)
+
+
+class TestMigrateNodeLogs(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateNodeLogs, self).setUp()
+        self.project = ProjectFactory()
+        self.fork = ProjectFactory()
+        self.log = NodeLogFactory()
+        self.other_log = NodeLogFactory()
+        # Recreate the old layout, with log ids stored on the node
+        database['nodelog'].update({}, {'$unset': {'node_ids': True}}, multi=True)
+        database['node'].update(
+            {'_id': self.project._id},
+            {'$set': {'logs': [self.log._id, self.other_log._id]}},
+        )
+        database['node'].update(
+            {'_id': self.fork._id},
+            {'$set': {'logs': [self.log._id]}},
+        )
+        database['nodelog'].update(
+            {'_id': self.log._id},
+            {'$set': {'__backrefs.logged.node.logs': [self.project._id]}},
+        )
+        NodeLog._clear_caches()
+        Node._clear_caches()
+
+    def tearDown(self):
+        super(TestMigrateNodeLogs, self).tearDown()
+        Node.remove()
+        NodeLog.remove()
+
+    def test_get_nodes_with_embedded_logs(self):
+        node_ids = [node['_id'] for node in get_nodes_with_embedded_logs(database)]
+        assert_equal(node_ids, [self.project._id, self.fork._id])
+
+    def test_migrate_node(self):
+        for node in get_nodes_with_embedded_logs(database):
+            migrate_node(database, node)
+        NodeLog._clear_caches()
+        assert_equal(
+            NodeLog.load(self.log._id).node_ids,
+            [self.project._id, self.fork._id],
+        )
+        assert_equal(NodeLog.load(self.other_log._id).node_ids, [self.project._id])
+        assert_equal(list(get_nodes_with_embedded_logs(database)), [])
+
+    def test_remove_log_backrefs(self):
+        remove_log_backrefs(database)
+        document = database['nodelog'].find_one({'_id': self.log._id})
+        assert_not_in('logged', document.get('__backrefs', {}))
@@ -0,0 +1,43 @@
+from nose.tools import *  # noqa
+
+from framework.mongo import database
+from tests.base import OsfTestCase
+from tests.factories import PrivateLinkFactory, ProjectFactory
+from website.models import Node
+
+from scripts.migration.migrate_private_link_keys import (
+    get_private_link_keys,
+    set_private_link_keys,
+)
+
+
+class TestMigratePrivateLinkKeys(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigratePrivateLinkKeys, self).setUp()
+        self.node = ProjectFactory()
+        self.link = PrivateLinkFactory()
+        self.link.nodes.append(self.node)
+        self.link.save()
+        self.deleted_link = PrivateLinkFactory(key="deletedkey", is_deleted=True)
+        self.deleted_link.nodes.append(self.node)
+        self.deleted_link.save()
+        # Nodes saved before the migration have no keys
+        database['node'].update(
+            {'_id': self.node._id},
+            {'$unset': {'private_link_keys': True}},
+        )
+
+    def tearDown(self):
+        super(TestMigratePrivateLinkKeys, self).tearDown()
+        Node.remove()
+
+    def test_get_private_link_keys(self):
+        keys = get_private_link_keys(database)
+        assert_equal(keys[self.node._id], [self.link.key])
+
+    def test_set_private_link_keys(self):
+        set_private_link_keys(database, self.node._id, [self.link.key])
+        self.node.reload()
+        assert_equal(self.node.private_link_keys, [self.link.key])
+        assert_true(self.node.is_private_link_key_active(self.link.key))
@@ -0,0 +1,35 @@
+from nose.tools import *  # noqa
+
+from framework.analytics import get_cocontributor_counts
+from framework.mongo import database
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory, UserFactory
+from framework.auth import Auth
+
+from scripts.repair_cocontributor_counters import (
+    count_cocontributors,
+    set_cocontributor_counts,
+)
+
+
+class TestRepairCocontributorCounters(OsfTestCase):
+
+    def setUp(self):
+        super(TestRepairCocontributorCounters, self).setUp()
+        self.user = UserFactory()
+        self.contributor = UserFactory()
+        self.project = ProjectFactory(creator=self.user)
+        self.project.add_contributor(self.contributor, auth=Auth(self.user))
+        self.project.save()
+        database['cocontributorcounters'].remove()
+
+    def test_count_cocontributors(self):
+        counters = count_cocontributors(database)
+        assert_equal(counters[self.user._id], {self.contributor._id: 1})
+        assert_equal(counters[self.contributor._id], {self.user._id: 1})
+
+    def test_set_cocontributor_counts(self):
+        assert_equal(get_cocontributor_counts(self.user._id), {})
+        counters = count_cocontributors(database)
+        set_cocontributor_counts(database, self.user._id, counters[self.user._id])
+        assert_equal(get_cocontributor_counts(self.user._id), {self.contributor._id: 1})
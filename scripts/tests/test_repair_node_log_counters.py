@@ -0,0 +1,36 @@
+from nose.tools import *  # noqa
+
+from framework.analytics import get_node_log_counts
+from framework.mongo import database
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory, UserFactory
+from framework.auth import Auth
+
+from scripts.repair_node_log_counters import (
+    count_node_logs,
+    set_node_log_counters,
+)
+
+
+class TestRepairNodeLogCounters(OsfTestCase):
+
+    def setUp(self):
+        super(TestRepairNodeLogCounters, self).setUp()
+        self.user = UserFactory()
+        self.project = ProjectFactory(creator=self.user)
+        self.project.add_tag('repair', auth=Auth(self.user))
+        database['nodelogcounters'].remove()
+
+    def test_count_node_logs(self):
+        counters = count_node_logs(database, self.project._id)
+        assert_equal(counters, {'total': 2, 'users': {self.user._id: 2}})
+
+    def test_count_node_logs_of_fork(self):
+        fork = self.project.fork_node(Auth(self.user))
+        counters = count_node_logs(database, fork._id, fork.log_sources)
+        assert_equal(counters, {'total': 3, 'users': {self.user._id: 3}})
+
+    def test_set_node_log_counters(self):
+        assert_equal(get_node_log_counts(self.project._id, self.user._id), (0, 0))
+        set_node_log_counters(database, self.project._id, count_node_logs(database, self.project._id))
+        assert_equal(get_node_log_counts(self.project._id, self.user._id), (2, 2))
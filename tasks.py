@@ -9,6 +9,7 @@ import code
 import platform
 import subprocess
 import logging
+import multiprocessing
 
 from invoke import task, run
 
@@ -315,10 +316,12 @@ def elasticsearch():
         print("Your system is not recognized, you will have to start elasticsearch manually")
 
 @task
-def migrate_search(delete=False, index=settings.ELASTIC_INDEX):
-    """Migrate the search-enabled models."""
+def migrate_search(delete=False, index=settings.ELASTIC_INDEX, processes=None):
+    """Migrate the search-enabled models. An interrupted migration resumes
+    where it stopped.
+    """
     from website.search_migration.migrate import migrate
-    migrate(delete, index=index)
+    migrate(delete, index=index, processes=int(processes or multiprocessing.cpu_count()))
 
 @task
 def rebuild_search():
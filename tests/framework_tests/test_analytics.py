@@ -5,16 +5,20 @@ Unit tests for analytics logic in framework/analytics/__init__.py
 
 import unittest
 
+import mock
 from nose.tools import *  # flake8: noqa  (PEP8 asserts)
 from flask import Flask
 
 from datetime import datetime
 
 from framework import analytics, sessions
+from framework.analytics.sketch import BloomFilter
+from framework.analytics.buffer import CounterBuffer
 from framework.sessions import session
 
 from tests.base import OsfTestCase
 from tests.factories import UserFactory, ProjectFactory
+from website import settings
 
 
 class TestAnalytics(OsfTestCase):
@@ -75,9 +79,6 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, self.fid), db=self.db)
         assert_equal(count, (1, 1))
 
-        page = 'download:{0}:{1}'.format(self.node, self.fid)
-
-        session.data['visited'].append(page)
         download_file_(node=self.node, fid=self.fid)
 
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, self.fid), db=self.db)
@@ -96,9 +97,6 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters('download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid), db=self.db)
         assert_equal(count, (1, 1))
 
-        page = 'download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid)
-
-        session.data['visited'].append(page)
         download_file_version_(node=self.node, fid=self.fid, vid=self.vid)
 
         count = analytics.get_basic_counters('download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid), db=self.db)
@@ -133,9 +131,6 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, fid2), db=self.db)
         assert_equal(count, (None, None))
 
-        page = 'download:{0}:{1}'.format(self.node, fid1)
-
-        session.data['visited'].append(page)
         download_file_(node=self.node, fid=fid1)
         download_file_(node=self.node, fid=fid2)
 
@@ -143,3 +138,131 @@ class TestUpdateCounters(UpdateCountersTestCase):
         assert_equal(count, (1, 2))
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, fid2), db=self.db)
         assert_equal(count, (1, 1))
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_add(self):
+        bloom = BloomFilter()
+        assert_true(bloom.add('node:abc12'))
+        assert_false(bloom.add('node:abc12'))
+        assert_in('node:abc12', bloom)
+        assert_not_in('node:def34', bloom)
+
+    def test_dump_and_load(self):
+        bloom = BloomFilter()
+        bloom.add('node:abc12')
+        dumped = bloom.dump()
+        assert_equal(len(dumped), len(BloomFilter().dump()))
+        assert_in('node:abc12', BloomFilter.load(dumped))
+
+    def test_load_legacy_list(self):
+        bloom = BloomFilter.load(['node:abc12', 'node:def34'])
+        assert_in('node:abc12', bloom)
+        assert_in('node:def34', bloom)
+
+    def test_size_is_fixed(self):
+        bloom = BloomFilter()
+        size = len(bloom.dump())
+        for index in range(1000):
+            bloom.add('node:{0}'.format(index))
+        assert_equal(len(bloom.dump()), size)
+
+    def _false_positive_rate(self, bloom, trials=10000):
+        false_positives = sum(
+            'other:{0}'.format(index) in bloom
+            for index in range(trials)
+        )
+        return false_positives / float(trials)
+
+    def test_false_positive_rate_at_capacity(self):
+        bloom = BloomFilter()
+        for index in range(settings.ANALYTICS_VISITED_FILTER_CAPACITY):
+            bloom.add('node:{0}'.format(index))
+        rate = self._false_positive_rate(bloom)
+        assert_less_equal(rate, settings.ANALYTICS_VISITED_FILTER_ERROR_RATE * 1.5)
+
+    def test_cleared_past_capacity(self):
+        bloom = BloomFilter()
+        for index in range(settings.ANALYTICS_VISITED_FILTER_CAPACITY * 3 + 1):
+            bloom.add('node:{0}'.format(index))
+            assert_less_equal(
+                bloom.fill_ratio(),
+                bloom.max_fill + float(bloom.hashes) / bloom.size,
+            )
+        rate = self._false_positive_rate(bloom)
+        assert_less_equal(rate, settings.ANALYTICS_VISITED_FILTER_ERROR_RATE * 1.5)
+
+
+class TestUpdateCounterSession(UpdateCountersTestCase):
+
+    def test_session_stores_filters(self):
+        analytics.update_counter('node:abc12', db=self.db)
+        assert_in('node:abc12', BloomFilter.load(session.data['visited']))
+        assert_in(
+            'node:abc12',
+            BloomFilter.load(session.data['visited_by_date']['pages']),
+        )
+
+    def test_repeat_visit_does_not_modify_session(self):
+        analytics.update_counter('node:abc12', db=self.db)
+        data = dict(session.data)
+        analytics.update_counter('node:abc12', db=self.db)
+        assert_equal(dict(session.data), data)
+
+
+@mock.patch.object(CounterBuffer, '_ensure_flusher')
+class TestCounterBuffer(OsfTestCase):
+
+    def setUp(self):
+        super(TestCounterBuffer, self).setUp()
+        self.buffer = CounterBuffer(max_pages=2, interval=3600)
+
+    def test_increments_summed_until_flush(self, mock_ensure_flusher):
+        self.buffer.add('node:abc12', {'total': 1, 'unique': 1})
+        self.buffer.add('node:abc12', {'total': 1})
+        assert_is_none(self.db['pagecounters'].find_one({'_id': 'node:abc12'}))
+        assert_equal(self.buffer.pending('node:abc12'), {'total': 2, 'unique': 1})
+        self.buffer.flush(db=self.db)
+        result = self.db['pagecounters'].find_one({'_id': 'node:abc12'})
+        assert_equal(result['total'], 2)
+        assert_equal(result['unique'], 1)
+        assert_equal(self.buffer.pending('node:abc12'), {})
+
+    def test_full_buffer_wakes_flusher_without_writing(self, mock_ensure_flusher):
+        self.buffer.add('node:abc12', {'total': 1})
+        assert_false(self.buffer._full.is_set())
+        self.buffer.add('node:def34', {'total': 1})
+        assert_true(self.buffer._full.is_set())
+        assert_equal(self.db['pagecounters'].find().count(), 0)
+
+    @mock.patch('framework.analytics.buffer.write_page_counters')
+    def test_failed_flush_keeps_increments(self, mock_write, mock_ensure_flusher):
+        mock_write.side_effect = Exception('connection lost')
+        self.buffer.add('node:abc12', {'total': 1})
+        with assert_raises(Exception):
+            self.buffer.flush(db=self.db)
+        self.buffer.add('node:abc12', {'total': 1})
+        assert_equal(self.buffer.pending('node:abc12'), {'total': 2})
+
+    @mock.patch('framework.analytics.buffer.os.getpid')
+    def test_increments_inherited_on_fork_dropped(self, mock_getpid, mock_ensure_flusher):
+        mock_getpid.return_value = self.buffer._pid
+        self.buffer.add('node:abc12', {'total': 1})
+        mock_getpid.return_value = self.buffer._pid + 1
+        assert_equal(self.buffer.drain(), {})
+
+    @mock.patch('framework.analytics.buffer.settings.ANALYTICS_FLUSH_WITH_CELERY', True)
+    @mock.patch('framework.analytics.buffer.settings.USE_CELERY', True)
+    @mock.patch('framework.analytics.tasks.flush_page_counters')
+    def test_flush_with_celery(self, mock_flush_task, mock_ensure_flusher):
+        self.buffer.add('node:abc12', {'total': 1})
+        self.buffer.flush()
+        mock_flush_task.delay.assert_called_once_with({'node:abc12': {'total': 1}})
+
+    def test_basic_counters_include_pending(self, mock_ensure_flusher):
+        page = 'node:pending'
+        analytics.page_counter_buffer.add(page, {'total': 2, 'unique': 1})
+        assert_equal(analytics.get_basic_counters(page, db=self.db), (1, 2))
+        analytics.page_counter_buffer.flush(db=self.db)
+        assert_equal(analytics.get_basic_counters(page, db=self.db), (1, 2))
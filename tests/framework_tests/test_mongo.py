@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+import mock
+import unittest
+from nose.tools import *  # noqa
+
+from flask import Flask, g
+from modularodm import Q
+
+from framework.auth import User
+from framework.mongo import handlers, get_identity_map, prefetch
+from framework.mongo.identity_map import IdentityMap
+from framework.mongo.profiler import QueryProfile, ProfiledStorageMixin
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory, UserFactory
+from website.project.model import Node
+
+
+app = Flask('test_mongo_app')
+
+
+class TestPooledClient(unittest.TestCase):
+
+    def setUp(self):
+        super(TestPooledClient, self).setUp()
+        self.pooled = handlers.PooledClient()
+        self.patcher = mock.patch('framework.mongo.handlers.get_mongo_client')
+        self.mock_get_client = self.patcher.start()
+        self.mock_get_client.side_effect = lambda: mock.Mock()
+
+    def tearDown(self):
+        super(TestPooledClient, self).tearDown()
+        self.patcher.stop()
+
+    def test_client_reused_within_process(self):
+        assert_is(self.pooled.get(), self.pooled.get())
+        assert_equal(self.pooled.clients_created, 1)
+
+    @mock.patch('framework.mongo.handlers.os.getpid')
+    def test_client_recreated_after_fork(self, mock_getpid):
+        mock_getpid.return_value = 1
+        parent_client = self.pooled.get()
+        mock_getpid.return_value = 2
+        child_client = self.pooled.get()
+        assert_is_not(parent_client, child_client)
+        assert_equal(self.pooled.clients_created, 2)
+
+    def test_checkout_pins_socket(self):
+        client = self.pooled.checkout()
+        client.start_request.assert_called_once_with()
+        assert_equal(self.pooled.in_use, 1)
+        self.pooled.checkin(client)
+        client.end_request.assert_called_once_with()
+        stats = self.pooled.stats()
+        assert_equal(stats['checkouts'], 1)
+        assert_equal(stats['in_use'], 0)
+        assert_equal(stats['peak_in_use'], 1)
+        assert_not_in('waiting', stats)
+
+
+class TestConnectionHandlers(unittest.TestCase):
+
+    def setUp(self):
+        super(TestConnectionHandlers, self).setUp()
+        self.context = app.test_request_context('/')
+        self.context.push()
+
+    def tearDown(self):
+        super(TestConnectionHandlers, self).tearDown()
+        self.context.pop()
+
+    @mock.patch('framework.mongo.handlers.settings.DB_POOLED_CLIENT', True)
+    @mock.patch('framework.mongo.handlers.pooled_client')
+    def test_pooled_client_not_closed(self, mock_pooled):
+        handlers.connection_before_request()
+        assert_is(g._mongo_client, mock_pooled.checkout.return_value)
+        handlers.connection_teardown_request()
+        mock_pooled.checkin.assert_called_once_with(g._mongo_client)
+        assert_false(g._mongo_client.close.called)
+
+    @mock.patch('framework.mongo.handlers.settings.DB_POOLED_CLIENT', False)
+    @mock.patch('framework.mongo.handlers.get_mongo_client')
+    def test_per_request_client_closed(self, mock_get_client):
+        handlers.connection_before_request()
+        handlers.connection_teardown_request()
+        mock_get_client.return_value.close.assert_called_once_with()
+
+
+class TestIdentityMap(unittest.TestCase):
+
+    def setUp(self):
+        super(TestIdentityMap, self).setUp()
+        self.identity_map = IdentityMap()
+
+    def test_hits_and_misses(self):
+        self.identity_map.record('node', False)
+        self.identity_map.record('node', True)
+        self.identity_map.record('user', True)
+        assert_equal(
+            self.identity_map.stats(),
+            {
+                'node': {'hits': 1, 'misses': 1},
+                'user': {'hits': 1, 'misses': 0},
+            },
+        )
+
+
+class TestStoredObjectIdentityMap(OsfTestCase):
+
+    def setUp(self):
+        super(TestStoredObjectIdentityMap, self).setUp()
+        self.project = ProjectFactory()
+        Node._clear_caches()
+
+    def test_repeated_load_hits_cache(self):
+        first = Node.load(self.project._id)
+        hits = get_identity_map().hits['node']
+        with mock.patch.object(Node._storage[0], 'get') as mock_get:
+            second = Node.load(self.project._id)
+        assert_false(mock_get.called)
+        assert_is(first, second)
+        assert_equal(get_identity_map().hits['node'], hits + 1)
+
+    def test_load_normalizes_key(self):
+        user = UserFactory()
+        User._clear_caches()
+        loaded = User.load(user._id)
+        assert_is(User.load(unicode(user._id)), loaded)
+
+    def test_find_results_are_mapped(self):
+        found = Node.find_one(Q('_id', 'eq', self.project._id))
+        assert_is(Node.load(found._id), found)
+
+    def test_find_refreshes_cached_record(self):
+        cached = Node.load(self.project._id)
+        Node._storage[0].store.update(
+            {'_id': self.project._id},
+            {'$set': {'title': 'Changed elsewhere'}},
+        )
+        found = Node.find_one(Q('_id', 'eq', self.project._id))
+        assert_is(found, cached)
+        assert_equal(found.title, 'Changed elsewhere')
+
+    def test_find_keeps_unsaved_changes(self):
+        cached = Node.load(self.project._id)
+        cached.title = 'Unsaved title'
+        found = Node.find_one(Q('_id', 'eq', self.project._id))
+        assert_is(found, cached)
+        assert_equal(found.title, 'Unsaved title')
+
+
+class TestLoadMany(OsfTestCase):
+
+    def setUp(self):
+        super(TestLoadMany, self).setUp()
+        self.users = [UserFactory() for _ in range(3)]
+        User._clear_caches()
+
+    def test_load_many_preserves_order(self):
+        keys = [user._id for user in reversed(self.users)]
+        loaded = User.load_many(keys + ['notauser'])
+        assert_equal([user._id for user in loaded], keys)
+
+    def test_load_many_single_query(self):
+        keys = [user._id for user in self.users]
+        with mock.patch.object(User, 'find', wraps=User.find) as mock_find:
+            User.load_many(keys)
+        assert_equal(mock_find.call_count, 1)
+
+    def test_load_many_skips_mapped_keys(self):
+        User.load(self.users[0]._id)
+        keys = [user._id for user in self.users]
+        with mock.patch.object(User, 'find', wraps=User.find) as mock_find:
+            User.load_many(keys)
+        query = mock_find.call_args[0][0]
+        assert_equal(set(query.argument), set(keys[1:]))
+
+    def test_prefetch_foreign_list(self):
+        project = ProjectFactory(creator=self.users[0])
+        for user in self.users[1:]:
+            project.add_contributor(user)
+        project.save()
+        User._clear_caches()
+        prefetch([project], 'contributors')
+        with mock.patch.object(User, 'find') as mock_find:
+            list(project.contributors)
+        assert_false(mock_find.called)
+
+
+class TestQueryProfile(unittest.TestCase):
+
+    def setUp(self):
+        super(TestQueryProfile, self).setUp()
+        self.profile = QueryProfile()
+
+    def test_summary(self):
+        self.profile.record('node', 0.002)
+        self.profile.record('node', 0.001, write=True)
+        self.profile.record_documents('node', 3)
+        summary = self.profile.summary()
+        assert_equal(summary['queries'], 1)
+        assert_equal(summary['writes'], 1)
+        assert_equal(summary['documents'], 3)
+        assert_equal(summary['collections']['node']['time_ms'], 3.0)
+
+    @mock.patch('framework.mongo.profiler.settings.QUERY_PROFILER_N_PLUS_ONE_THRESHOLD', 3)
+    def test_n_plus_one(self):
+        for key in ['a', 'b', 'b']:
+            self.profile.record_single_key_load('user', key)
+        self.profile.record_single_key_load('node', 'a')
+        assert_equal(
+            self.profile.n_plus_one(),
+            {'user': {'loads': 3, 'keys': 2}},
+        )
+
+
+class FakeStorage(object):
+
+    collection = 'fake'
+
+    def get(self, primary_name, key):
+        return {primary_name: key}
+
+    def find(self, query=None):
+        return self.get('_id', 'nested')
+
+
+class ProfiledFakeStorage(ProfiledStorageMixin, FakeStorage):
+    pass
+
+
+class TestProfiledStorage(unittest.TestCase):
+
+    def setUp(self):
+        super(TestProfiledStorage, self).setUp()
+        self.context = app.test_request_context('/')
+        self.context.push()
+        g._query_profile = QueryProfile()
+        self.storage = ProfiledFakeStorage()
+
+    def tearDown(self):
+        super(TestProfiledStorage, self).tearDown()
+        self.context.pop()
+
+    def test_get_recorded_as_single_key_load(self):
+        self.storage.get('_id', 'abc12')
+        assert_equal(g._query_profile.queries['fake'], 1)
+        assert_equal(g._query_profile.documents['fake'], 1)
+        assert_equal(g._query_profile.single_key_loads['fake']['abc12'], 1)
+
+    def test_nested_calls_counted_once(self):
+        self.storage.find()
+        assert_equal(g._query_profile.queries['fake'], 1)
+        assert_not_in('fake', g._query_profile.single_key_loads)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,16 @@
+import datetime
+
+import mock
 from nose.tools import *
+from modularodm import Q
+from pymongo.errors import OperationFailure
 
-from framework.sessions import utils
+from framework.sessions import stores, utils
 from tests import factories
 from tests.base import DbTestCase
 from website.models import User
 from website.models import Session
+from website import settings
 
 
 class SessionUtilsTestCase(DbTestCase):
@@ -34,3 +40,135 @@ class SessionUtilsTestCase(DbTestCase):
 
         utils.remove_sessions_for_user(self.user)
         assert_equal(1, Session.find().count())
+
+
+class SessionDirtyTrackingTestCase(DbTestCase):
+
+    def setUp(self, *args, **kwargs):
+        super(SessionDirtyTrackingTestCase, self).setUp(*args, **kwargs)
+        self.session = factories.SessionFactory()
+        self.session.save()
+
+    def tearDown(self, *args, **kwargs):
+        super(SessionDirtyTrackingTestCase, self).tearDown(*args, **kwargs)
+        Session.remove()
+
+    def test_clean_after_save(self):
+        assert_false(self.session.is_dirty)
+
+    def test_dirty_after_data_change(self):
+        self.session.data['auth_user_id'] = 'abc12'
+        assert_true(self.session.is_dirty)
+
+    def test_dirty_after_nested_data_change(self):
+        self.session.data['history'] = []
+        self.session.save()
+        self.session.data['history'].append('/dashboard/')
+        assert_true(self.session.is_dirty)
+
+    def test_unchanged_session_not_saved(self):
+        with mock.patch.object(self.session, 'save') as mock_save:
+            assert_false(self.session.save_if_changed())
+        assert_false(mock_save.called)
+
+    def test_changed_session_saved(self):
+        self.session.data['auth_user_id'] = 'abc12'
+        assert_true(self.session.save_if_changed())
+        assert_false(self.session.is_dirty)
+
+    def test_stale_session_saved(self):
+        self.session.date_modified = (
+            datetime.datetime.utcnow() -
+            settings.SESSION_REFRESH_INTERVAL -
+            datetime.timedelta(seconds=1)
+        )
+        assert_true(self.session.is_stale)
+        assert_true(self.session.save_if_changed())
+
+
+class LRUSessionStoreTestCase(DbTestCase):
+
+    def setUp(self, *args, **kwargs):
+        super(LRUSessionStoreTestCase, self).setUp(*args, **kwargs)
+        self.store = stores.LRUSessionStore(
+            max_size=2,
+            max_age=datetime.timedelta(minutes=1),
+        )
+        self.user = factories.UserFactory()
+        self.session = factories.SessionFactory(user=self.user)
+        self.session.save()
+
+    def tearDown(self, *args, **kwargs):
+        super(LRUSessionStoreTestCase, self).tearDown(*args, **kwargs)
+        User.remove()
+        Session.remove()
+
+    def test_load_miss_then_hit(self):
+        self.store.load(self.session._id)
+        loaded = self.store.load(self.session._id)
+        assert_equal(loaded._id, self.session._id)
+        assert_equal(loaded.data, self.session.data)
+        assert_equal(self.store.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_save_writes_through(self):
+        self.session.data['history'] = ['/dashboard/']
+        assert_true(self.store.save(self.session))
+        assert_equal(self.store.load(self.session._id).data['history'], ['/dashboard/'])
+        assert_equal(self.store.hits, 1)
+        Session._clear_caches()
+        assert_equal(Session.load(self.session._id).data['history'], ['/dashboard/'])
+
+    def test_bounded_size(self):
+        for _ in range(3):
+            self.store.save(Session())
+        assert_equal(len(self.store._cache), 2)
+
+    def test_expired_entry_reloaded(self):
+        self.store.max_age = 0
+        self.store.load(self.session._id)
+        self.store.load(self.session._id)
+        assert_equal(self.store.misses, 2)
+
+    def test_remove_for_user_purges_cache(self):
+        self.store.load(self.session._id)
+        self.store.remove_for_user(self.user._id)
+        assert_is_none(self.store.load(self.session._id))
+
+    def test_removed_elsewhere_not_served(self):
+        self.store.load(self.session._id)
+        # Removed by another process, whose cache this store cannot purge
+        Session.remove(Q('_id', 'eq', self.session._id))
+        assert_is_none(self.store.load(self.session._id))
+        assert_equal(self.store.hits, 0)
+
+    def test_changed_elsewhere_reloaded(self):
+        self.store.load(self.session._id)
+        self.session.data['auth_user_id'] = None
+        self.session.save()
+        loaded = self.store.load(self.session._id)
+        assert_is_none(loaded.data['auth_user_id'])
+        assert_equal(self.store.misses, 2)
+
+
+class TTLSessionStoreTestCase(DbTestCase):
+
+    def test_ttl_must_exceed_refresh_interval(self):
+        with assert_raises(ValueError):
+            stores.TTLSessionStore(ttl=settings.SESSION_REFRESH_INTERVAL)
+
+    @mock.patch('framework.sessions.stores.Session._storage')
+    def test_setup_updates_existing_index(self, mock_storage):
+        collection = mock_storage[0].store
+        collection.name = 'session'
+        collection.ensure_index.side_effect = OperationFailure('Index with name: date_modified_1 already exists with different options')
+        stores.TTLSessionStore(ttl=datetime.timedelta(days=1)).setup()
+        collection.database.command.assert_called_once_with(
+            'collMod', 'session',
+            index={'keyPattern': {'date_modified': 1}, 'expireAfterSeconds': 86400},
+        )
+
+    def test_create_session_store(self):
+        assert_is_instance(stores.create_session_store('mongo'), stores.MongoSessionStore)
+        assert_is_instance(stores.create_session_store('lru'), stores.LRUSessionStore)
+        with assert_raises(ValueError):
+            stores.create_session_store('memcached')
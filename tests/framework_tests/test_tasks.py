@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import mock
+import unittest
+from nose.tools import *  # noqa (PEP8 asserts)
+
+from framework.flask import app
+from framework.tasks import handlers
+
+from website import settings
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+
+
+class TestEnqueueUpdate(unittest.TestCase):
+
+    def test_runs_immediately_outside_request(self):
+        callback = mock.Mock()
+        handlers.enqueue_update('key', callback, ['title'])
+        callback.assert_called_once_with({'title'})
+
+    def test_runs_once_per_key_at_teardown(self):
+        callback = mock.Mock()
+        other = mock.Mock()
+        with app.test_request_context():
+            handlers.celery_before_request()
+            handlers.enqueue_update('key', callback, ['title'])
+            handlers.enqueue_update('key', mock.Mock(), ['description'])
+            handlers.enqueue_update('other', other)
+            assert_false(callback.called)
+            handlers.celery_teardown_request()
+        callback.assert_called_once_with({'title', 'description'})
+        other.assert_called_once_with(set())
+
+    def test_not_run_on_error(self):
+        callback = mock.Mock()
+        with app.test_request_context():
+            handlers.celery_before_request()
+            handlers.enqueue_update('key', callback)
+            handlers.celery_teardown_request(error=Exception())
+        assert_false(callback.called)
+
+    def test_updates_queued_while_flushing_are_run(self):
+        second = mock.Mock()
+        first = mock.Mock(side_effect=lambda fields: handlers.enqueue_update('second', second))
+        with app.test_request_context():
+            handlers.celery_before_request()
+            handlers.enqueue_update('first', first)
+            handlers.flush_updates()
+        assert_true(first.called)
+        assert_true(second.called)
+
+    def test_update_stats_counts_collapsed_updates(self):
+        before = handlers.update_stats()
+        with app.test_request_context():
+            handlers.celery_before_request()
+            for _ in range(3):
+                handlers.enqueue_update('key', mock.Mock())
+        after = handlers.update_stats()
+        assert_equal(after['queued'] - before['queued'], 3)
+        assert_equal(after['collapsed'] - before['collapsed'], 2)
+
+
+class TestTaskRequestContext(unittest.TestCase):
+
+    def test_runs_updates_queued_in_body(self):
+        callback = mock.Mock()
+        with handlers.task_request_context():
+            handlers.enqueue_update('key', callback)
+            assert_false(callback.called)
+        assert_true(callback.called)
+
+    def test_keeps_queues_of_outer_request(self):
+        outer = mock.Mock()
+        inner = mock.Mock()
+        with app.test_request_context():
+            handlers.celery_before_request()
+            handlers.enqueue_update('outer', outer)
+            # A task run synchronously within the request
+            with handlers.task_request_context():
+                handlers.enqueue_update('inner', inner)
+            assert_true(inner.called)
+            assert_false(outer.called)
+            handlers.celery_teardown_request()
+        assert_true(outer.called)
+
+
+class TestNodeUpdatesCoalesced(OsfTestCase):
+
+    @mock.patch('website.project.model.Node.update_search')
+    def test_search_updated_once_per_request(self, mock_update_search):
+        project = ProjectFactory(is_public=True)
+        mock_update_search.reset_mock()
+        with app.test_request_context():
+            handlers.celery_before_request()
+            project.title = 'New title'
+            project.save()
+            project.description = 'New description'
+            project.save()
+            assert_false(mock_update_search.called)
+            handlers.celery_teardown_request()
+        assert_equal(mock_update_search.call_count, 1)
+
+    @mock.patch('framework.analytics.tasks.update_node')
+    def test_piwik_updated_once_per_request_with_all_fields(self, mock_update_node):
+        project = ProjectFactory()
+        with mock.patch.object(settings, 'PIWIK_HOST', 'http://piwik.test'):
+            with app.test_request_context():
+                handlers.celery_before_request()
+                project.title = 'New title'
+                project.save()
+                project.description = 'New description'
+                project.save()
+                handlers.celery_teardown_request()
+        assert_equal(mock_update_node.call_count, 1)
+        node_id, fields = mock_update_node.call_args[0]
+        assert_equal(node_id, project._id)
+        assert_in('title', fields)
+        assert_in('description', fields)
@@ -16,6 +16,7 @@ from modularodm import Q
 from scripts import cleanup_failed_registrations as scripts
 
 from framework.auth import Auth
+from framework.exceptions import PermissionsError
 from framework.tasks import handlers
 
 from website.archiver import (
@@ -23,7 +24,11 @@ from website.archiver import (
     ARCHIVER_SUCCESS,
     ARCHIVER_FAILURE,
     ARCHIVER_NETWORK_ERROR,
-    ARCHIVER_SIZE_EXCEEDED,)
+    ARCHIVER_SIZE_EXCEEDED,
+    REGISTRATION_SNAPSHOT,
+    REGISTRATION_CLONE,
+    REGISTRATION_ADDONS,
+    REGISTRATION_ARCHIVE,)
 from website.archiver import utils as archiver_utils
 from website.app import *  # noqa
 from website.archiver import listeners
@@ -816,3 +821,171 @@ class TestArchiveJobModel(OsfTestCase):
             assert_true(node.archive_job.archive_tree_finished())
             
                    
+
+
+class TestRegistrationPipeline(OsfTestCase):
+
+    def setUp(self):
+        super(TestRegistrationPipeline, self).setUp()
+        self.user = factories.AuthUserFactory()
+        self.src = factories.ProjectFactory(creator=self.user)
+        self.child = factories.NodeFactory(creator=self.user, parent=self.src)
+        self.job = ArchiveJob(
+            src_node=self.src,
+            initiator=self.user,
+            meta={
+                'registration': {
+                    'schema': None,
+                    'template': 'Template1',
+                    'data': 'Some words',
+                    'embargo_end_date': None,
+                },
+            },
+        )
+        self.job.save()
+
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_run_registration_pipeline(self, mock_enqueue):
+        archiver_utils.run_registration_pipeline(self.job)
+        registration = self.job.dst_node
+        assert_true(registration.is_registration)
+        assert_true(registration.is_public)
+        assert_equal(registration.registered_from, self.src)
+        assert_equal(registration.nodes[0].registered_from, self.child)
+        assert_true(registration.nodes[0].is_public)
+        assert_equal(registration.archive_job, self.job)
+        assert_equal(self.job.stage, REGISTRATION_ARCHIVE)
+        assert_equal(
+            set(self.job.stage_timings),
+            {REGISTRATION_SNAPSHOT, REGISTRATION_CLONE, REGISTRATION_ADDONS, REGISTRATION_ARCHIVE},
+        )
+        assert_equal(self.job.meta['registration']['node_ids'], [self.src._id, self.child._id])
+        # Archiving starts once the registration tree is attached to the job
+        assert_true(mock_enqueue.called)
+
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_run_registration_pipeline_embargo(self, mock_enqueue):
+        end_date = datetime.datetime.utcnow() + datetime.timedelta(days=10)
+        self.job.meta['registration']['embargo_end_date'] = end_date
+        self.job.save()
+        archiver_utils.run_registration_pipeline(self.job)
+        registration = self.job.dst_node
+        assert_false(registration.is_public)
+        assert_true(registration.pending_embargo)
+        assert_in(self.user._id, self.job.meta['embargo_urls'])
+
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_run_registration_pipeline_skips_finished_stages(self, mock_enqueue):
+        self.job.finish_stage(REGISTRATION_SNAPSHOT, 0.5)
+        archiver_utils.run_registration_pipeline(self.job)
+        assert_not_in('node_ids', self.job.meta['registration'])
+        assert_equal(self.job.stage_timings[REGISTRATION_SNAPSHOT], 0.5)
+        assert_true(self.job.dst_node.is_registration)
+
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_run_registration_pipeline_failure_can_be_resumed(self, mock_enqueue):
+        # Contributors with write access to the project cannot register its
+        # components unless they can edit them
+        non_admin = factories.AuthUserFactory()
+        self.src.add_contributor(non_admin, permissions=['read', 'write'], auth=Auth(self.user))
+        self.src.save()
+        self.job.initiator = non_admin
+        self.job.save()
+        with mock.patch('website.archiver.utils.send_archiver_uncaught_error_mails') as mock_send:
+            with assert_raises(PermissionsError):
+                archiver_utils.run_registration_pipeline(self.job)
+        assert_equal(self.job.status, ARCHIVER_FAILURE)
+        assert_true(self.job.done)
+        assert_true(self.job.sent)
+        assert_true(mock_send.called)
+        assert_equal(self.job.stage, REGISTRATION_SNAPSHOT)
+        assert_equal(self.job.stage_timings, {})
+        assert_is_none(self.job.dst_node)
+
+        self.job.initiator = self.user
+        self.job.save()
+        archiver_utils.run_registration_pipeline(self.job)
+        assert_not_equal(self.job.status, ARCHIVER_FAILURE)
+        assert_true(self.job.dst_node.is_registration)
+
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_run_registration_pipeline_failure_deletes_partial_tree(self, mock_enqueue):
+        clone_registration = Node.clone_registration
+
+        def fail_on_child(node, *args, **kwargs):
+            if node._id == self.child._id:
+                raise Exception('failed')
+            return clone_registration(node, *args, **kwargs)
+
+        with mock.patch.object(Node, 'clone_registration', autospec=True, side_effect=fail_on_child):
+            with mock.patch('website.archiver.utils.send_archiver_uncaught_error_mails') as mock_send:
+                with assert_raises(Exception):
+                    archiver_utils.run_registration_pipeline(self.job)
+        assert_equal(self.job.status, ARCHIVER_FAILURE)
+        assert_equal(self.job.stage, REGISTRATION_CLONE)
+        assert_true(self.job.sent)
+        assert_true(mock_send.called)
+        registrations = Node.find(Q('is_registration', 'eq', True))
+        assert_true(registrations.count())
+        for registration in registrations:
+            assert_true(registration.is_deleted)
+        assert_false(mock_enqueue.called)
+
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_run_registration_pipeline_interrupted_clone_is_redone(self, mock_enqueue):
+        self.job.finish_stage(REGISTRATION_SNAPSHOT, 0.5)
+        leftover = factories.NodeFactory(creator=self.user, is_registration=True, registered_from=self.src)
+        self.job.meta['registration']['registration_ids'] = [leftover._id]
+        self.job.dst_node = leftover
+        self.job.save()
+        archiver_utils.run_registration_pipeline(self.job)
+        leftover.reload()
+        assert_true(leftover.is_deleted)
+        assert_not_equal(self.job.dst_node, leftover)
+        assert_false(self.job.dst_node.is_deleted)
+        assert_equal(
+            self.job.meta['registration']['registration_ids'],
+            [self.job.dst_node._id, self.job.dst_node.nodes[0]._id],
+        )
+
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_run_registration_pipeline_dispatches_addon_hooks(self, mock_enqueue):
+        with mock.patch('website.archiver.utils.settings.USE_CELERY', True):
+            with mock.patch('website.archiver.utils.celery.chord') as mock_chord:
+                archiver_utils.run_registration_pipeline(self.job)
+        # One hook task per registration, dispatched together
+        header = list(mock_chord.call_args[0][0].tasks)
+        assert_equal(
+            [task.args[1] for task in header],
+            [self.job.dst_node.nodes[0]._id, self.job.dst_node._id],
+        )
+        assert_true(mock_chord.return_value.called)
+        # The pipeline stops until the hook tasks have run
+        assert_equal(self.job.stage, REGISTRATION_ADDONS)
+        assert_not_in(REGISTRATION_ADDONS, self.job.stage_timings)
+        assert_false(mock_enqueue.called)
+
+        for task in header:
+            archiver_utils.run_registration_hooks(self.job, Node.load(task.args[1]))
+        archiver_utils.finish_registration_addon_hooks(self.job, 0)
+        assert_in(REGISTRATION_ADDONS, self.job.stage_timings)
+        assert_equal(self.job.stage, REGISTRATION_ARCHIVE)
+        assert_true(self.job.dst_node.is_public)
+        assert_true(mock_enqueue.called)
+
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_run_registration_hooks_failure_fails_job(self, mock_enqueue):
+        with mock.patch('website.archiver.utils.settings.USE_CELERY', True):
+            with mock.patch('website.archiver.utils.celery.chord'):
+                archiver_utils.run_registration_pipeline(self.job)
+        registration = self.job.dst_node
+        with mock.patch.object(Node, 'run_registration_hooks', side_effect=Exception('failed')):
+            with mock.patch('website.archiver.utils.handle_archive_fail') as mock_fail:
+                with assert_raises(Exception):
+                    archiver_utils.run_registration_hooks(self.job, registration)
+        assert_equal(self.job.status, ARCHIVER_FAILURE)
+        assert_true(mock_fail.called)
+        # The stage is not finished once the job has failed
+        archiver_utils.finish_registration_addon_hooks(self.job, 0)
+        assert_not_in(REGISTRATION_ADDONS, self.job.stage_timings)
+        assert_false(mock_enqueue.called)
@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
+import datetime
 import unittest
 import logging
 
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
 import mock
+import flask
 
 from framework.auth.core import Auth
 from website import settings
 import website.search.search as search
-from website.search import elastic_search
+from website.search import elastic_search, indexer
+from website.search import tasks as search_tasks
+from website.search.exceptions import SearchUnavailableError
 from website.search.util import build_query
+from website.search_migration import migrate as migration
 from website.search_migration.migrate import migrate
 
 from tests.base import OsfTestCase
@@ -321,6 +326,12 @@ class TestPublicNodes(SearchTestCase):
         assert_equal(docs[0]['parent_title'], 'hello & world')
         assert_true(docs[0]['parent_url'])
 
+    def test_results_do_not_load_parents(self):
+        with mock.patch('website.search.elastic_search.load_parent') as mock_load_parent:
+            docs = query('category:component AND ' + self.title)['results']
+        assert_equal(docs[0]['parent_title'], self.title)
+        assert_false(mock_load_parent.called)
+
     def test_make_parent_private(self):
         # Make parent of component, public, then private, and verify that the
         # component still appears but doesn't link to the parent in search.
@@ -699,6 +710,224 @@ class TestSearchExceptions(OsfTestCase):
         self.project.save()
 
 
+class TestSearchRequest(unittest.TestCase):
+
+    def setUp(self):
+        patch_es = mock.patch.object(elastic_search, 'es')
+        self.mock_es = patch_es.start()
+        self.addCleanup(patch_es.stop)
+        self.mock_es.search.return_value = {
+            'hits': {'total': 1, 'hits': [{'_source': {'id': 'abcde', 'category': 'user'}}]},
+            'aggregations': {
+                'counts': {'buckets': [
+                    {'key': 'user', 'doc_count': 1},
+                    {'key': 'project', 'doc_count': 2},
+                ]},
+                'tag_cloud': {'buckets': [{'key': 'tag', 'doc_count': 2}]},
+            },
+        }
+
+    def test_single_request(self):
+        results = elastic_search.search(build_query('bowie'), index='test')
+        assert_equal(self.mock_es.search.call_count, 1)
+        assert_equal(results['counts'], {'user': 1, 'project': 2, 'total': 3})
+        assert_equal(results['tags'], [{'key': 'tag', 'doc_count': 2}])
+        assert_equal(results['results'][0]['url'], '/profile/abcde')
+
+    def test_doc_type_filters_hits_only(self):
+        elastic_search.search(build_query('bowie'), index='test', doc_type='user')
+        kwargs = self.mock_es.search.call_args[1]
+        assert_is_none(kwargs['doc_type'])
+        assert_equal(kwargs['body']['post_filter'], {'terms': {'_type': ['user']}})
+        assert_in('counts', kwargs['body']['aggregations'])
+
+    def test_skip_aggregations(self):
+        results = elastic_search.search(
+            build_query('bowie'), index='test', doc_type='user', counts=False, tags=False
+        )
+        kwargs = self.mock_es.search.call_args[1]
+        assert_equal(kwargs['doc_type'], 'user')
+        assert_not_in('aggregations', kwargs['body'])
+        assert_not_in('post_filter', kwargs['body'])
+        assert_equal(results['counts'], {})
+        assert_equal(results['tags'], [])
+
+    def test_stored_parent_info_used(self):
+        source = {
+            'id': 'fghij', 'category': 'component', 'contributors': [],
+            'title': 'Component', 'url': '/fghij/', 'tags': [], 'description': '',
+            'is_registration': False, 'is_retracted': False, 'pending_retraction': False,
+            'embargo_end_date': False, 'pending_embargo': False, 'parent_id': 'abcde',
+            'parent_info': {'title': 'Parent', 'url': '/abcde/', 'is_registration': False, 'id': 'abcde'},
+        }
+        self.mock_es.search.return_value['hits']['hits'] = [{'_source': source}]
+        with mock.patch('website.search.elastic_search.load_parent') as mock_load_parent:
+            results = elastic_search.search(build_query('component'), index='test')
+        assert_false(mock_load_parent.called)
+        assert_equal(results['results'][0]['parent_title'], 'Parent')
+        assert_equal(results['results'][0]['parent_url'], '/abcde/')
+
+    def test_query_not_modified(self):
+        query = build_query('bowie')
+        elastic_search.search(query, index='test', doc_type='user')
+        assert_not_in('aggregations', query)
+        assert_not_in('post_filter', query)
+
+
+class TestIndexQueue(OsfTestCase):
+
+    def setUp(self):
+        super(TestIndexQueue, self).setUp()
+        patch_schedule = mock.patch('website.search.indexer.schedule_drain')
+        self.mock_schedule = patch_schedule.start()
+        self.addCleanup(patch_schedule.stop)
+        patch_update = mock.patch('website.search.search.bulk_update')
+        self.mock_bulk_update = patch_update.start()
+        self.mock_bulk_update.return_value = set()
+        self.addCleanup(patch_update.stop)
+        self.node = ProjectFactory(is_public=True)
+        self.user = UserFactory()
+        self.queue = indexer.get_queue()
+        self.queue.remove()
+        self.mock_schedule.reset_mock()
+
+    def test_enqueue_schedules_task(self):
+        indexer.enqueue(indexer.NODE, self.node._id)
+        assert_true(self.mock_schedule.called)
+
+
+    def test_enqueue_deduplicates(self):
+        indexer.enqueue(indexer.NODE, self.node._id)
+        indexer.enqueue(indexer.NODE, self.node._id)
+        assert_equal(self.queue.find().count(), 1)
+        assert_equal(self.queue.find_one()['version'], 2)
+
+    def test_index_queued_writes_nodes_and_users(self):
+        indexer.enqueue(indexer.NODE, self.node._id)
+        indexer.enqueue(indexer.USER, self.user._id)
+        assert_equal(indexer.index_queued(), 0)
+        self.mock_bulk_update.assert_called_once_with(nodes=[self.node], users=[self.user])
+        assert_equal(self.queue.find().count(), 0)
+
+    def test_index_queued_in_batches(self):
+        indexer.enqueue(indexer.NODE, self.node._id)
+        indexer.enqueue(indexer.USER, self.user._id)
+        indexer.index_queued(batch_size=1)
+        assert_equal(self.mock_bulk_update.call_count, 2)
+        assert_equal(self.queue.find().count(), 0)
+
+    def test_failed_documents_are_retried(self):
+        self.mock_bulk_update.return_value = {self.node._id}
+        indexer.enqueue(indexer.NODE, self.node._id)
+        assert_equal(indexer.index_queued(), 1)
+        assert_equal(self.queue.find_one()['attempts'], 1)
+        self.mock_bulk_update.return_value = set()
+        assert_equal(indexer.index_queued(), 0)
+        assert_equal(self.queue.find().count(), 0)
+
+    def test_search_unavailable_fails_batch(self):
+        self.mock_bulk_update.side_effect = SearchUnavailableError('down')
+        indexer.enqueue(indexer.NODE, self.node._id)
+        indexer.enqueue(indexer.USER, self.user._id)
+        assert_equal(indexer.index_queued(), 2)
+        assert_equal(self.queue.find({'attempts': 1}).count(), 2)
+
+    def test_gives_up_after_max_attempts(self):
+        self.mock_bulk_update.return_value = {self.node._id}
+        indexer.enqueue(indexer.NODE, self.node._id)
+        for _ in range(settings.SEARCH_INDEX_MAX_ATTEMPTS + 1):
+            indexer.index_queued()
+        assert_equal(self.mock_bulk_update.call_count, settings.SEARCH_INDEX_MAX_ATTEMPTS)
+        stats = indexer.queue_stats()
+        assert_equal(stats['depth'], 0)
+        assert_equal(stats['failed'], 1)
+
+    def test_document_queued_while_writing_is_kept(self):
+        def requeue(**kwargs):
+            indexer.enqueue(indexer.NODE, self.node._id)
+            return set()
+        self.mock_bulk_update.side_effect = requeue
+        indexer.enqueue(indexer.NODE, self.node._id)
+        indexer.index_queued()
+        assert_equal(self.queue.find().count(), 1)
+
+    def test_claimed_documents_are_skipped(self):
+        indexer.enqueue(indexer.NODE, self.node._id)
+        indexer.enqueue(indexer.USER, self.user._id)
+        self.queue.update(
+            {'doc_id': self.node._id},
+            {'$set': {'claimed_until': datetime.datetime.utcnow() + datetime.timedelta(minutes=1)}},
+        )
+        indexer.index_queued()
+        self.mock_bulk_update.assert_called_once_with(nodes=[], users=[self.user])
+        assert_equal(self.queue.find_one()['doc_id'], self.node._id)
+
+    def test_expired_claims_are_taken_over(self):
+        indexer.enqueue(indexer.NODE, self.node._id)
+        self.queue.update(
+            {'doc_id': self.node._id},
+            {'$set': {'claimed_until': datetime.datetime.utcnow() - datetime.timedelta(minutes=1)}},
+        )
+        assert_equal(indexer.index_queued(), 0)
+        assert_equal(self.queue.find().count(), 0)
+
+    def test_failed_documents_are_not_retried_by_same_drain(self):
+        self.mock_bulk_update.return_value = {self.node._id}
+        indexer.enqueue(indexer.NODE, self.node._id)
+        indexer.enqueue(indexer.USER, self.user._id)
+        assert_equal(indexer.index_queued(batch_size=1), 1)
+        assert_equal(self.mock_bulk_update.call_count, 2)
+        assert_equal(self.queue.find_one()['attempts'], 1)
+
+    def test_task_called_directly_does_not_retry(self):
+        self.mock_bulk_update.return_value = {self.node._id}
+        indexer.enqueue(indexer.NODE, self.node._id)
+        self.mock_schedule.reset_mock()
+        search_tasks.index_queued()
+        assert_equal(self.queue.find_one()['attempts'], 1)
+        # The document left in the queue gets another drain
+        self.mock_schedule.assert_called_once_with(force=True)
+
+    def test_queue_stats(self):
+        assert_equal(indexer.queue_stats(), {'depth': 0, 'failed': 0, 'lag': 0})
+        indexer.enqueue(indexer.NODE, self.node._id)
+        indexer.enqueue(indexer.USER, self.user._id)
+        stats = indexer.queue_stats()
+        assert_equal(stats['depth'], 2)
+        assert_true(stats['lag'] >= 0)
+
+    @requires_search
+    def test_update_node_enqueues_when_async(self):
+        with mock.patch.multiple(settings, SEARCH_INDEX_ASYNC=True, USE_CELERY=True):
+            search.update_node(self.node)
+        assert_equal(self.queue.find_one()['doc_id'], self.node._id)
+
+
+class TestScheduleDrain(OsfTestCase):
+
+    def setUp(self):
+        super(TestScheduleDrain, self).setUp()
+        indexer._last_scheduled = None
+
+    @mock.patch('website.search.tasks.index_queued')
+    def test_scheduled_once_per_interval(self, mock_task):
+        assert_true(indexer.schedule_drain())
+        assert_false(indexer.schedule_drain())
+        assert_equal(mock_task.si.call_count, 1)
+        mock_task.si.return_value.set.assert_called_once_with(
+            countdown=settings.SEARCH_INDEX_INTERVAL.total_seconds(),
+        )
+        indexer._last_scheduled -= settings.SEARCH_INDEX_INTERVAL.total_seconds()
+        assert_true(indexer.schedule_drain())
+        assert_equal(mock_task.si.call_count, 2)
+
+    @mock.patch('website.search.tasks.index_queued')
+    def test_forced(self, mock_task):
+        indexer.schedule_drain()
+        assert_true(indexer.schedule_drain(force=True))
+        assert_equal(mock_task.si.call_count, 2)
+
+
 class TestSearchMigration(SearchTestCase):
     # Verify that the correct indices are created/deleted during migration
 
@@ -745,3 +974,67 @@ class TestSearchMigration(SearchTestCase):
             var = self.es.indices.get_aliases()
             assert_equal(var[settings.ELASTIC_INDEX + '_v{}'.format(n + 1)]['aliases'].keys()[0], settings.ELASTIC_INDEX)
             assert not var.get(settings.ELASTIC_INDEX + '_v{}'.format(n))
+
+    def test_migration_indexes_documents(self):
+        migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app)
+        assert_equal(len(query_user(self.user.fullname)['results']), 1)
+        assert_equal(len(query('category:project AND ' + self.project.title)['results']), 1)
+
+    def test_migration_checkpoint_removed_when_done(self):
+        migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app)
+        assert_is_none(migration.get_checkpoints().find_one({'_id': settings.ELASTIC_INDEX}))
+
+    def test_migration_restores_refresh_interval(self):
+        with mock.patch('website.search_migration.migrate.get_refresh_interval', return_value='30s'):
+            migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app)
+        assert_equal(migration.get_refresh_interval(settings.ELASTIC_INDEX + '_v1'), '30s')
+
+    def test_interrupted_migration_resumes(self):
+        build_actions = migration.build_actions
+
+        def fail_on_users(args):
+            if args[0] == migration.USER:
+                raise Exception('interrupted')
+            return build_actions(args)
+
+        with mock.patch('website.search_migration.migrate.build_actions', fail_on_users):
+            with assert_raises(Exception):
+                migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app)
+        checkpoint = migration.get_checkpoints().find_one({'_id': settings.ELASTIC_INDEX})
+        assert_equal(checkpoint['index'], settings.ELASTIC_INDEX + '_v1')
+        assert_equal(checkpoint[migration.NODE], self.project._id)
+        assert_not_in(migration.USER, checkpoint)
+
+        with mock.patch('website.search_migration.migrate.Node.load_many') as mock_load_many:
+            migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app)
+        # Nodes written before the interruption are not migrated again
+        assert_false(mock_load_many.called)
+        var = self.es.indices.get_aliases()
+        assert_equal(var[settings.ELASTIC_INDEX + '_v1']['aliases'].keys()[0], settings.ELASTIC_INDEX)
+
+
+class TestMigrationBatches(OsfTestCase):
+
+    @mock.patch('framework.mongo.handlers.get_mongo_client')
+    def test_init_worker_connects(self, mock_get_client):
+        migration._init_worker()
+        try:
+            assert_equal(flask.g._mongo_client, mock_get_client.return_value)
+        finally:
+            flask._request_ctx_stack.top.pop()
+
+    def test_iter_id_batches(self):
+        users = [UserFactory() for _ in range(3)]
+        ids = sorted(user._id for user in users)
+        batches = list(migration.iter_id_batches(
+            migration.User, {'_id': {'$in': ids}}, batch_size=2
+        ))
+        assert_equal(batches, [ids[:2], ids[2:]])
+
+    def test_iter_id_batches_after(self):
+        users = [UserFactory() for _ in range(3)]
+        ids = sorted(user._id for user in users)
+        batches = list(migration.iter_id_batches(
+            migration.User, {'_id': {'$in': ids}}, after=ids[0]
+        ))
+        assert_equal(batches, [ids[1:]])
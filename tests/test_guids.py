@@ -32,6 +32,20 @@ class TestGuidStoredObject(OsfTestCase):
         assert_equal(guids[0].referent, fake_guid)
         assert_equal(guids[0]._id, fake_guid._id)
 
+    def test_create_guids(self):
+        keys = models.Node.create_guids(3)
+        assert_equal(len(set(keys)), 3)
+        guids = models.Guid.find(Q('_id', 'in', keys))
+        assert_equal(guids.count(), 3)
+        for guid in guids:
+            assert_equal(list(guid.to_storage()['referent']), [guid._id, 'node'])
+
+    def test_create_guids_skips_blacklist(self):
+        models.BlacklistGuid(_id='abcde').save()
+        with mock.patch('framework.guid.model.random.sample', side_effect=[list('abcde'), list('fghjk')]):
+            keys = models.Node.create_guids(1)
+        assert_equal(keys, ['fghjk'])
+
 
 class TestResolveGuid(OsfTestCase):
 
@@ -16,7 +16,7 @@ from modularodm import Q
 from modularodm.exceptions import ValidationError, ValidationValueError, ValidationTypeError
 
 
-from framework.analytics import get_total_activity_count
+from framework.analytics import get_total_activity_count, get_node_log_counts
 from framework.exceptions import PermissionsError
 from framework.auth import User, Auth
 from framework.sessions.model import Session
@@ -30,8 +30,8 @@ from website import filters, language, settings, mailchimp_utils
 from website.exceptions import NodeStateError
 from website.profile.utils import serialize_user
 from website.project.model import (
-    ApiKey, Comment, Node, NodeLog, Pointer, ensure_schemas, has_anonymous_link,
-    get_pointer_parent, Embargo,
+    ApiKey, Comment, Node, NodeLog, Pointer, Tag, ensure_schemas, has_anonymous_link,
+    get_pointer_parent, Embargo, ForkJob, PrivateLink, load_node_tree,
 )
 from website.util.permissions import CREATOR_PERMISSIONS
 from website.util import web_url_for, api_url_for
@@ -741,6 +741,42 @@ class TestUser(OsfTestCase):
         assert_equal(self.user.n_projects_in_common(user2), 1)
         assert_equal(self.user.n_projects_in_common(user3), 0)
 
+    def test_cocontributor_counts_updated_on_save(self):
+        user2 = UserFactory()
+        project = ProjectFactory(creator=self.user)
+        project.add_contributor(contributor=user2, auth=self.consolidate_auth)
+        assert_equal(self.user.get_cocontributor_counts(), {})
+        project.save()
+        assert_equal(self.user.get_cocontributor_counts(), {user2._id: 1})
+        assert_equal(user2.get_cocontributor_counts(), {self.user._id: 1})
+
+    def test_cocontributor_counts_after_remove(self):
+        user2 = UserFactory()
+        project = ProjectFactory(creator=self.user)
+        project.add_contributor(contributor=user2, auth=self.consolidate_auth)
+        project.save()
+        project.remove_contributor(user2, auth=self.consolidate_auth)
+        project.save()
+        assert_equal(self.user.n_projects_in_common(user2), 0)
+        assert_equal(user2.get_cocontributor_counts(), {})
+
+    def test_cocontributor_counts_match_projects_in_common(self):
+        user2 = UserFactory()
+        user3 = UserFactory()
+        for _ in range(2):
+            project = ProjectFactory(creator=self.user)
+            project.add_contributor(contributor=user2, auth=self.consolidate_auth)
+            project.add_contributor(contributor=user3, auth=self.consolidate_auth)
+            project.save()
+        assert_equal(
+            self.user.get_cocontributor_counts(),
+            {
+                user2._id: len(self.user.get_projects_in_common(user2)),
+                user3._id: len(self.user.get_projects_in_common(user3)),
+            },
+        )
+        assert_equal(user2.n_projects_in_common(user3), 2)
+
     def test_user_get_cookie(self):
         user = UserFactory()
         super_secret_key = 'children need maps'
@@ -1689,6 +1725,84 @@ class TestNodeTraversals(OsfTestCase):
         descendants = list(point1.get_descendants_recursive())
         assert_equal(len(descendants), 1)
 
+
+class TestNodeTree(OsfTestCase):
+
+    def setUp(self):
+        super(TestNodeTree, self).setUp()
+        self.user = UserFactory()
+        self.auth = Auth(user=self.user)
+        self.root = ProjectFactory(creator=self.user)
+        self.comp1 = NodeFactory(creator=self.user, parent=self.root)
+        self.comp1a = NodeFactory(creator=self.user, parent=self.comp1)
+        self.comp2 = NodeFactory(creator=self.user, parent=self.root)
+        self.other = ProjectFactory(creator=self.user)
+        self.pointer = self.root.add_pointer(self.other, auth=self.auth)
+
+    def test_children_in_order(self):
+        tree = load_node_tree(self.root)
+        assert_equal(
+            [child._id for child in tree.children(self.root)],
+            [child._id for child in self.root.nodes],
+        )
+        assert_equal(tree.children(self.comp1), [self.comp1a])
+        assert_equal(tree.children(self.comp1a), [])
+
+    def test_primary_children(self):
+        tree = load_node_tree(self.root)
+        assert_equal(tree.primary_children(self.root), [self.comp1, self.comp2])
+
+    def test_pointer_target_loaded(self):
+        tree = load_node_tree(self.root)
+        pointers = [child for child in tree.children(self.root) if not child.primary]
+        assert_equal(len(pointers), 1)
+        assert_equal(pointers[0].node, self.other)
+
+    def test_descendants_match_traversal(self):
+        tree = load_node_tree(self.root)
+        assert_equal(
+            {each._id for each in tree.descendants()},
+            {self.comp1._id, self.comp1a._id, self.comp2._id, self.pointer._id},
+        )
+
+    def test_descendants_filtered(self):
+        tree = load_node_tree(self.root)
+        descendants = list(tree.descendants(lambda n: n.primary))
+        assert_equal(set(descendants), {self.comp1, self.comp1a, self.comp2})
+
+    def test_children_of_node_outside_tree(self):
+        tree = load_node_tree(self.comp1)
+        child = NodeFactory(creator=self.user, parent=self.comp2)
+        assert_equal(tree.children(self.comp2), [child])
+
+    def test_not_recursive(self):
+        tree = load_node_tree(self.root, recursive=False)
+        assert_equal(tree.primary_children(self.root), [self.comp1, self.comp2])
+        assert_equal(tree.children(self.comp1), [self.comp1a])
+
+    def test_load_from_pointer(self):
+        child = NodeFactory(creator=self.user, parent=self.other)
+        tree = load_node_tree(self.pointer)
+        assert_equal(tree.root, self.other)
+        assert_equal(tree.children(self.pointer), [child])
+
+    @mock.patch('website.project.model.Node.find_descendants')
+    def test_query_count_independent_of_depth(self, mock_find_descendants):
+        mock_find_descendants.return_value = [self.comp1, self.comp1a, self.comp2]
+        with mock.patch.object(Node, 'load_many', wraps=Node.load_many) as mock_load_many:
+            load_node_tree(self.root)
+        assert_equal(mock_find_descendants.call_count, 1)
+        assert_equal(mock_load_many.call_count, 1)
+
+    def test_next_descendants_with_tree(self):
+        tree = load_node_tree(self.root)
+        descendants = self.root.next_descendants(
+            self.auth,
+            condition=lambda auth, node: node == self.comp1a,
+            tree=tree,
+        )
+        assert_equal(descendants, [(self.comp1, [(self.comp1a, [])])])
+
 class TestRemoveNode(OsfTestCase):
 
     def setUp(self):
@@ -2242,8 +2356,50 @@ class TestProject(OsfTestCase):
         user = UserFactory()
         node = NodeFactory(parent=self.project, creator=user)
         self.project.set_permissions(self.project.creator, ['read', 'write'])
+        self.project.save()
         assert_false(node.is_admin_parent(self.project.creator))
 
+    def test_inherited_admin_ids(self):
+        user = UserFactory()
+        parent_node = NodeFactory(parent=self.project, creator=user)
+        child_node = NodeFactory(parent=parent_node, creator=user)
+        assert_equal(parent_node.inherited_admin_ids, [self.project.creator._id])
+        assert_equal(
+            set(child_node.inherited_admin_ids),
+            {self.project.creator._id, user._id},
+        )
+
+    def test_inherited_admin_ids_updated_with_permissions(self):
+        user = UserFactory()
+        child_node = NodeFactory(parent=self.project, creator=self.project.creator)
+        self.project.add_contributor(user, permissions=['read', 'write', 'admin'], auth=self.consolidate_auth)
+        self.project.save()
+        assert_in(user._id, child_node.inherited_admin_ids)
+        self.project.set_permissions(user, ['read', 'write'], save=True)
+        assert_not_in(user._id, child_node.inherited_admin_ids)
+        assert_false(child_node.is_admin_parent(user))
+
+    def test_inherited_admin_ids_not_cascaded_without_admin_change(self):
+        child_node = NodeFactory(parent=self.project, creator=self.project.creator)
+        user = UserFactory()
+        with mock.patch.object(Node, '_update_descendants') as mock_update:
+            self.project.add_contributor(user, permissions=['read', 'write'], auth=self.consolidate_auth)
+            self.project.save()
+        assert_false(mock_update.called)
+        assert_equal(child_node.inherited_admin_ids, [self.project.creator._id])
+
+    def test_inherited_admin_ids_kept_below_other_admin_node(self):
+        user = UserFactory()
+        child_node = NodeFactory(parent=self.project, creator=self.project.creator)
+        child_node.add_contributor(user, permissions=['read', 'write', 'admin'], auth=self.consolidate_auth)
+        child_node.save()
+        grandchild_node = NodeFactory(parent=child_node, creator=self.project.creator)
+        self.project.add_contributor(user, permissions=['read', 'write', 'admin'], auth=self.consolidate_auth)
+        self.project.save()
+        self.project.set_permissions(user, ['read', 'write'], save=True)
+        assert_not_in(user._id, child_node.inherited_admin_ids)
+        assert_in(user._id, grandchild_node.inherited_admin_ids)
+
     def test_has_permission_read_parent_admin(self):
         user = UserFactory()
         node = NodeFactory(parent=self.project, creator=user)
@@ -2331,6 +2487,68 @@ class TestProject(OsfTestCase):
         assert_equal(child1.parents, [self.project])
         assert_equal(child2.parents, [child1, self.project])
 
+    def test_ancestor_ids(self):
+        child1 = ProjectFactory(parent=self.project)
+        child2 = ProjectFactory(parent=child1)
+        assert_equal(self.project.ancestor_ids, [])
+        assert_equal(child2.ancestor_ids, [child1._id, self.project._id])
+        assert_equal(child2.depth, 2)
+        assert_equal(child2.root, self.project)
+        assert_equal(child2.ids_above, {child1._id, self.project._id})
+
+    def test_ancestor_ids_ignore_pointers(self):
+        pointed = ProjectFactory()
+        self.project.add_pointer(pointed, auth=self.consolidate_auth)
+        assert_equal(pointed.ancestor_ids, [])
+
+    def test_ancestor_ids_of_fork(self):
+        child = NodeFactory(parent=self.project, creator=self.user)
+        fork = self.project.fork_node(auth=self.consolidate_auth)
+        assert_equal(fork.ancestor_ids, [])
+        assert_equal(fork.nodes[0].ancestor_ids, [fork._id])
+        assert_equal(child.ancestor_ids, [self.project._id])
+
+    def test_find_descendants(self):
+        child1 = ProjectFactory(parent=self.project)
+        child2 = ProjectFactory(parent=child1)
+        ProjectFactory()
+        assert_equal(set(self.project.find_descendants()), {child1, child2})
+        assert_equal(list(child1.find_descendants()), [child2])
+
+    def test_ancestor_ids_cleared_when_detached(self):
+        child1 = ProjectFactory(parent=self.project)
+        child2 = ProjectFactory(parent=child1)
+        self.project.nodes.remove(child1)
+        self.project.save()
+        assert_equal(child1.ancestor_ids, [])
+        assert_equal(child1.inherited_admin_ids, [])
+        assert_equal(child2.ancestor_ids, [child1._id])
+        assert_equal(list(self.project.find_descendants()), [])
+
+    def test_ancestor_ids_updated_below_moved_node(self):
+        other = ProjectFactory(creator=self.project.creator)
+        child1 = ProjectFactory(parent=self.project)
+        child2 = ProjectFactory(parent=child1)
+        child3 = ProjectFactory(parent=child2)
+        self.project.nodes.remove(child1)
+        self.project.save()
+        other.nodes.append(child1)
+        other.save()
+        assert_equal(child1.ancestor_ids, [other._id])
+        assert_equal(child2.ancestor_ids, [child1._id, other._id])
+        assert_equal(child3.ancestor_ids, [child2._id, child1._id, other._id])
+        assert_in(other.creator._id, child3.inherited_admin_ids)
+
+    def test_ancestor_ids_stop_at_deleted_node(self):
+        child1 = ProjectFactory(parent=self.project)
+        child2 = ProjectFactory(parent=child1)
+        child1.is_deleted = True
+        child1.save()
+        assert_equal(child2.ancestor_ids, [])
+        assert_equal(child2.depth, len(child2.parents))
+        assert_equal(child2.ids_above, set())
+        assert_equal(set(self.project.find_descendants()), {child1})
+
     def test_admin_contributor_ids(self):
         assert_equal(self.project.admin_contributor_ids, set())
         child1 = ProjectFactory(parent=self.project)
@@ -2563,11 +2781,128 @@ class TestProject(OsfTestCase):
             list(reversed(self.project.logs))
         )
 
+    def test_logs_reference_node(self):
+        log = self.project.add_log(
+            NodeLog.EDITED_TITLE,
+            params={'project': self.project._id},
+            auth=self.consolidate_auth,
+        )
+        assert_equal(log.node_ids, [self.project._id])
+        assert_equal(log.logged_node, self.project)
+        assert_equal(self.project.logs[-1], log)
+        assert_in(log, self.project.logs)
+        assert_equal(len(self.project.logs), 2)
+
+    def test_fork_shares_logs(self):
+        fork = self.project.fork_node(auth=self.consolidate_auth)
+        original_logs = list(self.project.logs)
+        assert_equal(list(fork.logs)[:-1], original_logs)
+        assert_equal(fork.logs[-1].action, NodeLog.NODE_FORKED)
+        assert_not_in(fork.logs[-1], self.project.logs)
+
+    def test_fork_shares_logs_by_reference(self):
+        original_logs = list(self.project.logs)
+        fork = self.project.fork_node(auth=self.consolidate_auth)
+        for each in original_logs:
+            each.reload()
+            assert_equal(each.node_ids, [self.project._id])
+        assert_equal(fork.log_sources[0]['node'], self.project._id)
+        log = self.project.add_log(
+            NodeLog.EDITED_TITLE,
+            params={'project': self.project._id},
+            auth=self.consolidate_auth,
+        )
+        assert_not_in(log, fork.logs)
+
+    def test_fork_of_fork_shares_original_logs(self):
+        fork = self.project.fork_node(auth=self.consolidate_auth)
+        self.project.add_log(
+            NodeLog.EDITED_TITLE,
+            params={'project': self.project._id},
+            auth=self.consolidate_auth,
+        )
+        fork_of_fork = fork.fork_node(auth=self.consolidate_auth)
+        assert_equal(list(fork_of_fork.logs)[:-1], list(fork.logs))
+
+    def test_assign_logs_of_fork(self):
+        fork = self.project.fork_node(auth=self.consolidate_auth)
+        fork_log = fork.logs[-1]
+        fork.logs = [fork_log]
+        assert_equal(list(fork.logs), [fork_log])
+        assert_equal(fork.log_sources, [])
+        assert_equal(len(self.project.logs), 1)
+
+    def test_unmigrated_node_includes_embedded_logs(self):
+        log = NodeLogFactory()
+        NodeLog._storage[0].store.update({'_id': log._id}, {'$set': {'node_ids': []}})
+        Node._storage[0].store.update({'_id': self.project._id}, {'$set': {'logs': [log._id]}})
+        Node._clear_caches()
+        NodeLog._clear_caches()
+        project = Node.load(self.project._id)
+        assert_in(log._id, [each._id for each in project.logs])
+        # Forking migrates the embedded logs before sharing them
+        fork = project.fork_node(auth=self.consolidate_auth)
+        assert_in(log._id, [each._id for each in fork.logs])
+        assert_not_in('logs', Node._storage[0].store.find_one({'_id': project._id}))
+
+    def test_assign_logs(self):
+        original_logs = list(self.project.logs)
+        log = NodeLogFactory()
+        self.project.logs = [log, None]
+        assert_equal(list(self.project.logs), [log])
+        for each in original_logs:
+            each.reload()
+            assert_not_in(self.project._id, each.node_ids)
+        self.project.logs = []
+        assert_equal(len(self.project.logs), 0)
+
+    def test_add_log_increments_counters(self):
+        total, user_count = get_node_log_counts(self.project._id, self.user._id)
+        self.project.add_log(
+            NodeLog.EDITED_TITLE,
+            params={'project': self.project._id},
+            auth=self.consolidate_auth,
+        )
+        assert_equal(
+            get_node_log_counts(self.project._id, self.user._id),
+            (total + 1, user_count + 1),
+        )
+        assert_equal(total + 1, len(self.project.logs))
+
+    def test_fork_copies_log_counters(self):
+        fork = self.project.fork_node(auth=self.consolidate_auth)
+        total, user_count = get_node_log_counts(fork._id, self.user._id)
+        assert_equal(total, len(fork.logs))
+        assert_equal(user_count, len(fork.logs))
+
     def test_date_modified(self):
-        self.project.logs.append(NodeLogFactory())
+        self.project.add_log(
+            NodeLog.EDITED_TITLE,
+            params={'project': self.project._id},
+            auth=self.consolidate_auth,
+        )
         assert_equal(self.project.date_modified, self.project.logs[-1].date)
         assert_not_equal(self.project.date_modified, self.project.date_created)
 
+    def test_date_modified_is_stored(self):
+        self.project.add_log(
+            NodeLog.EDITED_TITLE,
+            params={'project': self.project._id},
+            auth=self.consolidate_auth,
+        )
+        self.project.reload()
+        assert_equal(self.project.date_modified, self.project.logs[-1].date)
+        assert_equal(
+            Node.find_one(Q('date_modified', 'eq', self.project.date_modified)),
+            self.project,
+        )
+
+    def test_date_modified_without_logs(self):
+        node = Node(title='No logs', creator=self.user, category='hypothesis')
+        node.save(suppress_log=True)
+        assert_equal(node.logs, [])
+        assert_is_not_none(node.date_modified)
+
     def test_replace_contributor(self):
         contrib = UserFactory()
         self.project.add_contributor(contrib, auth=Auth(self.project.creator))
@@ -2978,6 +3313,165 @@ class TestForkNode(OsfTestCase):
             self.registration,
         )
 
+    def test_fork_calls_on_forked_for_each_node(self):
+        component = NodeFactory(creator=self.user)
+        self.project.nodes.append(component)
+        self.project.save()
+        forked = []
+        fork = self.project.fork_node(
+            self.consolidate_auth,
+            on_forked=lambda original, fork: forked.append((original, fork)),
+        )
+        assert_equal(forked, [(component, fork.nodes[0]), (self.project, fork)])
+
+    def test_fork_links_tree_and_backrefs(self):
+        component = NodeFactory(creator=self.user, parent=self.project)
+        self.project.add_tag('fork', self.consolidate_auth)
+        fork = self.project.fork_node(self.consolidate_auth)
+        component_fork = fork.nodes[0]
+        assert_equal(component_fork.parent_node, fork)
+        assert_equal(component_fork.ancestor_ids, [fork._id])
+        assert_equal(component_fork.inherited_admin_ids, [self.user._id])
+        assert_in(fork, self.user.node__contributed)
+        assert_in(component_fork, self.user.node__created)
+        assert_in(component_fork, component.node__forked)
+        assert_in(fork, Tag.load('fork').node__tagged)
+        assert_equal(Guid.load(component_fork._id).referent, component_fork)
+        fork_log = component_fork.logs[-1]
+        assert_in(fork_log, self.user.nodelog__created)
+        assert_equal(fork_log.params['parent_node'], self.project._id)
+        assert_equal(
+            get_node_log_counts(component_fork._id, self.user._id),
+            (len(component.logs) + 1, len(component.logs) + 1),
+        )
+
+    def test_fork_inserts_nodes_in_bulk(self):
+        NodeFactory(creator=self.user, parent=self.project)
+        with mock.patch.object(Node, 'save', autospec=True) as mock_save:
+            self.project.fork_node(self.consolidate_auth)
+        saved = set(node._id for (node, ), _ in mock_save.call_args_list)
+        assert_not_in(self.project._id, saved)
+        assert_equal(Node.find(Q('is_fork', 'eq', True)).count(), 2)
+
+    def test_cannot_fork_folder(self):
+        folder = FolderFactory(creator=self.user)
+        with assert_raises(NodeStateError):
+            folder.fork_node(self.consolidate_auth)
+
+    def test_addon_failure_removes_forks(self):
+        component = NodeFactory(creator=self.user, parent=self.project)
+        get_addons = Node.get_addons
+
+        def fail_on_project(node):
+            if node._id == self.project._id:
+                raise Exception('failed')
+            return get_addons(node)
+
+        with mock.patch.object(Node, 'get_addons', autospec=True, side_effect=fail_on_project):
+            with assert_raises(Exception):
+                self.project.fork_node(self.consolidate_auth)
+        forks = Node.find(Q('forked_from', 'in', [self.project._id, component._id]))
+        assert_equal(forks.count(), 2)
+        for fork in forks:
+            assert_true(fork.is_deleted)
+
+
+class TestForkJob(OsfTestCase):
+
+    def setUp(self):
+        super(TestForkJob, self).setUp()
+        self.user = UserFactory()
+        self.auth = Auth(user=self.user)
+        self.project = ProjectFactory(creator=self.user)
+        self.component = NodeFactory(creator=self.user)
+        self.project.nodes.append(self.component)
+        self.project.save()
+
+    def test_create_plans_readable_nodes(self):
+        private = NodeFactory()
+        deleted = NodeFactory(creator=self.user, is_deleted=True)
+        self.project.nodes.extend([private, deleted])
+        self.project.save()
+        job = ForkJob.create(self.project, self.auth)
+        assert_equal(job.status, ForkJob.PENDING)
+        assert_equal(job.planned_node_ids, [self.project._id, self.component._id])
+        assert_not_in(private._id, job.planned_node_ids)
+        assert_not_in(deleted._id, job.planned_node_ids)
+
+    def test_create_skips_subtrees_fork_node_skips(self):
+        private = NodeFactory()
+        below_private = NodeFactory(creator=self.user)
+        private.nodes.append(below_private)
+        private.save()
+        self.project.nodes.append(private)
+        self.project.add_pointer(ProjectFactory(creator=self.user), auth=self.auth)
+        self.project.save()
+        job = ForkJob.create(self.project, self.auth)
+        assert_equal(
+            set(job.planned_node_ids),
+            {self.project._id, self.component._id},
+        )
+        job.run()
+        assert_equal(job.status, ForkJob.SUCCESS)
+        assert_equal(job.progress, 1.0)
+
+    def test_create_non_contributor_private_node(self):
+        with assert_raises(PermissionsError):
+            ForkJob.create(self.project, Auth(user=UserFactory()))
+
+    def test_create_refuses_folders(self):
+        with assert_raises(NodeStateError):
+            ForkJob.create(FolderFactory(creator=self.user), self.auth)
+        with assert_raises(NodeStateError):
+            ForkJob.create(DashboardFactory(creator=self.user), self.auth)
+        assert_equal(ForkJob.find().count(), 0)
+
+    def test_run(self):
+        job = ForkJob.create(self.project, self.auth)
+        fork = job.run()
+        assert_equal(job.status, ForkJob.SUCCESS)
+        assert_equal(job.dst_node, fork)
+        assert_equal(fork.forked_from, self.project)
+        assert_equal(job.forked_node_ids, [fork.nodes[0]._id, fork._id])
+        assert_equal(job.progress, 1.0)
+        assert_true(job.done)
+        assert_true(job.date_finished)
+
+    def test_run_failure(self):
+        job = ForkJob.create(self.project, self.auth)
+        self.project.is_deleted = True
+        self.project.save()
+        assert_is_none(job.run())
+        assert_equal(job.status, ForkJob.FAILURE)
+        assert_true(job.error)
+        assert_true(job.done)
+
+    def test_run_failure_removes_partial_fork(self):
+        job = ForkJob.create(self.project, self.auth)
+        get_addons = Node.get_addons
+
+        def fail_on_project(node):
+            if node._id == self.project._id:
+                raise Exception('failed')
+            return get_addons(node)
+
+        with mock.patch.object(Node, 'get_addons', autospec=True, side_effect=fail_on_project):
+            assert_is_none(job.run())
+        assert_equal(job.status, ForkJob.FAILURE)
+        assert_equal(job.forked_node_ids, [self.component.node__forked[0]._id])
+        forks = Node.find(Q('forked_from', 'in', [self.project._id, self.component._id]))
+        assert_equal(forks.count(), 2)
+        for node in forks:
+            assert_true(node.is_deleted)
+        assert_false(self.project.is_deleted)
+        assert_false(self.component.is_deleted)
+
+    def test_progress(self):
+        job = ForkJob.create(self.project, self.auth)
+        assert_equal(job.progress, 0.0)
+        job.record_forked(self.component, NodeFactory())
+        assert_equal(job.progress, 0.5)
+
 
 class TestRegisterNode(OsfTestCase):
 
@@ -3730,6 +4224,75 @@ class TestPrivateLink(OsfTestCase):
         link.save()
         assert_equal(link.node_scale(node), -40)
 
+    def test_get_private_link(self):
+        link = PrivateLinkFactory()
+        project = ProjectFactory()
+        other = ProjectFactory()
+        link.nodes.append(project)
+        link.save()
+        assert_equal(project.get_private_link(link.key), link)
+        assert_is_none(other.get_private_link(link.key))
+        assert_is_none(project.get_private_link(''))
+
+    def test_is_private_link_key_active(self):
+        link = PrivateLinkFactory()
+        project = ProjectFactory()
+        link.nodes.append(project)
+        link.save()
+        assert_true(project.is_private_link_key_active(link.key))
+        assert_false(project.is_private_link_key_deleted(link.key))
+        link.is_deleted = True
+        link.save()
+        assert_false(project.is_private_link_key_active(link.key))
+        assert_true(project.is_private_link_key_deleted(link.key))
+
+    def test_private_link_keys_follow_link(self):
+        link = PrivateLinkFactory()
+        project = ProjectFactory()
+        other = ProjectFactory()
+        link.nodes.extend([project, other])
+        link.save()
+        assert_equal(project.private_link_keys, [link.key])
+        assert_equal(other.private_link_keys, [link.key])
+        link.nodes.remove(other)
+        link.save()
+        assert_equal(project.private_link_keys, [link.key])
+        assert_equal(other.private_link_keys, [])
+        link.is_deleted = True
+        link.save()
+        project.reload()
+        assert_equal(project.private_link_keys, [])
+
+    def test_private_link_keys_not_overwritten_by_node_save(self):
+        project = ProjectFactory()
+        link = PrivateLinkFactory()
+        link.nodes.append(project)
+        link.save()
+        project.title = 'New title'
+        project.save()
+        project.reload()
+        assert_equal(project.private_link_keys, [link.key])
+
+    def test_private_link_keys_not_copied_to_fork(self):
+        project = ProjectFactory()
+        link = PrivateLinkFactory()
+        link.nodes.append(project)
+        link.save()
+        fork = project.fork_node(Auth(project.creator))
+        assert_equal(fork.private_link_keys, [])
+        assert_false(fork.is_private_link_key_active(link.key))
+
+    def test_is_private_link_key_active_runs_no_query(self):
+        link = PrivateLinkFactory()
+        project = ProjectFactory()
+        link.nodes.append(project)
+        link.save()
+        project.reload()
+        with mock.patch.object(PrivateLink, 'find') as mock_find:
+            assert_true(project.is_private_link_key_active(link.key))
+            assert_false(project.is_private_link_key_active('notakey'))
+        assert_false(mock_find.called)
+
 
 if __name__ == '__main__':
     unittest.main()
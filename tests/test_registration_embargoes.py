@@ -624,6 +624,10 @@ class RegistrationEmbargoViewsTestCase(OsfTestCase):
             u'summary': unicode(fake.sentence())
         })
 
+    def _run_registration_job(self, mock_enqueue):
+        # The view queues the registration pipeline; run it in place
+        mock_enqueue.call_args_list[0][0][0]()
+
     @mock.patch('framework.tasks.handlers.enqueue_task')
     def test_POST_register_make_public_immediately_creates_public_registration(self, mock_enqueue):
         res = self.app.post(
@@ -632,6 +636,7 @@ class RegistrationEmbargoViewsTestCase(OsfTestCase):
             content_type='application/json',
             auth=self.user.auth
         )
+        self._run_registration_job(mock_enqueue)
         assert_equal(res.status_code, 201)
 
         registration = Node.find().sort('-registered_date')[0]
@@ -663,6 +668,7 @@ class RegistrationEmbargoViewsTestCase(OsfTestCase):
             content_type='application/json',
             auth=self.user.auth
         )
+        self._run_registration_job(mock_enqueue)
         self.project.reload()
         # Last node directly registered from self.project
         registration = Node.load(self.project.node__registrations[-1])
@@ -679,6 +685,7 @@ class RegistrationEmbargoViewsTestCase(OsfTestCase):
             content_type='application/json',
             auth=self.user.auth
         )
+        self._run_registration_job(mock_enqueue)
 
         assert_equal(res.status_code, 201)
 
@@ -710,6 +717,7 @@ class RegistrationEmbargoViewsTestCase(OsfTestCase):
             content_type='application/json',
             auth=self.user.auth
         )
+        self._run_registration_job(mock_enquque)
         self.project.reload()
         # Logs: Created, registered, embargo initiated
         assert_equal(len(self.project.logs), initial_project_logs + 1)
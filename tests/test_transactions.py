@@ -14,7 +14,7 @@ from pymongo.errors import CollectionInvalid, OperationFailure
 from framework.flask import add_handlers
 from framework.mongo import database
 from framework.mongo import handlers as database_handlers
-from framework.transactions import context, handlers, commands, messages, utils
+from framework.transactions import context, handlers, commands, messages, utils, retry
 
 from flask import Flask, abort
 app = Flask('test_transactions_app')
@@ -95,7 +95,7 @@ class TestTransactionHandlers(DbTestCase):
     def setUp(self):
         super(TestTransactionHandlers, self).setUp()
         self.clear_transactions()
-        self.context = app.test_request_context('/')
+        self.context = app.test_request_context('/', method='POST')
         self.context.push()
 
     def tearDown(self):
@@ -151,11 +151,12 @@ class TestTransactionHandlers(DbTestCase):
             0,
         )
 
+    @mock.patch('framework.transactions.handlers.settings.TRANSACTION_RETRY_ATTEMPTS', 1)
     def test_after_request_lock_error(self):
         commands.begin()
         key = 'test_after_request_lock_error'
         database['txn'].insert({'_id': key})
-        with app.test_request_context(content_type='application/json'):
+        with app.test_request_context(content_type='application/json', method='POST'):
             response = make_response('bob', 200)
             with mock.patch('framework.transactions.commands.commit') as mock_commit:
                 mock_commit.side_effect = OperationFailure(messages.LOCK_ERROR)
@@ -168,17 +169,38 @@ class TestTransactionHandlers(DbTestCase):
         )
 
 
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_should_retry(self):
+        policy = retry.RetryPolicy(max_attempts=3, base=0.1, cap=1)
+        assert_true(policy.should_retry(1))
+        assert_true(policy.should_retry(2))
+        assert_false(policy.should_retry(3))
+
+    def test_backoff_bounded(self):
+        policy = retry.RetryPolicy(max_attempts=10, base=0.1, cap=0.5)
+        for attempt in range(1, 10):
+            delay = policy.backoff(attempt)
+            assert_true(0 <= delay <= min(0.5, 0.1 * 2 ** (attempt - 1)))
+
+
 transaction_app = Flask('test_transactions_app')
 
 add_handlers(transaction_app, database_handlers.handlers)
 add_handlers(transaction_app, handlers.handlers)
 
 
-@transaction_app.route('/transact/me/bro/', methods=['GET'])
+@transaction_app.route('/transact/me/bro/', methods=['GET', 'POST'])
 def transaction_view():
     return make_response()
 
 
+@transaction_app.route('/force/transact/me/bro/', methods=['GET'])
+@handlers.force_auto_transaction
+def force_transaction_view():
+    return make_response()
+
+
 @handlers.no_auto_transaction
 @transaction_app.route('/dont/transact/me/bro/', methods=['GET'])
 def no_transaction_view():
@@ -191,6 +213,13 @@ def no_transaction_view_reverse_decorators():
     return make_response()
 
 
+@transaction_app.route('/sometimes/write/bro/', methods=['GET', 'POST'])
+def safe_request_transaction_view():
+    with handlers.safe_request_transaction():
+        pass
+    return make_response()
+
+
 test_app = webtest_plus.TestApp(transaction_app)
 
 
@@ -200,11 +229,62 @@ class TestSkipTransactions(DbTestCase):
     @mock.patch('framework.transactions.commands.rollback')
     @mock.patch('framework.transactions.commands.begin')
     def test_no_skip(self, mock_begin, mock_rollback, mock_commit):
+        test_app.post('/transact/me/bro/')
+        assert_true(mock_begin.called)
+        assert_true(mock_rollback.called)
+        assert_true(mock_commit.called)
+
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_skip_safe_method(self, mock_begin, mock_rollback, mock_commit):
+        handlers.skipped_commands.clear()
         test_app.get('/transact/me/bro/')
+        assert_false(mock_begin.called)
+        assert_false(mock_commit.called)
+        assert_equal(sum(handlers.skipped_commands.values()), 2)
+
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_skip_safe_method_rolls_back_open_transaction(self, mock_begin, mock_rollback, mock_commit):
+        test_app.get('/transact/me/bro/')
+        mock_rollback.assert_called_once_with()
+
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_force_transaction_safe_method(self, mock_begin, mock_rollback, mock_commit):
+        test_app.get('/force/transact/me/bro/')
         assert_true(mock_begin.called)
         assert_true(mock_rollback.called)
         assert_true(mock_commit.called)
 
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_safe_request_transaction_safe_method(self, mock_begin, mock_rollback, mock_commit):
+        test_app.get('/sometimes/write/bro/')
+        mock_begin.assert_called_once_with(mock.ANY)
+        mock_commit.assert_called_once_with(mock.ANY)
+
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_safe_request_transaction_joins_request_transaction(self, mock_begin, mock_rollback, mock_commit):
+        test_app.post('/sometimes/write/bro/')
+        mock_begin.assert_called_once_with()
+        mock_commit.assert_called_once_with()
+
+    @mock.patch('framework.transactions.handlers.settings.SKIP_SAFE_METHOD_TRANSACTIONS', False)
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_no_skip_safe_method_if_disabled(self, mock_begin, mock_rollback, mock_commit):
+        test_app.get('/transact/me/bro/')
+        assert_true(mock_begin.called)
+        assert_true(mock_commit.called)
+
     @mock.patch('framework.transactions.commands.commit')
     @mock.patch('framework.transactions.commands.rollback')
     @mock.patch('framework.transactions.commands.begin')
@@ -266,6 +346,84 @@ class TestTransactionIntegration(DbTestCase):
         )
 
 
+retry_calls = []
+after_request_calls = []
+
+
+@transaction_app.after_request
+def count_after_request(response):
+    after_request_calls.append(1)
+    return response
+
+
+@transaction_app.route('/write/with/retry/', methods=['POST'])
+@handlers.retry_on_lock_error
+def write_with_retry():
+    retry_calls.append(1)
+    return 'success'
+
+
+@mock.patch('framework.transactions.handlers.time.sleep')
+@mock.patch('framework.transactions.commands.rollback')
+@mock.patch('framework.transactions.commands.begin')
+@mock.patch('framework.transactions.commands.commit')
+class TestLockRetry(DbTestCase):
+
+    def setUp(self):
+        super(TestLockRetry, self).setUp()
+        del retry_calls[:]
+        del after_request_calls[:]
+        retry.metrics.reset()
+
+    def test_retry_after_lock_error(self, mock_commit, mock_begin, mock_rollback, mock_sleep):
+        mock_commit.side_effect = [OperationFailure(messages.LOCK_ERROR), None]
+        res = test_app.post('/write/with/retry/')
+        assert_equal(res.status_code, 200)
+        assert_equal(len(retry_calls), 2)
+        assert_equal(mock_begin.call_count, 2)
+        assert_equal(mock_commit.call_count, 2)
+        # Only the view is re-run
+        assert_equal(len(after_request_calls), 1)
+        assert_equal(mock_sleep.call_count, 1)
+        stats = retry.metrics.stats()['write_with_retry']
+        assert_equal(stats['conflicts'], 1)
+        assert_equal(stats['retries'], 1)
+        assert_equal(stats['commits'], 1)
+        assert_equal(stats['conflict_rate'], 0.5)
+
+    @mock.patch('framework.transactions.handlers.settings.TRANSACTION_RETRY_ATTEMPTS', 2)
+    def test_retries_exhausted(self, mock_commit, mock_begin, mock_rollback, mock_sleep):
+        mock_commit.side_effect = OperationFailure(messages.LOCK_ERROR)
+        res = test_app.post('/write/with/retry/', content_type='application/json', expect_errors=True)
+        assert_equal(res.status_code, handlers.LOCK_ERROR_CODE)
+        assert_equal(len(retry_calls), 2)
+        assert_equal(retry.metrics.failures['write_with_retry'], 1)
+
+
+class TestWritingSafeMethodViews(unittest.TestCase):
+
+    def test_oauth_callbacks_force_transaction(self):
+        from website.addons.box.views.auth import box_oauth_finish
+        from website.addons.dropbox.views.auth import dropbox_oauth_finish
+        from website.addons.figshare.views.auth import figshare_oauth_callback
+        from website.addons.github.views.auth import github_oauth_callback
+        from website.addons.googledrive.views.auth import googledrive_oauth_finish
+        views = [
+            box_oauth_finish,
+            dropbox_oauth_finish,
+            figshare_oauth_callback,
+            github_oauth_callback,
+            googledrive_oauth_finish,
+        ]
+        for view in views:
+            assert_true(getattr(view, handlers.FORCE_AUTO_TRANSACTION_ATTR, False))
+
+    def test_dashboard_views_force_transaction(self):
+        from website.views import dashboard, get_dashboard
+        for view in [dashboard, get_dashboard]:
+            assert_true(getattr(view, handlers.FORCE_AUTO_TRANSACTION_ATTR, False))
+
+
 if __name__ == '__main__':
     unittest.run()
 
@@ -26,7 +26,7 @@ from framework.tasks import handlers
 from website import mailchimp_utils
 from website.views import _rescale_ratio
 from website.util import permissions, sanitize
-from website.models import Node, Pointer, NodeLog
+from website.models import Node, Pointer, NodeLog, ForkJob, ArchiveJob
 from website.project.model import ensure_schemas, has_anonymous_link
 from website.project.views.contributor import (
     send_claim_email,
@@ -505,6 +505,18 @@ class TestProjectViews(OsfTestCase):
         reg = Node.load(self.project.node__registrations[-1])
         assert_true(reg.is_registration)
 
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_register_template_with_folder_component_is_rejected(self, mock_enqueue):
+        folder = FolderFactory(creator=self.user1)
+        self.project.nodes.append(folder)
+        self.project.save()
+        url = "/api/v1/project/{0}/register/Replication_Recipe_(Brandt_et_al.,_2013):_Post-Completion/".format(
+            self.project._primary_key)
+        res = self.app.post_json(url, {'registrationChoice': 'immediate'}, auth=self.auth, expect_errors=True)
+        assert_equal(res.status_code, http.BAD_REQUEST)
+        assert_false(mock_enqueue.called)
+        assert_equal(ArchiveJob.find(Q('src_node', 'eq', self.project)).count(), 0)
+
     @mock.patch('framework.tasks.handlers.enqueue_task')
     def test_register_template_make_public_creates_public_registration(self, mock_enquque):
         url = "/api/v1/project/{0}/register/Replication_Recipe_(Brandt_et_al.,_2013):_Post-Completion/".format(
@@ -4070,6 +4082,57 @@ class TestForkViews(OsfTestCase):
         assert_equal(len(res.json['nodes']), 1)
         assert_equal(res.json['nodes'][0]['id'], fork._id)
 
+    @mock.patch('website.project.views.node.project_tasks.fork_node')
+    def test_fork_job_start(self, mock_fork_node):
+        url = self.project.api_url_for('node_fork_job_start')
+        res = self.app.post_json(url, auth=self.user.auth)
+        assert_equal(res.status_code, http.ACCEPTED)
+        job = ForkJob.load(res.json['id'])
+        mock_fork_node.assert_called_once_with(job._id)
+        assert_equal(res.json['status'], ForkJob.PENDING)
+        assert_equal(res.json['total'], 1)
+        assert_equal(
+            res.json['status_url'],
+            self.project.api_url_for('node_fork_job_status', job_id=job._id),
+        )
+
+    def test_fork_job_start_private_project_non_contributor(self):
+        self.project.set_privacy('private')
+        self.project.save()
+        url = self.project.api_url_for('node_fork_job_start')
+        res = self.app.post_json(url, auth=AuthUserFactory().auth, expect_errors=True)
+        assert_equal(res.status_code, http.FORBIDDEN)
+
+    @mock.patch('website.project.views.node.project_tasks.fork_node')
+    def test_fork_job_start_folder(self, mock_fork_node):
+        folder = FolderFactory(creator=self.user)
+        url = folder.api_url_for('node_fork_job_start')
+        res = self.app.post_json(url, auth=self.user.auth, expect_errors=True)
+        assert_equal(res.status_code, http.BAD_REQUEST)
+        assert_false(mock_fork_node.called)
+
+    def test_fork_job_status(self):
+        job = ForkJob.create(self.project, self.consolidated_auth)
+        fork = job.run()
+        url = self.project.api_url_for('node_fork_job_status', job_id=job._id)
+        res = self.app.get(url, auth=self.user.auth)
+        assert_equal(res.json['status'], ForkJob.SUCCESS)
+        assert_equal(res.json['progress'], 1.0)
+        assert_equal(res.json['fork_url'], fork.url)
+
+    def test_fork_job_status_other_user(self):
+        job = ForkJob.create(self.project, self.consolidated_auth)
+        url = self.project.api_url_for('node_fork_job_status', job_id=job._id)
+        res = self.app.get(url, auth=AuthUserFactory().auth, expect_errors=True)
+        assert_equal(res.status_code, http.FORBIDDEN)
+
+    def test_fork_job_status_other_node(self):
+        job = ForkJob.create(self.project, self.consolidated_auth)
+        other = ProjectFactory(creator=self.user)
+        url = other.api_url_for('node_fork_job_status', job_id=job._id)
+        res = self.app.get(url, auth=self.user.auth, expect_errors=True)
+        assert_equal(res.status_code, http.NOT_FOUND)
+
 
 class TestProjectCreation(OsfTestCase):
 
@@ -68,14 +68,10 @@ class TestWatching(OsfTestCase):
         assert_equal(n_watched_now, n_watched_then - 1)
         assert_false(self.user.is_watching(self.project))
 
-    @unittest.skip("Won't work because the old log's id doesn't encode the "
-                   "correct log date")
     def test_get_recent_log_ids(self):
         self._watch_project(self.project)
         log_ids = list(self.user.get_recent_log_ids())
         assert_equal(self.last_log._id, log_ids[0])
-        # This part won't work
-        # TODO(sloria): Rethink.
         assert_equal(len(log_ids), 1)
 
     def test_get_recent_log_ids_since(self):
@@ -17,6 +17,7 @@ from framework.sessions import session
 from framework.sentry import log_exception
 from framework.exceptions import HTTPError
 from framework.auth.decorators import must_be_logged_in, must_be_signed
+from framework.transactions.handlers import force_auto_transaction
 
 from website import mails
 from website import settings
@@ -97,7 +98,7 @@ def check_access(node, user, action, key=None):
     if node.has_permission(user, permission):
         return True
     if permission == 'read':
-        if node.is_public or key in node.private_link_keys_active:
+        if node.is_public or node.is_private_link_key_active(key):
             return True
     code = httplib.FORBIDDEN if user else httplib.UNAUTHORIZED
     raise HTTPError(code)
@@ -332,6 +333,7 @@ def addon_view_or_download_file_legacy(**kwargs):
     )
 
 
+@force_auto_transaction
 @must_be_valid_project
 @must_be_contributor_or_public
 def addon_view_or_download_file(auth, path, provider, **kwargs):
@@ -11,6 +11,7 @@ from box import CredentialsV2, refresh_v2_token, BoxClientException
 
 from framework.auth import Auth
 from framework.exceptions import HTTPError
+from framework.transactions.handlers import safe_request_transaction
 
 from website.addons.base import exceptions
 from website.addons.base import AddonUserSettingsBase, AddonNodeSettingsBase, GuidFile
@@ -98,7 +99,9 @@ class BoxOAuthSettings(StoredObject):
             self.access_token = token['access_token']
             self.refresh_token = token.get('refresh_token', self.refresh_token)
             self.expires_at = datetime.utcfromtimestamp(time.time() + token['expires_in'])
-            self.save()
+            # Tokens may be refreshed by GET requests
+            with safe_request_transaction():
+                self.save()
 
     def revoke_access_token(self):
         # if there is only one osf user linked to this box user oauth, revoke the token,
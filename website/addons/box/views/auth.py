@@ -16,6 +16,7 @@ from framework.sessions import session
 from framework.exceptions import HTTPError
 from framework.auth.decorators import must_be_logged_in
 from framework.status import push_status_message as flash
+from framework.transactions.handlers import force_auto_transaction
 
 from website.util import api_url_for
 from website.util import web_url_for
@@ -104,6 +105,7 @@ def box_oauth_start(auth, **kwargs):
     return redirect(get_auth_flow(csrf_token))
 
 
+@force_auto_transaction
 @must_be_logged_in
 def box_oauth_finish(auth, **kwargs):
     """View called when the Oauth flow is completed. Adds a new BoxUserSettings
@@ -14,6 +14,7 @@ from framework.exceptions import HTTPError
 from framework.auth.decorators import collect_auth
 from framework.auth.decorators import must_be_logged_in
 from framework.status import push_status_message as flash
+from framework.transactions.handlers import force_auto_transaction
 
 from website.util import api_url_for
 from website.util import web_url_for
@@ -87,6 +88,7 @@ def dropbox_oauth_start(auth, **kwargs):
     return redirect(get_auth_flow().start() + '&force_reapprove=true')
 
 
+@force_auto_transaction
 @collect_auth
 def dropbox_oauth_finish(auth, **kwargs):
     """View called when the Oauth flow is completed. Adds a new DropboxUserSettings
@@ -15,10 +15,12 @@ from website.util import web_url_for
 from website.project.decorators import must_have_addon
 from website.project.decorators import must_have_permission
 from framework.status import push_status_message
+from framework.transactions.handlers import force_auto_transaction
 
 from ..auth import oauth_start_url, oauth_get_token
 
 
+@force_auto_transaction
 @must_be_logged_in
 def figshare_oauth_start(auth, **kwargs):
     user = auth.user
@@ -74,6 +76,7 @@ def figshare_oauth_delete_node(auth, node_addon, **kwargs):
     return {}
 
 
+@force_auto_transaction
 @collect_auth
 def figshare_oauth_callback(auth, **kwargs):
 
@@ -8,6 +8,7 @@ from flask import request
 from framework.flask import redirect  # VOL-aware redirect
 from framework.auth.decorators import must_be_logged_in
 from framework.exceptions import HTTPError
+from framework.transactions.handlers import force_auto_transaction
 
 from website import models
 from website.project.decorators import (
@@ -34,6 +35,7 @@ def github_add_user_auth(user_addon, node_addon, **kwargs):
     return {}
 
 
+@force_auto_transaction
 @must_be_logged_in
 def github_oauth_start(auth, **kwargs):
 
@@ -95,6 +97,7 @@ def create_and_attach_oauth(user_settings, access_token, token_type):
     user_settings.save()
 
 
+@force_auto_transaction
 def github_oauth_callback(**kwargs):
 
     user = models.User.load(kwargs.get('uid'))
@@ -12,6 +12,7 @@ from modularodm.exceptions import ModularOdmException
 
 from framework.auth import Auth
 from framework.mongo import StoredObject
+from framework.transactions.handlers import safe_request_transaction
 
 from website import settings
 from website.addons.base import exceptions
@@ -133,7 +134,9 @@ class GoogleDriveOAuthSettings(StoredObject):
             self.access_token = token['access_token']
             self.refresh_token = token['refresh_token']
             self.expires_at = datetime.utcfromtimestamp(token['expires_at'])
-            self.save()
+            # `get_auth` refreshes tokens while handling GET requests
+            with safe_request_transaction():
+                self.save()
 
     def revoke_access_token(self):
         # if there is only one osf user linked to this google drive user oauth, revoke the token,
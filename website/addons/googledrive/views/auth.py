@@ -8,6 +8,7 @@ from framework.sessions import session
 from framework.exceptions import HTTPError
 from framework.auth.decorators import must_be_logged_in
 from framework.status import push_status_message as flash
+from framework.transactions.handlers import force_auto_transaction
 
 from website import models
 from website.util import permissions
@@ -54,6 +55,7 @@ def googledrive_oauth_start(auth, **kwargs):
     return redirect(authorization_url)
 
 
+@force_auto_transaction
 @must_be_logged_in
 def googledrive_oauth_finish(auth, **kwargs):
     """View called when the Oauth flow is completed. Adds a new GoogleDriveUserSettings
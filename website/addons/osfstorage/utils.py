@@ -5,6 +5,7 @@ import httplib
 import logging
 import functools
 
+import bson
 from modularodm.exceptions import ValidationValueError
 
 from framework.exceptions import HTTPError
@@ -102,7 +103,10 @@ def must_be(_type):
 
 
 def copy_files(src, target_settings, parent=None, name=None):
-    """Copy the files from src to the target nodesettings
+    """Copy the files from src to the target nodesettings. Descendants of
+    ``src`` are copied with one query and one bulk insert per level of the
+    tree; file versions are immutable, so copies share them by reference.
+
     :param OsfStorageFileNode src: The source to copy children from
     :param OsfStorageNodeSettings target_settings: The node settings of the project to copy files to
     :param OsfStorageFileNode parent: The parent of to attach the clone of src to, if applicable
@@ -118,7 +122,25 @@ def copy_files(src, target_settings, parent=None, name=None):
     cloned.save()
 
     if src.is_folder:
-        for child in src.children:
-            copy_files(child, target_settings, parent=cloned)
+        collection = src._storage[0].store
+        # Maps ids of copied folders to the ids of their copies
+        copied = {src._id: cloned._id}
+        while copied:
+            children = list(collection.find({'parent': {'$in': list(copied.keys())}}))
+            documents = []
+            next_copied = {}
+            for child in children:
+                document = dict(child)
+                # Back-references belong to the original
+                document.pop('__backrefs', None)
+                document['_id'] = str(bson.ObjectId())
+                document['parent'] = copied[child['parent']]
+                document['node_settings'] = target_settings._id
+                documents.append(document)
+                if child['kind'] == 'folder':
+                    next_copied[child['_id']] = document['_id']
+            if documents:
+                collection.insert(documents, manipulate=False)
+            copied = next_copied
 
     return cloned
@@ -14,6 +14,8 @@ from framework.mongo import set_up_storage
 from framework.addons.utils import render_addon_capabilities
 from framework.sentry import sentry
 from framework.mongo import handlers as mongo_handlers
+from framework.mongo import identity_map
+from framework.mongo import profiler
 from framework.tasks import handlers as task_handlers
 from framework.transactions import handlers as transaction_handlers
 
@@ -48,6 +50,9 @@ def attach_handlers(app, settings):
     """Add callback handlers to ``app`` in the correct order."""
     # Add callback handlers to application
     add_handlers(app, mongo_handlers.handlers)
+    add_handlers(app, identity_map.handlers)
+    if settings.ENABLE_QUERY_PROFILER:
+        add_handlers(app, profiler.handlers)
     add_handlers(app, task_handlers.handlers)
     add_handlers(app, transaction_handlers.handlers)
 
@@ -11,6 +11,12 @@ ARCHIVER_NETWORK_ERROR = 'NETWORK_ERROR'
 ARCHIVER_SIZE_EXCEEDED = 'SIZE_EXCEEDED'
 ARCHIVER_UNCAUGHT_ERROR = 'UNCAUGHT_ERROR'
 
+# Stages of the registration pipeline, in order
+REGISTRATION_SNAPSHOT = 'snapshot'
+REGISTRATION_CLONE = 'clone'
+REGISTRATION_ADDONS = 'addons'
+REGISTRATION_ARCHIVE = 'archive'
+
 ARCHIVER_FAILURE_STATUSES = {
     ARCHIVER_FAILURE,
     ARCHIVER_NETWORK_ERROR,
@@ -75,6 +75,11 @@ class ArchiveJob(StoredObject):
     # }
     meta = fields.DictionaryField()
 
+    # Current stage of the registration pipeline, and seconds spent in each
+    # finished stage. Only set on jobs of top-level registrations.
+    stage = fields.StringField()
+    stage_timings = fields.DictionaryField()
+
     def __repr__(self):
         return (
             '<{ClassName}(_id={self._id}, done={self.done}, '
@@ -104,6 +109,13 @@ class ArchiveJob(StoredObject):
     def info(self):
         return self.src_node, self.dst_node, self.initiator
 
+    def stage_finished(self, stage):
+        return stage in self.stage_timings
+
+    def finish_stage(self, stage, seconds):
+        self.stage_timings[stage] = seconds
+        self.save()
+
     def target_info(self):
         return [
             {
@@ -1,15 +1,34 @@
+import time
+import logging
+
+import celery
+
 from framework.auth import Auth
+from framework.exceptions import PermissionsError
 
 from website.archiver import (
     StatResult, AggregateStatResult,
+    ARCHIVER_INITIATED,
+    ARCHIVER_SUCCESS,
+    ARCHIVER_FAILURE,
     ARCHIVER_NETWORK_ERROR,
     ARCHIVER_SIZE_EXCEEDED,
+    ARCHIVER_UNCAUGHT_ERROR,
+    REGISTRATION_SNAPSHOT,
+    REGISTRATION_CLONE,
+    REGISTRATION_ADDONS,
+    REGISTRATION_ARCHIVE,
 )
 from website.archiver.model import ArchiveJob
 
 from website import mails
 from website import settings
-from website.project.model import NodeLog
+from website.exceptions import NodeStateError
+from website.project.model import MetaSchema, Node, NodeLog
+from website.project import signals as project_signals
+
+
+logger = logging.getLogger(__name__)
 
 def send_archiver_success_mail(dst):
     user = dst.creator
@@ -146,7 +165,9 @@ def aggregate_file_tree_metadata(addon_short_name, fileobj_metadata, user):
 
 def before_archive(node, user):
     link_archive_provider(node, user)
-    job = ArchiveJob(
+    # Top-level registrations created by the registration pipeline already
+    # have a job
+    job = node.archive_job or ArchiveJob(
         src_node=node.registered_from,
         dst_node=node,
         initiator=user
@@ -172,3 +193,222 @@ def archive_success(node, user):
     add_archive_success_logs(node, user)
     for child in node.get_descendants_recursive(include=lambda n: n.primary):
         add_archive_success_logs(child, user)
+
+def _registered_nodes(job):
+    """Return the registrations created by ``job``, children first."""
+    dst = Node.load(job.meta['registration']['dst_node'])
+    return list(dst.get_descendants_recursive(lambda n: n.primary)) + [dst]
+
+def _registrable_nodes(node):
+    """Yield ``node`` and its descendants that `Node.clone_registration`
+    copies: components that are not deleted and not below a deleted node.
+    """
+    yield node
+    for child in node.nodes:
+        if child.primary and not child.is_deleted:
+            for each in _registrable_nodes(child):
+                yield each
+
+def check_registrable(src, user):
+    """Return ``src`` and the descendants that `Node.clone_registration`
+    copies, raising if ``user`` cannot register any of them.
+
+    :raises: NodeStateError if ``src`` is deleted or a node is a folder
+    :raises: PermissionsError if ``user`` cannot register a node
+    """
+    auth = Auth(user)
+    if src.is_deleted:
+        raise NodeStateError('Cannot register deleted node.')
+    nodes = list(_registrable_nodes(src))
+    for node in nodes:
+        if node.is_folder:
+            raise NodeStateError('Folders may not be registered')
+        if not node.can_edit(auth=auth) and not node.is_admin_parent(user=user):
+            raise PermissionsError(
+                'User {} does not have permission '
+                'to register this node'.format(user._id)
+            )
+    return nodes
+
+def snapshot_registration(job):
+    """Record the source nodes to be registered, failing before anything is
+    written if any of them cannot be registered by the initiator.
+    """
+    nodes = check_registrable(job.src_node, job.initiator)
+    job.meta['registration']['node_ids'] = [node._id for node in nodes]
+    job.save()
+
+def remove_partial_registration(job):
+    """Delete the registrations created by an earlier attempt at the clone
+    stage of ``job``, including those not yet attached to their parent.
+    """
+    params = job.meta['registration']
+    for registration in Node.load_many(params.get('registration_ids') or []):
+        if not registration.is_deleted:
+            delete_registration_tree(registration)
+    params['registration_ids'] = []
+    params.pop('dst_node', None)
+    job.dst_node = None
+    job.save()
+
+def clone_registration(job):
+    """Copy the source tree into a registration tree. Each registration is
+    recorded on ``job`` as soon as it is saved, and the top-level
+    registration is attached as `dst_node`, so that a failed clone can be
+    cleaned up. Registrations left by an interrupted attempt are deleted
+    first.
+    """
+    remove_partial_registration(job)
+    params = job.meta['registration']
+    schema = MetaSchema.load(params['schema']) if params.get('schema') else None
+
+    def on_registered(original, registered):
+        params['registration_ids'].append(registered._id)
+        if original._id == job.src_node._id:
+            job.dst_node = registered
+        job.save()
+
+    registered = job.src_node.clone_registration(
+        schema, Auth(job.initiator), params['template'], params['data'],
+        on_registered=on_registered,
+    )
+    params['dst_node'] = registered._id
+    job.save()
+
+def run_registration_hooks(job, registration):
+    """Run the `after_register` callbacks of the addons of the source node of
+    ``registration``, failing ``job`` if a callback raises. Does nothing if
+    ``job`` has already failed.
+    """
+    if job.status == ARCHIVER_FAILURE:
+        return
+    try:
+        registration.registered_from.run_registration_hooks(registration, job.initiator)
+    except Exception:
+        fail_registration_stage(job, REGISTRATION_ADDONS)
+        raise
+
+def run_registration_addon_hooks(job):
+    """Run the `after_register` callbacks of the addons of each source node.
+    With Celery, each registration gets its own task and the tasks run
+    concurrently, as a chord whose callback finishes the stage and resumes the
+    pipeline; return True so that the pipeline stops until then. Without
+    Celery, the callbacks run in turn.
+    """
+    registrations = _registered_nodes(job)
+    if not settings.USE_CELERY:
+        for registration in registrations:
+            registration.registered_from.run_registration_hooks(registration, job.initiator)
+        return False
+    # Avoid circular imports
+    from website.project import tasks as project_tasks
+    celery.chord(celery.group(
+        project_tasks.run_registration_hooks.si(job._id, registration._id)
+        for registration in registrations
+    ))(project_tasks.finish_registration_hooks.si(job._id, time.time()))
+    return True
+
+def finish_registration_addon_hooks(job, start):
+    """Finish the addons stage of ``job``, started at ``start``, once the
+    hook tasks dispatched by `run_registration_addon_hooks` have run, and
+    continue the pipeline.
+    """
+    if job.status == ARCHIVER_FAILURE or job.stage_finished(REGISTRATION_ADDONS):
+        return
+    job.finish_stage(REGISTRATION_ADDONS, time.time() - start)
+    run_registration_pipeline(job)
+
+def start_registration_archive(job):
+    """Attach the registration tree to ``job``, start the archiver, and make
+    the registration public or embargo it. The archiver tasks are queued, so
+    they start after the registration is made public or embargoed.
+    """
+    # Avoid circular imports
+    from website.project import utils as project_utils
+    params = job.meta['registration']
+    src, user = job.src_node, job.initiator
+    auth = Auth(user)
+    registrations = _registered_nodes(job)
+    root = registrations[-1]
+
+    if settings.ENABLE_ARCHIVER:
+        for registration in registrations[:-1]:
+            project_signals.after_create_registration.send(
+                registration.registered_from, dst=registration, user=user
+            )
+    else:
+        job.done = True
+        job.status = ARCHIVER_SUCCESS
+    job.dst_node = root
+    job.save()
+    if settings.ENABLE_ARCHIVER:
+        project_signals.after_create_registration.send(src, dst=root, user=user)
+
+    if params.get('embargo_end_date'):
+        root.embargo_registration(user, params['embargo_end_date'])
+        root.save()
+        if settings.ENABLE_ARCHIVER:
+            job.meta['embargo_urls'] = {
+                contrib._id: project_utils.get_embargo_urls(root, contrib)
+                for contrib in src.active_contributors()
+            }
+            job.save()
+    else:
+        for registration in reversed(registrations):
+            registration.set_privacy('public', auth, log=False)
+
+REGISTRATION_PIPELINE = (
+    (REGISTRATION_SNAPSHOT, snapshot_registration),
+    (REGISTRATION_CLONE, clone_registration),
+    (REGISTRATION_ADDONS, run_registration_addon_hooks),
+    (REGISTRATION_ARCHIVE, start_registration_archive),
+)
+
+def fail_registration_pipeline(job):
+    """Email the initiator and support about a failed registration job and
+    delete the registrations it created.
+    """
+    src, dst, user = job.info()
+    if dst is not None:
+        handle_archive_fail(ARCHIVER_UNCAUGHT_ERROR, src, dst, user, job.target_info())
+    else:
+        send_archiver_uncaught_error_mails(src, user, job.target_info())
+    remove_partial_registration(job)
+    job.sent = True
+    job.save()
+
+def fail_registration_stage(job, stage):
+    """Mark ``job`` as failed in ``stage`` and clean up after it."""
+    logger.exception('Registration job {0} failed in stage {1}'.format(job._id, stage))
+    job.status = ARCHIVER_FAILURE
+    job.done = True
+    job.save()
+    fail_registration_pipeline(job)
+
+def run_registration_pipeline(job):
+    """Create the registration described by ``job.meta['registration']`` in
+    stages, saving the time spent in each stage on ``job``. Finished stages
+    are skipped, so a job that was interrupted continues where it stopped.
+    If a stage fails, the registrations created so far are deleted and the
+    failure emails are sent; running a failed job again starts over. A stage
+    that returns True finishes in other tasks, which continue the pipeline.
+    """
+    if job.status == ARCHIVER_FAILURE:
+        job.status = ARCHIVER_INITIATED
+        job.done = False
+        job.sent = False
+        job.stage_timings = {}
+    for stage, run_stage in REGISTRATION_PIPELINE:
+        if job.stage_finished(stage):
+            continue
+        job.stage = stage
+        job.save()
+        start = time.time()
+        try:
+            deferred = run_stage(job)
+        except Exception:
+            fail_registration_stage(job, stage)
+            raise
+        if deferred:
+            return
+        job.finish_stage(stage, time.time() - start)
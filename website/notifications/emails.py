@@ -30,8 +30,7 @@ def email_transactional(recipient_ids, uid, event, user, node, timestamp, **cont
     context['user'] = user
     subject = Template(EMAIL_SUBJECT_MAP[event]).render(**context)
 
-    for user_id in recipient_ids:
-        recipient = website_models.User.load(user_id)
+    for recipient in website_models.User.load_many(recipient_ids):
         email = recipient.username
         context['localized_timestamp'] = localize_timestamp(timestamp, recipient)
         message = mails.render_message(template, **context)
@@ -58,8 +57,7 @@ def email_digest(recipient_ids, uid, event, user, node, timestamp, **context):
     context['user'] = user
     node_lineage_ids = get_node_lineage(node) if node else []
 
-    for user_id in recipient_ids:
-        recipient = website_models.User.load(user_id)
+    for recipient in website_models.User.load_many(recipient_ids):
         context['localized_timestamp'] = localize_timestamp(timestamp, recipient)
         message = mails.render_message(template, **context)
 
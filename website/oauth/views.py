@@ -6,6 +6,7 @@ from flask import redirect
 
 from framework.auth.decorators import must_be_logged_in
 from framework.exceptions import HTTPError
+from framework.transactions.handlers import force_auto_transaction
 from website.oauth.models import ExternalAccount
 from website.oauth.utils import get_service
 from website.oauth.signals import oauth_complete
@@ -38,6 +39,7 @@ def oauth_connect(service_name, auth):
     return redirect(service.auth_url)
 
 
+@force_auto_transaction
 @must_be_logged_in
 def oauth_callback(service_name, auth):
     user = auth.user
@@ -21,6 +21,7 @@ from framework.auth.signals import user_merged
 from framework.exceptions import HTTPError, PermissionsError
 from framework.flask import redirect  # VOL-aware redirect
 from framework.status import push_status_message
+from framework.transactions.handlers import force_auto_transaction
 
 from website import mails
 from website import mailchimp_utils
@@ -92,6 +93,7 @@ def validate_user(data, user):
         # raise an error if request doesn't have user id
         raise HTTPError(httplib.BAD_REQUEST, data={'message_long': '"id" is required'})
 
+@force_auto_transaction
 @must_be_logged_in
 def resend_confirmation(auth):
     user = auth.user
@@ -553,8 +555,8 @@ def user_key_history(**kwargs):
         'logs': [
             {
                 'lid': log._id,
-                'nid': log.node__logged[0]._id,
-                'route': log.node__logged[0].url,
+                'nid': log.logged_node._id,
+                'route': log.logged_node.url,
             }
             for log in api_key.nodelog__created
         ]
@@ -150,7 +150,7 @@ def check_can_access(node, user, key=None, api_node=None):
     if user is None:
         return False
     if not node.can_view(Auth(user=user)) and api_node != node:
-        if key in node.private_link_keys_deleted:
+        if node.is_private_link_key_deleted(key):
             status.push_status_message("The view-only links you used are expired.")
         raise HTTPError(http.FORBIDDEN)
     return True
@@ -164,7 +164,7 @@ def check_key_expired(key, node, url):
         :param str url: the url redirect to
         :return: url with pushed message added if key expired else just url
     """
-    if key in node.private_link_keys_deleted:
+    if node.is_private_link_key_deleted(key):
         url = furl(url).add({'status': 'expired'}).url
 
     return url
@@ -193,7 +193,7 @@ def _must_be_contributor_factory(include_public):
 
             kwargs['auth'].private_key = key
             if not node.is_public or not include_public:
-                if key not in node.private_link_keys_active:
+                if not node.is_private_link_key_active(key):
                     if not check_can_access(node=node, user=user, key=key):
                         redirect_url = check_key_expired(key=key, node=node, url=request.url)
                         if request.headers.get('Content-Type') == 'application/json':
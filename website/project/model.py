@@ -6,10 +6,11 @@ import urllib
 import logging
 import datetime
 import urlparse
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 import warnings
 
 import pytz
+import pymongo
 from flask import request
 from django.core.urlresolvers import reverse
 from HTMLParser import HTMLParser
@@ -24,6 +25,7 @@ from api.base.utils import absolute_reverse
 from framework import status
 from framework.mongo import ObjectId
 from framework.mongo import StoredObject
+from framework.mongo import prefetch, add_backrefs
 from framework.addons import AddonModelMixin
 from framework.auth import get_user, User, Auth
 from framework.auth import signals as auth_signals
@@ -31,9 +33,13 @@ from framework.exceptions import PermissionsError
 from framework.guid.model import GuidStoredObject
 from framework.auth.utils import privacy_info_handle
 from framework.analytics import tasks as piwik_tasks
+from framework.tasks.handlers import enqueue_update
 from framework.mongo.utils import to_mongo, to_mongo_key, unique_on
 from framework.analytics import (
-    get_basic_counters, increment_user_activity_counters
+    get_basic_counters, increment_user_activity_counters,
+    increment_node_log_counters, copy_node_log_counters,
+    get_node_log_counters, insert_node_log_counters,
+    update_cocontributor_counts,
 )
 from framework.sentry import log_exception
 from framework.transactions.context import TokuTransaction
@@ -72,11 +78,10 @@ def has_anonymous_link(node, auth):
         return False
     if node.is_public:
         return False
-    return any(
-        link.anonymous
-        for link in node.private_links_active
-        if link.key == view_only_link
-    )
+    if not node.is_private_link_key_active(view_only_link):
+        return False
+    link = node.get_private_link(view_only_link)
+    return bool(link and link.anonymous)
 
 class MetaSchema(StoredObject):
 
@@ -284,6 +289,15 @@ class ApiKey(StoredObject):
 @unique_on(['params.node', '_id'])
 class NodeLog(StoredObject):
 
+    __indices__ = [
+        {
+            'key_or_list': [
+                ('node_ids', pymongo.ASCENDING),
+                ('date', pymongo.ASCENDING),
+            ],
+        }
+    ]
+
     _id = fields.StringField(primary=True, default=lambda: str(ObjectId()))
 
     date = fields.DateTimeField(default=datetime.datetime.utcnow, index=True)
@@ -291,6 +305,10 @@ class NodeLog(StoredObject):
     params = fields.DictionaryField()
     should_hide = fields.BooleanField(default=False)
 
+    # Ids of the nodes this log was added to. Forks and registrations also
+    # show the logs of the node they were created from, up to the date they
+    # were created; see `Node.log_sources`.
+    node_ids = fields.StringField(list=True)
     was_connected_to = fields.ForeignField('node', list=True)
 
     user = fields.ForeignField('user', backref='created')
@@ -368,6 +386,13 @@ class NodeLog(StoredObject):
         return ('<NodeLog({self.action!r}, params={self.params!r}) '
                 'with id {self._id!r}>').format(self=self)
 
+    @property
+    def logged_node(self):
+        """Return the node this log was first added to."""
+        if self.node_ids:
+            return Node.load(self.node_ids[0])
+        return None
+
     @property
     def node(self):
         """Return the :class:`Node` associated with this log."""
@@ -433,6 +458,169 @@ class NodeLog(StoredObject):
         }
 
 
+class NodeLogList(object):
+    """The logs of a node, ordered by date. Logs are `NodeLog` records that
+    list the node in `node_ids`, so each operation is a query on the
+    (node_ids, date) index rather than a list stored on the node. Forks and
+    registrations also include the logs of the nodes in their `log_sources`
+    up to the date they were created, and nodes that have not been migrated
+    by scripts/migration/migrate_node_logs.py include the logs embedded in
+    their document.
+
+    :param Node node: Node whose logs to query
+    """
+    def __init__(self, node):
+        self.node = node
+
+    def query(self):
+        """Return the query matching the logs of the node."""
+        node_query = Q('node_ids', 'eq', self.node._id)
+        for source in self.node.log_sources:
+            node_query = node_query | (
+                Q('node_ids', 'eq', source['node']) &
+                Q('date', 'lte', source['until'])
+            )
+        if self.node._legacy_log_ids:
+            node_query = node_query | Q('_id', 'in', self.node._legacy_log_ids)
+        return node_query
+
+    def find(self, query=None):
+        node_query = self.query()
+        if query is not None:
+            node_query = node_query & query
+        return NodeLog.find(node_query)
+
+    def _sorted(self, reverse=False):
+        if reverse:
+            return self.find().sort('-date', '-_id')
+        return self.find().sort('date', '_id')
+
+    def recent(self, n):
+        """Return the ``n`` most recent logs, newest first."""
+        return list(self._sorted(reverse=True).limit(n))
+
+    def since(self, date):
+        """Return logs dated after ``date``."""
+        return self.find(Q('date', 'gt', date)).sort('date', '_id')
+
+    def append(self, log):
+        if self.node._id not in log.node_ids:
+            log.node_ids.append(self.node._id)
+            log.save()
+            increment_node_log_counters(self.node._id, log.user and log.user._id)
+
+    def remove(self, log):
+        if self.node.log_sources or self.node._legacy_log_ids:
+            self._materialize()
+            log.reload()
+        if self.node._id in log.node_ids:
+            log.node_ids.remove(self.node._id)
+            log.save()
+            increment_node_log_counters(self.node._id, log.user and log.user._id, amount=-1)
+
+    def replace(self, logs):
+        """Make ``logs`` the logs of the node, as when assigning to
+        `Node.logs`. `None` entries are ignored.
+        """
+        logs = [log for log in logs if log is not None]
+        log_ids = set(log._id for log in logs)
+        if self.node.log_sources or self.node._legacy_log_ids:
+            self._materialize()
+        for log in list(self):
+            if log._id not in log_ids:
+                self.remove(log)
+        for log in logs:
+            self.append(log)
+
+    def _add_node_id(self, log_ids):
+        NodeLog._storage[0].store.update(
+            {'_id': {'$in': log_ids}},
+            {'$addToSet': {'node_ids': self.node._id}},
+            multi=True,
+        )
+        NodeLog._clear_caches()
+
+    def _migrate_legacy(self):
+        """Move the log ids embedded in an unmigrated node document to
+        `NodeLog.node_ids`, as scripts/migration/migrate_node_logs.py does.
+        """
+        if not self.node._legacy_log_ids:
+            return
+        self._add_node_id(self.node._legacy_log_ids)
+        Node._storage[0].store.update(
+            {'_id': self.node._id},
+            {'$unset': {'logs': True}},
+        )
+        self.node._legacy_log_ids = []
+
+    def _materialize(self):
+        """List the node in the `node_ids` of all of its logs, including
+        shared and embedded ones, so that individual logs can be removed.
+        """
+        self._add_node_id(self._to_primary_keys())
+        self.node._legacy_log_ids = []
+        Node._storage[0].store.update(
+            {'_id': self.node._id},
+            {'$unset': {'logs': True}},
+        )
+        self.node.log_sources = []
+        self.node.save()
+
+    def share_with(self, node):
+        """Include the logs of this node up to now in the logs of ``node``,
+        as when forking or registering a node, without writing to the logs:
+        ``node`` records this node and the cutoff date in `log_sources`.
+        Does not save ``node``.
+        """
+        node.log_sources = self.sources_until(datetime.datetime.utcnow())
+        copy_node_log_counters(self.node._id, node._id)
+
+    def sources_until(self, until):
+        """Return the `log_sources` of a node that shares the logs of this
+        node up to ``until``.
+        """
+        self._migrate_legacy()
+        return [{'node': self.node._id, 'until': until}] + [
+            {'node': source['node'], 'until': min(source['until'], until)}
+            for source in self.node.log_sources
+        ]
+
+    def _to_primary_keys(self):
+        return self._sorted().get_keys()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            logs = self._sorted(reverse=True).offset(-index - 1)
+        else:
+            logs = self._sorted().offset(index)
+        for log in logs.limit(1):
+            return log
+        raise IndexError('log index out of range')
+
+    def __iter__(self):
+        return iter(self._sorted())
+
+    def __reversed__(self):
+        return list(self._sorted(reverse=True))
+
+    def __len__(self):
+        return self.find().count()
+
+    def __contains__(self, log):
+        return self.find(Q('_id', 'eq', log._id)).count() > 0
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<NodeLogList of {0!r}>'.format(self.node._id)
+
+
 class Tag(StoredObject):
 
     _id = fields.StringField(primary=True, validate=MaxLengthValidator(128))
@@ -505,6 +693,93 @@ def get_pointer_parent(pointer):
     return parent_refs[0]
 
 
+class NodeTree(object):
+    """A node and the contents of its `nodes` lists, loaded by
+    `load_node_tree`. Walking the tree with `children` does not query the
+    database for nodes that were loaded with it.
+    """
+
+    def __init__(self, root, children):
+        self.root = root
+        # Maps node ids to the components and pointers in their `nodes`
+        self._children = children
+
+    def children(self, node):
+        """Return the components and pointers in ``node.nodes``, in order. If
+        ``node`` is a pointer, return the children of the node it points to.
+        Nodes that were not loaded with the tree fall back to ``node.nodes``.
+        """
+        node = node.resolve()
+        if node is None:
+            return []
+        try:
+            return self._children[node._id]
+        except KeyError:
+            return list(node.nodes)
+
+    def primary_children(self, node):
+        return [child for child in self.children(node) if child.primary]
+
+    def descendants(self, include=lambda n: True):
+        """Yield the components and pointers below the root, depth first,
+        without descending into pointers.
+        """
+        return self._descendants(self.root, include)
+
+    def _descendants(self, node, include):
+        for child in self.children(node):
+            if include(child):
+                yield child
+            if child.primary:
+                for descendant in self._descendants(child, include):
+                    yield descendant
+
+
+def load_node_tree(root, recursive=True):
+    """Load ``root``'s subtree with a fixed number of queries: one for the
+    components below ``root`` (by `ancestor_ids`), one for components listed
+    in `nodes` that the first query missed, one for the pointers in the
+    subtree and one for the nodes they point to.
+
+    :param Node root: Root of the tree
+    :param bool recursive: Load all components below ``root``, or only its
+        children
+    :return NodeTree: The loaded tree
+    """
+    root = root.resolve()
+    nodes = {root._id: root}
+    if recursive and root._id is not None:
+        nodes.update((node._id, node) for node in root.find_descendants())
+    child_keys = {
+        node_id: node.to_storage().get('nodes') or []
+        for node_id, node in nodes.items()
+    }
+    keys = [key for each in child_keys.values() for key in each]
+    missing = set(
+        key for key, schema_name in keys
+        if schema_name == 'node' and key not in nodes
+    )
+    nodes.update((node._id, node) for node in Node.load_many(missing))
+    pointers = prefetch(
+        Pointer.load_many(set(
+            key for key, schema_name in keys if schema_name == 'pointer'
+        )),
+        'node',
+    )
+    by_schema = {
+        'node': nodes,
+        'pointer': {pointer._id: pointer for pointer in pointers},
+    }
+    children = {}
+    for node_id, each in child_keys.items():
+        children[node_id] = [
+            by_schema[schema_name][key]
+            for key, schema_name in each
+            if key in by_schema.get(schema_name, {})
+        ]
+    return NodeTree(root, children)
+
+
 def validate_category(value):
     """Validator for Node#category. Makes sure that the value is one of the
     categories defined in CATEGORY_MAP.
@@ -560,6 +835,23 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         'is_retracted',
     }
 
+    # Changes to these fields are shown in the search documents of the
+    # node's children
+    PARENT_SEARCH_FIELDS = {
+        'title',
+        'is_public',
+    }
+
+    # Changes to these fields are propagated to `ancestor_ids` and
+    # `inherited_admin_ids` of the node's children
+    TREE_FIELDS = {
+        'nodes',
+        'permissions',
+        'is_deleted',
+        'ancestor_ids',
+        'inherited_admin_ids',
+    }
+
     # Maps category identifier => Human-readable representation for use in
     # titles, menus, etc.
     # Use an OrderedDict so that menu items show in the correct order
@@ -585,6 +877,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     _id = fields.StringField(primary=True)
 
     date_created = fields.DateTimeField(auto_now_add=datetime.datetime.utcnow, index=True)
+    # Date of the most recent log, or `date_created` if there are no logs;
+    # stored so that listings can be sorted by it in the database
+    date_modified = fields.DateTimeField(index=True)
 
     # Privacy
     is_public = fields.BooleanField(default=False, index=True)
@@ -637,15 +932,27 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     contributors = fields.ForeignField('user', list=True, backref='contributed')
     users_watching_node = fields.ForeignField('user', list=True, backref='watched')
 
-    logs = fields.ForeignField('nodelog', list=True, backref='logged')
     tags = fields.ForeignField('tag', list=True, backref='tagged')
 
     # Tags for internal use
     system_tags = fields.StringField(list=True)
 
     nodes = fields.AbstractForeignField(list=True, backref='parent')
+    # Ids of the nodes above this one, nearest first; kept in sync with
+    # `nodes` by `save`. Pointers do not affect ancestry.
+    ancestor_ids = fields.StringField(list=True, index=True)
+    # Ids of users with admin permission on any node above this one, which
+    # gives them read access to this node; kept in sync by `save`
+    inherited_admin_ids = fields.StringField(list=True, index=True)
+    # Keys of the active private links that include this node; kept in sync
+    # by `PrivateLink.save`
+    private_link_keys = fields.StringField(list=True)
     forked_from = fields.ForeignField('node', backref='forked', index=True)
     registered_from = fields.ForeignField('node', backref='registrations', index=True)
+    # Nodes whose logs up to a date are also logs of this node, as
+    # {'node': <node id>, 'until': <datetime>}; set when forking or
+    # registering, see `NodeLogList.share_with`
+    log_sources = fields.DictionaryField(list=True)
 
     # The node (if any) used as a template for this node's creation
     template_node = fields.ForeignField('node', backref='template_node', index=True)
@@ -663,7 +970,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     }
 
     def __init__(self, *args, **kwargs):
+        legacy_log_ids = kwargs.pop('_legacy_log_ids', None)
         super(Node, self).__init__(*args, **kwargs)
+        self._legacy_log_ids = legacy_log_ids or []
 
         if kwargs.get('_is_loaded', False):
             return
@@ -730,20 +1039,43 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
     @property
     def private_link_keys_active(self):
-        return [x.key for x in self.private_links if not x.is_deleted]
+        return list(self.private_link_keys)
 
     @property
     def private_link_keys_deleted(self):
         return [x.key for x in self.private_links if x.is_deleted]
 
+    def get_private_link(self, key):
+        """Return the private link with key ``key`` that includes this node,
+        active or deleted, or `None`. Uses the index on `PrivateLink.key`, so
+        the cost does not depend on how many links the node has.
+
+        :param str key: Private link key
+        """
+        if not key:
+            return None
+        links = PrivateLink.find(
+            Q('key', 'eq', key) &
+            Q('nodes', 'eq', self._id)
+        ).limit(1)
+        for link in links:
+            return link
+        return None
+
+    def is_private_link_key_active(self, key):
+        return bool(key) and key in self.private_link_keys
+
+    def is_private_link_key_deleted(self, key):
+        link = self.get_private_link(key)
+        return link is not None and link.is_deleted
+
     def path_above(self, auth):
         parents = self.parents
         return '/' + '/'.join([p.title if p.can_view(auth) else '-- private project --' for p in reversed(parents)])
 
     @property
     def ids_above(self):
-        parents = self.parents
-        return {p._id for p in parents}
+        return set(self.ancestor_ids)
 
     def can_edit(self, auth=None, user=None):
         """Return if a user is authorized to edit this node.
@@ -775,9 +1107,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     def is_admin_parent(self, user):
         if self.has_permission(user, 'admin', check_parent=False):
             return True
-        if self.parent_node:
-            return self.parent_node.is_admin_parent(user)
-        return False
+        return user is not None and user._id in self.inherited_admin_ids
 
     def can_view(self, auth):
         if not auth and not self.is_public:
@@ -786,7 +1116,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         return (
             self.is_public or
             (auth.user and self.has_permission(auth.user, 'read')) or
-            auth.private_key in self.private_link_keys_active or
+            self.is_private_link_key_active(auth.private_key) or
             self.is_admin_parent(auth.user)
         )
 
@@ -908,15 +1238,14 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         """
         if self.has_permission(user, 'read'):
             return True
-
-        for node in self.nodes:
-            if not node.primary or node.is_deleted:
-                continue
-
-            if node.can_read_children(user):
-                return True
-
-        return False
+        if user is None:
+            return False
+        # Admins of this node or its parents can read this node, so any other
+        # readable descendant must list the user as a contributor
+        return self.find_descendants(
+            Q('is_deleted', 'eq', False) &
+            Q('contributors', 'eq', user._id)
+        ).count() > 0
 
     def get_permissions(self, user):
         """Get list of permissions for user.
@@ -934,33 +1263,29 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
     @property
     def visible_contributors(self):
-        return [
-            User.load(_id)
-            for _id in self.visible_contributor_ids
-        ]
+        return User.load_many(self.visible_contributor_ids)
 
     @property
     def parents(self):
-        if self.parent_node:
-            return [self.parent_node] + self.parent_node.parents
-        return []
+        """The nodes above this one, nearest first, loaded with a single
+        query. As with `parent_node`, ancestry stops at a deleted node.
+        """
+        parents = []
+        for parent in Node.load_many(self.ancestor_ids):
+            if parent.is_deleted:
+                break
+            parents.append(parent)
+        return parents
 
     @property
     def admin_contributor_ids(self, contributors=None):
         contributor_ids = self.contributors._to_primary_keys()
-        admin_ids = set()
-        for parent in self.parents:
-            admins = [
-                user for user, perms in parent.permissions.iteritems()
-                if 'admin' in perms
-            ]
-            admin_ids.update(set(admins).difference(contributor_ids))
-        return admin_ids
+        return set(self.inherited_admin_ids).difference(contributor_ids)
 
     @property
     def admin_contributors(self):
         return sorted(
-            [User.load(_id) for _id in self.admin_contributor_ids],
+            User.load_many(self.admin_contributor_ids),
             key=lambda user: user.family_name,
         )
 
@@ -1066,6 +1391,38 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
                      auth=auth)
         return updated
 
+    @classmethod
+    def from_storage(cls, data, *args, **kwargs):
+        # Documents that have not been migrated by
+        # scripts/migration/migrate_node_logs.py embed their log ids; keep
+        # them out of the fields, but include them in `logs`
+        legacy_log_ids = None
+        if 'logs' in data:
+            data = dict(data)
+            legacy_log_ids = data.pop('logs')
+        ret = super(Node, cls).from_storage(data, *args, **kwargs)
+        if legacy_log_ids:
+            ret['_legacy_log_ids'] = legacy_log_ids
+        return ret
+
+    @property
+    def logs(self):
+        return NodeLogList(self)
+
+    @logs.setter
+    def logs(self, logs):
+        NodeLogList(self).replace(logs)
+
+    def clone(self):
+        cloned = super(Node, self).clone()
+        # A copy is not part of a tree until it is added to a parent
+        cloned.ancestor_ids = []
+        cloned.inherited_admin_ids = []
+        cloned.log_sources = []
+        # Private links are not shared with copies
+        cloned.private_link_keys = []
+        return cloned
+
     def save(self, *args, **kwargs):
         update_piwik = kwargs.pop('update_piwik', True)
         self.adjust_permissions()
@@ -1086,8 +1443,22 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         else:
             suppress_log = False
 
+        if self.date_modified is None:
+            self.date_modified = self.date_created or datetime.datetime.utcnow()
+
+        stored = self._get_stored_data('contributors', *self.TREE_FIELDS)
+
         saved_fields = super(Node, self).save(*args, **kwargs)
 
+        if self.TREE_FIELDS.intersection(saved_fields):
+            self._update_children(stored)
+
+        if 'contributors' in saved_fields:
+            update_cocontributor_counts(
+                stored.get('contributors') or [],
+                self.contributors._to_primary_keys(),
+            )
+
         if first_save and is_original and not suppress_log:
             # TODO: This logic also exists in self.use_as_template()
             for addon in settings.ADDONS_AVAILABLE:
@@ -1123,16 +1494,30 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
                 need_update = False
         if self.is_folder or self.archiving:
             need_update = False
+        # Search and Piwik updates run once per request, however many times
+        # the node is saved
         if need_update:
-            self.update_search()
+            enqueue_update(('search', self._id), lambda fields: self.update_search())
+            if self.PARENT_SEARCH_FIELDS.intersection(saved_fields):
+                enqueue_update(
+                    ('search_children', self._id),
+                    lambda fields: self.update_search_children(),
+                )
 
         # This method checks what has changed.
         if settings.PIWIK_HOST and update_piwik:
-            piwik_tasks.update_node(self._id, saved_fields)
+            self._enqueue_piwik_update(saved_fields)
 
         # Return expected value for StoredObject::save
         return saved_fields
 
+    def _enqueue_piwik_update(self, fields):
+        enqueue_update(
+            ('piwik', self._id),
+            lambda fields: piwik_tasks.update_node(self._id, sorted(fields)),
+            fields,
+        )
+
     ######################################
     # Methods that return a new instance #
     ######################################
@@ -1336,39 +1721,211 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
     @property
     def depth(self):
-        return len(self.parents)
+        return len(self.ancestor_ids)
+
+    def find_descendants(self, query=None):
+        """Find the primary nodes below this node at any depth with a single
+        query on `ancestor_ids`.
+
+        :param query: Optional query to filter descendants by
+        """
+        descendants = Q('ancestor_ids', 'eq', self._id)
+        if query is not None:
+            descendants = descendants & query
+        return Node.find(descendants)
+
+    def _get_stored_data(self, *field_names):
+        """Return the stored values of ``field_names`` as of the last save,
+        from the record cache if possible.
+        """
+        if not self._is_loaded:
+            return {}
+        stored = self._get_cached_data(self._primary_key)
+        if stored is None:
+            stored = self._storage[0].store.find_one(
+                {'_id': self._primary_key},
+                {name: True for name in field_names},
+            ) or {}
+        return stored
+
+    def _get_child_tree_fields(self, stored=None):
+        """Return the `ancestor_ids` and `inherited_admin_ids` of this node's
+        primary children; given the ``stored`` data of this node, return them
+        as of its last save. As with `parent_node`, ancestry stops at a
+        deleted node, so the children of a deleted node have neither.
+        """
+        if stored is None:
+            stored = {
+                'is_deleted': self.is_deleted,
+                'ancestor_ids': self.ancestor_ids,
+                'inherited_admin_ids': self.inherited_admin_ids,
+                'permissions': self.permissions,
+            }
+        if stored.get('is_deleted'):
+            return [], []
+        ancestor_ids = [self._id] + list(stored.get('ancestor_ids') or [])
+        inherited_admin_ids = sorted(
+            set(stored.get('inherited_admin_ids') or []).union(
+                user_id for user_id, perms in (stored.get('permissions') or {}).iteritems()
+                if 'admin' in perms
+            )
+        )
+        return ancestor_ids, inherited_admin_ids
+
+    def _set_tree_fields(self, ancestor_ids, inherited_admin_ids):
+        """Set `ancestor_ids` and `inherited_admin_ids`, saving the node if
+        they changed, which updates the nodes below it in turn.
+        """
+        if (list(self.ancestor_ids) != ancestor_ids or
+                set(self.inherited_admin_ids) != set(inherited_admin_ids)):
+            self.ancestor_ids = ancestor_ids
+            self.inherited_admin_ids = inherited_admin_ids
+            self.save()
+
+    def _update_children(self, stored):
+        """Keep `ancestor_ids` and `inherited_admin_ids` below this node in
+        step with it after a save. Components added to or removed from `nodes`
+        are saved with their new fields. The rest of the subtree is only
+        updated if the fields this node passes on changed, with
+        multi-document updates rather than a save per node.
+
+        :param dict stored: Stored data of this node before the save
+        """
+        ancestor_ids, inherited_admin_ids = self._get_child_tree_fields()
+        stored_ids = [
+            key for key, schema_name in stored.get('nodes') or []
+            if schema_name == 'node'
+        ]
+        child_ids = [
+            key for key, schema_name in self.to_storage().get('nodes') or []
+            if schema_name == 'node'
+        ]
+        added_ids = [key for key in child_ids if key not in stored_ids]
+        kept_ids = [key for key in child_ids if key in stored_ids]
+        removed_ids = [key for key in stored_ids if key not in child_ids]
+
+        for child in Node.load_many(added_ids):
+            child._set_tree_fields(ancestor_ids, inherited_admin_ids)
+        for child in Node.load_many(removed_ids):
+            parents = [
+                parent for parent in child.node__parent
+                if parent._id != self._id
+            ]
+            if parents:
+                child._set_tree_fields(*parents[0]._get_child_tree_fields())
+            else:
+                child._set_tree_fields([], [])
+
+        if not kept_ids:
+            return
+        if bool(stored.get('is_deleted')) != bool(self.is_deleted):
+            # Ancestry stops at deleted nodes, so only the children change
+            for child in Node.load_many(kept_ids):
+                child._set_tree_fields(ancestor_ids, inherited_admin_ids)
+            return
+        stored_ancestor_ids, stored_admin_ids = self._get_child_tree_fields(stored)
+        if stored_ancestor_ids != ancestor_ids or stored_admin_ids != inherited_admin_ids:
+            self._update_descendants(
+                (stored_ancestor_ids, stored_admin_ids),
+                (ancestor_ids, inherited_admin_ids),
+                exclude=added_ids,
+            )
+
+    def _update_descendants(self, stored_fields, fields, exclude=()):
+        """Change the `ancestor_ids` and `inherited_admin_ids` of the nodes
+        below this one from ``stored_fields`` to ``fields``, the values this
+        node passes on to its children before and after a save.
+
+        :param tuple stored_fields: Previous `ancestor_ids` and
+            `inherited_admin_ids` of the children
+        :param tuple fields: New `ancestor_ids` and `inherited_admin_ids`
+        :param exclude: Children whose subtrees are already up to date
+        """
+        stored_ancestor_ids, stored_admin_ids = stored_fields
+        ancestor_ids, admin_ids = fields
+        exclude = list(exclude)
+        below = {
+            '_id': {'$nin': exclude},
+            'ancestor_ids': {'$all': [self._id], '$nin': exclude},
+        }
+        collection = Node._storage[0].store
+        descendant_ids = [
+            record['_id'] for record in collection.find(below, {'_id': True})
+        ]
+        if not descendant_ids:
+            return
+        # The ancestors above this node end every descendant's `ancestor_ids`
+        if stored_ancestor_ids != ancestor_ids:
+            if stored_ancestor_ids[1:]:
+                collection.update(
+                    below,
+                    {'$pullAll': {'ancestor_ids': stored_ancestor_ids[1:]}},
+                    multi=True,
+                )
+            if ancestor_ids[1:]:
+                collection.update(
+                    below,
+                    {'$push': {'ancestor_ids': {'$each': ancestor_ids[1:]}}},
+                    multi=True,
+                )
+        added_admin_ids = sorted(set(admin_ids) - set(stored_admin_ids))
+        if added_admin_ids:
+            collection.update(
+                below,
+                {'$addToSet': {'inherited_admin_ids': {'$each': added_admin_ids}}},
+                multi=True,
+            )
+        for user_id in sorted(set(stored_admin_ids) - set(admin_ids)):
+            # Nodes below another node the user administers still inherit
+            # the user's permissions from it
+            keeper_ids = [
+                record['_id'] for record in collection.find(
+                    dict(below, **{'permissions.{0}'.format(user_id): 'admin'}),
+                    {'_id': True},
+                )
+            ]
+            collection.update(
+                {
+                    '_id': {'$nin': exclude},
+                    'ancestor_ids': {'$all': [self._id], '$nin': exclude + keeper_ids},
+                },
+                {'$pull': {'inherited_admin_ids': user_id}},
+                multi=True,
+            )
+        # Loaded descendants reload on next access
+        for descendant_id in descendant_ids:
+            descendant = Node._get_cache(descendant_id)
+            if descendant is not None:
+                descendant._dirty = True
 
-    def next_descendants(self, auth, condition=lambda auth, node: True):
+    def next_descendants(self, auth, condition=lambda auth, node: True, tree=None):
         """
         Recursively find the first set of descedants under a given node that meet a given condition
 
         returns a list of [(node, [children]), ...]
+
+        :param NodeTree tree: Optional preloaded tree containing this node
         """
+        tree = tree or load_node_tree(self)
         ret = []
-        for node in self.nodes:
+        for node in tree.children(self):
             if condition(auth, node):
                 # base case
                 ret.append((node, []))
             else:
-                ret.append((node, node.next_descendants(auth, condition)))
+                ret.append((node, node.next_descendants(auth, condition, tree=tree)))
         ret = [item for item in ret if item[1] or condition(auth, item[0])]  # prune empty branches
         return ret
 
     def get_descendants_recursive(self, include=lambda n: True):
-        for node in self.nodes:
-            if include(node):
-                yield node
-            if node.primary:
-                for descendant in node.get_descendants_recursive(include):
-                    if include(descendant):
-                        yield descendant
+        return load_node_tree(self).descendants(include)
 
     def get_aggregate_logs_queryset(self, auth):
-        ids = [self._id] + [n._id
-                            for n in self.get_descendants_recursive()
-                            if n.can_view(auth)]
-        query = Q('__backrefs.logged.node.logs', 'in', ids)
-        return NodeLog.find(query).sort('-_id')
+        query = self.logs.query()
+        for node in self.get_descendants_recursive():
+            if node.primary and node.can_view(auth):
+                query = query | node.logs.query()
+        return NodeLog.find(query).sort('-date', '-_id')
 
     @property
     def nodes_pointer(self):
@@ -1484,17 +2041,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
         :param int n: Number of logs to retrieve
         """
-        return list(reversed(self.logs)[:n])
-
-    @property
-    def date_modified(self):
-        '''The most recent datetime when this node was modified, based on
-        the logs.
-        '''
-        try:
-            return self.logs[-1].date
-        except IndexError:
-            return self.date_created
+        return self.logs.recent(n)
 
     def set_title(self, title, auth, save=False):
         """Set the title of this Node and log it.
@@ -1554,6 +2101,14 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             logger.exception(e)
             log_exception()
 
+    def update_search_children(self):
+        """Update the search documents of public children, which include
+        this node's title and visibility.
+        """
+        for child in self.nodes_primary:
+            if child.is_public and not child.is_deleted:
+                child.update_search()
+
     def delete_search_entry(self):
         from website import search
         try:
@@ -1627,11 +2182,42 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
         return True
 
-    def fork_node(self, auth, title='Fork of '):
-        """Recursively fork a node.
+    def plan_fork(self, user, tree=None):
+        """Return the nodes forked when ``user`` forks this node: this node
+        first, then its components depth first. Deleted components and
+        components ``user`` cannot read are skipped along with everything
+        below them; pointers are copied rather than forked.
+
+        :param User user: User forking the node
+        :param NodeTree tree: Optional preloaded tree of this node
+        :return list: Nodes to fork, each after its parent
+        """
+        tree = tree or load_node_tree(self)
+        planned = []
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            planned.append(node)
+            pending.extend(reversed([
+                child for child in tree.primary_children(node)
+                if not child.is_deleted and
+                (child.is_public or child.has_permission(user, 'read'))
+            ]))
+        return planned
+
+    def fork_node(self, auth, title='Fork of ', on_forked=None):
+        """Fork a node and the components below it that the user can read.
+
+        The tree is planned from a single load and the forks are inserted in
+        bulk, in one transaction with their logs and back-references. Add-ons
+        are then copied to each fork; if that fails, the forks are marked as
+        deleted.
 
         :param Auth auth: Consolidated authorization
         :param str title: Optional text to prepend to forked title
+        :param on_forked: Optional callable, called with the original and the
+            fork once the add-ons of each node in the tree have been copied,
+            components before the nodes above them
         :return: Forked node
         """
         user = auth.user
@@ -1640,6 +2226,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         if not (self.is_public or self.has_permission(user, 'read')):
             raise PermissionsError('{0!r} does not have permission to fork node {1!r}'.format(user, self._id))
 
+        if self.is_folder:
+            raise NodeStateError('Folders may not be forked.')
+
         when = datetime.datetime.utcnow()
 
         original = self.load(self._primary_key)
@@ -1647,64 +2236,173 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         if original.is_deleted:
             raise NodeStateError('Cannot fork deleted node.')
 
-        # Note: Cloning a node copies its `wiki_pages_current` and
-        # `wiki_pages_versions` fields, but does not clone the underlying
-        # database objects to which these dictionaries refer. This means that
-        # the cloned node must pass itself to its wiki objects to build the
-        # correct URLs to that content.
-        forked = original.clone()
+        tree = load_node_tree(original)
+        originals = original.plan_fork(user, tree=tree)
 
-        forked.logs = self.logs
-        forked.tags = self.tags
+        with TokuTransaction():
+            forks = self._insert_forks(originals, tree, auth, title, when)
 
-        # Recursively fork child nodes
-        for node_contained in original.nodes:
-            if not node_contained.is_deleted:
-                forked_node = None
-                try:  # Catch the potential PermissionsError above
-                    forked_node = node_contained.fork_node(auth=auth, title='')
-                except PermissionsError:
-                    pass  # If this exception is thrown omit the node from the result set
-                if forked_node is not None:
-                    forked.nodes.append(forked_node)
-
-        forked.title = title + forked.title
-        forked.is_fork = True
-        forked.is_registration = False
-        forked.forked_date = when
-        forked.forked_from = original
-        forked.creator = user
-        forked.piwik_site_id = None
-
-        # Forks default to private status
-        forked.is_public = False
-
-        # Clear permissions before adding users
-        forked.permissions = {}
-        forked.visible_contributor_ids = []
-
-        forked.add_contributor(contributor=user, log=False, save=False)
-
-        forked.add_log(
-            action=NodeLog.NODE_FORKED,
-            params={
-                'parent_node': original.parent_id,
-                'node': original._primary_key,
-                'registration': forked._primary_key,
-            },
-            auth=auth,
-            log_date=when,
-            save=False,
+        try:
+            for each, forked in reversed(zip(originals, forks)):
+                # After fork callback
+                for addon in each.get_addons():
+                    _, message = addon.after_fork(each, forked, user)
+                    if message:
+                        status.push_status_message(message)
+                if on_forked is not None:
+                    on_forked(each, forked)
+        except Exception:
+            self._remove_forks(forks)
+            raise
+
+        return forks[0]
+
+    @classmethod
+    def _insert_forks(cls, originals, tree, auth, title, when):
+        """Insert forks of the planned ``originals`` with one bulk insert of
+        nodes and one of logs, and add the back-references that saving each
+        fork would add, grouped by referenced record.
+
+        :return list: The forks, in the order of ``originals``
+        """
+        user = auth.user
+
+        forks = []
+        for original, key in zip(originals, cls.create_guids(len(originals))):
+            # Note: Cloning a node copies its `wiki_pages_current` and
+            # `wiki_pages_versions` fields, but does not clone the underlying
+            # database objects to which these dictionaries refer. This means
+            # that the cloned node must pass itself to its wiki objects to
+            # build the correct URLs to that content.
+            forked = original.clone()
+            forked._id = key
+            forked.tags = original.tags
+            forked.title = (title if not forks else '') + forked.title
+            forked.is_fork = True
+            forked.is_registration = False
+            forked.forked_date = when
+            forked.forked_from = original
+            forked.creator = user
+            forked.piwik_site_id = None
+
+            # Forks default to private status
+            forked.is_public = False
+
+            # Clear permissions before adding users
+            forked.permissions = {}
+            forked.visible_contributor_ids = []
+
+            forked.add_contributor(contributor=user, log=False, save=False)
+            forked.date_modified = when
+
+            # Share the original's history by reference
+            forked.log_sources = original.logs.sources_until(when)
+            forks.append(forked)
+
+        # Link the forks as their originals are linked; pointers are copied
+        fork_of = {original._id: forked for original, forked in zip(originals, forks)}
+        parent_ids = {originals[0]._id: originals[0].parent_id}
+        for original, forked in zip(originals, forks):
+            ancestor_ids, inherited_admin_ids = forked._get_child_tree_fields()
+            pointers = []
+            for child in tree.children(original):
+                if child.primary:
+                    if child._id not in fork_of:
+                        continue
+                    child_fork = fork_of[child._id]
+                    child_fork.ancestor_ids = ancestor_ids
+                    child_fork.inherited_admin_ids = inherited_admin_ids
+                    setattr(child_fork, '_StoredObject__backrefs', {
+                        'parent': {'node': {'nodes': [forked._id]}},
+                    })
+                    parent_ids[child._id] = original._id
+                    forked.nodes.append(child_fork)
+                else:
+                    pointed = child.resolve()
+                    if pointed is None or pointed.is_deleted:
+                        continue
+                    pointer = child.fork_node()
+                    pointers.append(pointer)
+                    forked.nodes.append(pointer)
+            add_backrefs(pointers, 'parent', 'node', 'nodes', [forked._id])
+
+        documents = []
+        for forked in forks:
+            for field_name, field_object in forked._fields.items():
+                if not field_object._is_foreign:
+                    field_object.do_validate(getattr(forked, field_name), forked)
+            documents.append(forked.to_storage())
+        cls._storage[0].store.insert(documents, manipulate=False)
+        for forked, document in zip(forks, documents):
+            forked._is_loaded = True
+            forked._stored_key = forked._primary_key
+            cls._set_cache(forked._primary_key, forked, document)
+
+        logs = [
+            NodeLog(
+                action=NodeLog.NODE_FORKED,
+                user=user,
+                api_key=auth.api_key,
+                params={
+                    'parent_node': parent_ids[original._id],
+                    'node': original._primary_key,
+                    'registration': forked._primary_key,
+                },
+                date=when,
+                node_ids=[forked._id],
+            )
+            for original, forked in zip(originals, forks)
+        ]
+        NodeLog._storage[0].store.insert(
+            [log.to_storage() for log in logs],
+            manipulate=False,
         )
 
-        forked.save()
-        # After fork callback
-        for addon in original.get_addons():
-            _, message = addon.after_fork(original, forked, user)
-            if message:
-                status.push_status_message(message)
+        fork_ids = [forked._id for forked in forks]
+        log_ids = [log._id for log in logs]
+        add_backrefs([user], 'contributed', 'node', 'contributors', fork_ids)
+        add_backrefs([user], 'created', 'node', 'creator', fork_ids)
+        add_backrefs([user], 'created', 'nodelog', 'user', log_ids)
+        if auth.api_key:
+            add_backrefs([auth.api_key], 'created', 'nodelog', 'api_key', log_ids)
+        for original, forked in zip(originals, forks):
+            add_backrefs([original], 'forked', 'node', 'forked_from', [forked._id])
+        tagged = defaultdict(list)
+        for forked in forks:
+            for tag_id in forked.tags._to_primary_keys():
+                tagged[tag_id].append(forked._id)
+        for tag in Tag.load_many(tagged.keys()):
+            add_backrefs([tag], 'tagged', 'node', 'tags', tagged[tag._id])
+
+        counters = get_node_log_counters(original._id for original in originals)
+        fork_counters = {}
+        for original, forked in zip(originals, forks):
+            counts = counters.get(original._id, {'total': 0, 'users': {}})
+            users = dict(counts['users'])
+            users[user._id] = users.get(user._id, 0) + 1
+            fork_counters[forked._id] = {'total': counts['total'] + 1, 'users': users}
+        insert_node_log_counters(fork_counters)
+        increment_user_activity_counters(
+            user._primary_key, NodeLog.NODE_FORKED, when, amount=len(forks),
+        )
 
-        return forked
+        if settings.PIWIK_HOST:
+            for forked in forks:
+                forked._enqueue_piwik_update(forked._fields.keys())
+
+        return forks
+
+    @classmethod
+    def _remove_forks(cls, forks):
+        """Mark the forks of a failed `fork_node` as deleted."""
+        fork_ids = [forked._id for forked in forks]
+        cls._storage[0].store.update(
+            {'_id': {'$in': fork_ids}},
+            {'$set': {'is_deleted': True, 'deleted_date': datetime.datetime.utcnow()}},
+            multi=True,
+        )
+        for fork_id in fork_ids:
+            cls._clear_caches(fork_id)
 
     def register_node(self, schema, auth, template, data, parent=None):
         """Make a frozen copy of a node.
@@ -1715,6 +2413,36 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         :param data: Form data
         :param parent Node: parent registration of regitstration to be created
         """
+        registrations = []
+        registered = self.clone_registration(
+            schema, auth, template, data, registrations=registrations,
+        )
+
+        if parent:
+            registered.parent_node = parent
+
+        for original, registration in registrations:
+            original.run_registration_hooks(registration, auth.user)
+
+        if settings.ENABLE_ARCHIVER:
+            for original, registration in registrations:
+                project_signals.after_create_registration.send(original, dst=registration, user=auth.user)
+
+        return registered
+
+    def clone_registration(self, schema, auth, template, data, registrations=None,
+                           on_registered=None):
+        """Copy a node and its non-deleted children into a registration tree,
+        without running addon hooks or starting the archiver. Each child
+        registration is saved once, and each parent is saved once after all
+        of its children have been copied.
+
+        :param registrations: Optional list, extended with (original,
+            registration) pairs for each registered node, children first
+        :param on_registered: Optional callable, called with the original and
+            the registration as soon as each registration is first saved
+        :return: The registration of this node
+        """
         # NOTE: Admins can register child nodes even if they don't have write access them
         if not self.can_edit(auth=auth) and not self.is_admin_parent(user=auth.user):
             raise PermissionsError(
@@ -1724,6 +2452,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         if self.is_folder:
             raise NodeStateError("Folders may not be registered")
 
+        registrations = registrations if registrations is not None else []
+        raw_template = template
         template = urllib.unquote_plus(template)
         template = to_mongo(template)
 
@@ -1753,36 +2483,43 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         registered.contributors = self.contributors
         registered.forked_from = self.forked_from
         registered.creator = self.creator
-        registered.logs = self.logs
         registered.tags = self.tags
         registered.piwik_site_id = None
 
         registered.save()
-
-        if parent:
-            registered.parent_node = parent
-
-        # After register callback
-        for addon in original.get_addons():
-            _, message = addon.after_register(original, registered, auth.user)
-            if message:
-                status.push_status_message(message)
+        if on_registered is not None:
+            on_registered(original, registered)
+        # Share the original's history by reference; saved with the
+        # registration's children below
+        original.logs.share_with(registered)
 
         for node_contained in original.nodes:
-            if not node_contained.is_deleted:
+            if node_contained.is_deleted:
+                continue
+            if node_contained.primary:
+                child_registration = node_contained.clone_registration(
+                    schema, auth, raw_template, data, registrations=registrations,
+                    on_registered=on_registered,
+                )
+            else:
                 child_registration = node_contained.register_node(
-                    schema, auth, template, data, parent=registered
+                    schema, auth, raw_template, data,
                 )
-                if child_registration and not child_registration.primary:
-                    registered.nodes.append(child_registration)
+            if child_registration:
+                registered.nodes.append(child_registration)
 
         registered.save()
-
-        if settings.ENABLE_ARCHIVER:
-            project_signals.after_create_registration.send(self, dst=registered, user=auth.user)
+        registrations.append((original, registered))
 
         return registered
 
+    def run_registration_hooks(self, registration, user):
+        """Run the `after_register` callbacks of this node's addons."""
+        for addon in self.get_addons():
+            _, message = addon.after_register(self, registration, user)
+            if message:
+                status.push_status_message(message)
+
     def remove_tag(self, tag, auth, save=True):
         if tag in self.tags:
             self.tags.remove(tag)
@@ -1832,8 +2569,14 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         )
         if log_date:
             log.date = log_date
+        if not self._primary_key:
+            # Logs reference their node, so the node must have an id
+            self.save()
+        log.node_ids = [self._id]
         log.save()
-        self.logs.append(log)
+        increment_node_log_counters(self._id, user and user._id)
+        if self.date_modified is None or log.date > self.date_modified:
+            self.date_modified = log.date
         if save:
             self.save()
         if user:
@@ -1909,8 +2652,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         if doi:
             csl['DOI'] = doi
 
-        if self.logs:
-            csl['issued'] = datetime_to_csl(self.logs[-1].date)
+        if self.date_modified:
+            csl['issued'] = datetime_to_csl(self.date_modified)
 
         return csl
 
@@ -1961,10 +2704,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
     @property
     def root(self):
-        if self.parent_node:
-            return self.parent_node.root
-        else:
-            return self
+        parents = self.parents
+        return parents[-1] if parents else self
 
     @property
     def archiving(self):
@@ -2805,7 +3546,7 @@ class PrivateLink(StoredObject):
 
     _id = fields.StringField(primary=True, default=lambda: str(ObjectId()))
     date_created = fields.DateTimeField(auto_now_add=datetime.datetime.utcnow)
-    key = fields.StringField(required=True)
+    key = fields.StringField(required=True, index=True)
     name = fields.StringField()
     is_deleted = fields.BooleanField(default=False)
     anonymous = fields.BooleanField(default=False)
@@ -2818,6 +3559,51 @@ class PrivateLink(StoredObject):
         node_ids = [node._id for node in self.nodes]
         return node_ids
 
+    def save(self, *args, **kwargs):
+        stored = {}
+        if self._is_loaded:
+            stored = self._get_cached_data(self._primary_key)
+            if stored is None:
+                stored = self._storage[0].store.find_one(
+                    {'_id': self._primary_key},
+                    {'key': True, 'nodes': True, 'is_deleted': True},
+                ) or {}
+        ret = super(PrivateLink, self).save(*args, **kwargs)
+        self._update_node_keys(stored)
+        return ret
+
+    def _update_node_keys(self, stored):
+        """Keep `Node.private_link_keys` in sync with this link, given its
+        ``stored`` data as of the previous save: the key is removed from the
+        nodes that no longer have it active and added to the nodes that do,
+        each with a single multi-document update.
+        """
+        stored_ids = [] if stored.get('is_deleted') else stored.get('nodes') or []
+        node_ids = [] if self.is_deleted else self.node_ids
+        if stored.get('key') == self.key:
+            removed_ids = [node_id for node_id in stored_ids if node_id not in node_ids]
+            added_ids = [node_id for node_id in node_ids if node_id not in stored_ids]
+        else:
+            removed_ids, added_ids = stored_ids, node_ids
+        collection = Node._storage[0].store
+        if removed_ids:
+            collection.update(
+                {'_id': {'$in': removed_ids}},
+                {'$pull': {'private_link_keys': stored['key']}},
+                multi=True,
+            )
+        if added_ids:
+            collection.update(
+                {'_id': {'$in': added_ids}},
+                {'$addToSet': {'private_link_keys': self.key}},
+                multi=True,
+            )
+        # Loaded nodes reload on next access
+        for node_id in removed_ids + added_ids:
+            node = Node._get_cache(node_id)
+            if node is not None:
+                node._dirty = True
+
     def node_scale(self, node):
         # node may be None if previous node's parent is deleted
         if node is None or node.parent_id not in self.node_ids:
@@ -2839,6 +3625,108 @@ class PrivateLink(StoredObject):
         }
 
 
+class ForkJob(StoredObject):
+    """Tracks a fork of a project tree running in the background. The nodes
+    to be forked are planned when the job is created, so that progress can be
+    reported while the tree is copied.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCESS = 'success'
+    FAILURE = 'failure'
+
+    _id = fields.StringField(primary=True, default=lambda: str(ObjectId()))
+    status = fields.StringField(default=PENDING)
+    date_created = fields.DateTimeField(auto_now_add=datetime.datetime.utcnow)
+    date_finished = fields.DateTimeField()
+
+    src_node = fields.ForeignField('node')
+    dst_node = fields.ForeignField('node')
+    initiator = fields.ForeignField('user')
+
+    # Primary keys of the nodes that will be forked, and of the nodes forked
+    # so far
+    planned_node_ids = fields.StringField(list=True)
+    forked_node_ids = fields.StringField(list=True)
+
+    error = fields.StringField()
+
+    def __repr__(self):
+        return '<ForkJob(_id={self._id}, status={self.status}, src_node={self.src_node})>'.format(self=self)
+
+    @classmethod
+    def create(cls, node, auth):
+        """Plan a fork of ``node`` and the components `Node.fork_node` will
+        fork along with it. Nodes that cannot be forked are refused here,
+        before a job is queued.
+        """
+        user = auth.user
+        if not (node.is_public or node.has_permission(user, 'read')):
+            raise PermissionsError('{0!r} does not have permission to fork node {1!r}'.format(user, node._id))
+        if node.is_folder:
+            raise NodeStateError('Folders may not be forked.')
+        if node.is_deleted:
+            raise NodeStateError('Cannot fork deleted node.')
+        job = cls(
+            src_node=node,
+            initiator=user,
+            planned_node_ids=[each._id for each in node.plan_fork(user)],
+        )
+        job.save()
+        return job
+
+    @property
+    def done(self):
+        return self.status in (self.SUCCESS, self.FAILURE)
+
+    @property
+    def progress(self):
+        """Fraction of the planned nodes that have been forked."""
+        if not self.planned_node_ids:
+            return 0.0
+        return min(1.0, float(len(self.forked_node_ids)) / len(self.planned_node_ids))
+
+    def record_forked(self, original, fork):
+        self.forked_node_ids.append(fork._id)
+        self.save()
+
+    def run(self):
+        """Fork the source node, recording progress as the add-ons of each
+        node in the tree are copied. If forking fails, `Node.fork_node` marks
+        the forks it inserted as deleted.
+        """
+        self.status = self.RUNNING
+        self.save()
+        try:
+            fork = self.src_node.fork_node(
+                Auth(user=self.initiator),
+                on_forked=self.record_forked,
+            )
+        except Exception as error:
+            logger.exception('Fork job {0} failed'.format(self._id))
+            self.status = self.FAILURE
+            self.error = unicode(error)
+        else:
+            self.dst_node = fork
+            self.status = self.SUCCESS
+        self.date_finished = datetime.datetime.utcnow()
+        self.save()
+        return self.dst_node
+
+    def to_json(self):
+        return {
+            'id': self._id,
+            'status': self.status,
+            'done': self.done,
+            'progress': self.progress,
+            'forked': len(self.forked_node_ids),
+            'total': len(self.planned_node_ids),
+            'fork_url': self.dst_node.url if self.dst_node else None,
+            'error': self.error,
+        }
+
+
 def validate_retraction_state(value):
     acceptable_states = [Retraction.PENDING, Retraction.RETRACTED, Retraction.CANCELLED]
     if value not in acceptable_states:
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+from framework.tasks import app
+from framework.tasks.handlers import queued_task, task_request_context
+
+
+@queued_task
+@app.task(ignore_result=True)
+def fork_node(job_id):
+    """Run the `ForkJob` with primary key ``job_id``. Progress is saved as
+    each node is forked, so the job is not wrapped in a transaction.
+    """
+    # Avoid circular imports
+    from website.archiver.tasks import create_app_context
+    from website.project.model import ForkJob
+    create_app_context()
+    job = ForkJob.load(job_id)
+    # Forking builds URLs and pushes status messages, which need a request
+    with task_request_context():
+        job.run()
+
+
+@queued_task
+@app.task(ignore_result=True)
+def register_node(job_pk):
+    """Run the registration pipeline of the `ArchiveJob` with primary key
+    ``job_pk``. Stage timings are saved as each stage finishes, so the job is
+    not wrapped in a transaction.
+    """
+    # Avoid circular imports
+    from website.archiver import utils as archiver_utils
+    from website.archiver.model import ArchiveJob
+    from website.archiver.tasks import create_app_context
+    create_app_context()
+    job = ArchiveJob.load(job_pk)
+    with task_request_context():
+        archiver_utils.run_registration_pipeline(job)
+
+
+@app.task
+def run_registration_hooks(job_pk, registration_id):
+    """Run the addon registration hooks of one registration of the
+    `ArchiveJob` with primary key ``job_pk``. Dispatched concurrently for the
+    registrations of a job, so each task has its own request context and
+    identity map.
+    """
+    # Avoid circular imports
+    from website.archiver import utils as archiver_utils
+    from website.archiver.model import ArchiveJob
+    from website.archiver.tasks import create_app_context
+    from website.project.model import Node
+    create_app_context()
+    job = ArchiveJob.load(job_pk)
+    with task_request_context():
+        archiver_utils.run_registration_hooks(job, Node.load(registration_id))
+
+
+@app.task(ignore_result=True)
+def finish_registration_hooks(job_pk, start):
+    """Finish the addons stage of the `ArchiveJob` with primary key
+    ``job_pk`` once `run_registration_hooks` has run for each of its
+    registrations, and continue its registration pipeline.
+    """
+    # Avoid circular imports
+    from website.archiver import utils as archiver_utils
+    from website.archiver.model import ArchiveJob
+    from website.archiver.tasks import create_app_context
+    create_app_context()
+    job = ArchiveJob.load(job_pk)
+    with task_request_context():
+        archiver_utils.finish_registration_addon_hooks(job, start)
@@ -10,6 +10,7 @@ from framework.exceptions import HTTPError
 from framework.auth.decorators import must_be_logged_in
 from framework.auth.utils import privacy_info_handle
 from framework.forms.utils import sanitize
+from framework.transactions.handlers import force_auto_transaction
 
 from website import settings
 from website.notifications.emails import notify
@@ -185,6 +186,7 @@ def is_reply(target):
     return isinstance(target, Comment)
 
 
+@force_auto_transaction
 @must_be_contributor_or_public
 def list_comments(auth, node, **kwargs):
     anonymous = has_anonymous_link(node, auth)
@@ -18,7 +18,7 @@ from framework.auth.signals import user_registered
 from framework.auth.core import generate_confirm_token
 from framework.auth.decorators import collect_auth, must_be_logged_in
 from framework.auth.forms import PasswordForm, SetEmailAndPasswordForm
-from framework.transactions.handlers import no_auto_transaction
+from framework.transactions.handlers import no_auto_transaction, force_auto_transaction
 
 from website import mails
 from website import language
@@ -146,10 +146,11 @@ def get_most_in_common_contributors(auth, node, **kwargs):
     except (TypeError, ValueError):
         n_contribs = settings.MAX_MOST_IN_COMMON_LENGTH
 
-    contrib_counts = Counter(contrib_id
-        for node in auth.user.node__contributed
-        for contrib_id in node.contributors._to_primary_keys()
-        if contrib_id not in node_contrib_ids)
+    contrib_counts = Counter({
+        contrib_id: count
+        for contrib_id, count in auth.user.get_cocontributor_counts().items()
+        if contrib_id not in node_contrib_ids
+    })
 
     active_contribs = itertools.ifilter(
         lambda c: User.load(c[0]).is_active,
@@ -161,7 +162,7 @@ def get_most_in_common_contributors(auth, node, **kwargs):
     contrib_objs = [(User.load(_id), count) for _id, count in limited]
 
     contribs = [
-        utils.add_contributor_json(most_contrib, auth.user)
+        utils.add_contributor_json(most_contrib, n_projects_in_common=count)
         for most_contrib, count in sorted(contrib_objs, key=lambda t: (-t[1], t[0].fullname))
     ]
     return {'contributors': contribs}
@@ -188,8 +189,12 @@ def get_recently_added_contributors(auth, node, **kwargs):
     # Limit to max_results
     limited_contribs = itertools.islice(active_contribs, max_results)
 
+    cocontributor_counts = auth.user.get_cocontributor_counts()
     contribs = [
-        utils.add_contributor_json(contrib, auth.user)
+        utils.add_contributor_json(
+            contrib,
+            n_projects_in_common=cocontributor_counts.get(contrib._id, 0),
+        )
         for contrib in limited_contribs
     ]
     return {'contributors': contribs}
@@ -521,6 +526,7 @@ def verify_claim_token(user, token, pid):
     return True
 
 
+@force_auto_transaction
 @collect_auth
 @must_be_valid_project
 def claim_user_registered(auth, node, **kwargs):
@@ -600,6 +606,7 @@ def replace_unclaimed_user_with_registered(user):
             'Successfully claimed contributor.', 'success')
 
 
+@force_auto_transaction
 @collect_auth
 def claim_user_form(auth, **kwargs):
     """View for rendering the set password page for a claimed user.
@@ -68,8 +68,8 @@ def node_key_history(auth, node, **kwargs):
         'logs': [
             {
                 'lid': log._id,
-                'nid': log.node__logged[0]._id,
-                'route': log.node__logged[0].url,
+                'nid': log.logged_node._id,
+                'route': log.logged_node.url,
             }
             for log in api_key.nodelog__created
         ]
@@ -10,7 +10,7 @@ from framework.auth.decorators import collect_auth
 from framework.transactions.handlers import no_auto_transaction
 
 
-from website.views import serialize_log, validate_page_num
+from website.views import serialize_log, prefetch_log_targets, validate_page_num
 from website.project.model import NodeLog
 from website.project.model import has_anonymous_link
 from website.project.decorators import must_be_valid_project
@@ -48,9 +48,10 @@ def _get_logs(node, count, auth, page=0):
 
     start = page * count
     stop = start + count
+    anonymous = has_anonymous_link(node, auth)
     logs = [
-        serialize_log(log, auth=auth, anonymous=has_anonymous_link(node, auth))
-        for log in logs_set[start:stop]
+        serialize_log(log, auth=auth, anonymous=anonymous)
+        for log in prefetch_log_targets(logs_set[start:stop])
     ]
 
     return logs, total, pages
@@ -11,6 +11,7 @@ from modularodm.exceptions import ModularOdmException, ValidationValueError
 from framework import status
 from framework.utils import iso8601format
 from framework.mongo import StoredObject
+from framework.analytics import get_node_log_counts
 from framework.auth.decorators import must_be_logged_in, collect_auth
 from framework.exceptions import HTTPError, PermissionsError
 from framework.mongo.utils import from_mongo, get_or_http_error
@@ -30,9 +31,10 @@ from website.project.decorators import (
 )
 from website.util.permissions import ADMIN, READ, WRITE
 from website.util.rubeus import collect_addon_js
-from website.project.model import has_anonymous_link, get_pointer_parent, NodeUpdateError
+from website.project.model import has_anonymous_link, get_pointer_parent, NodeUpdateError, load_node_tree
 from website.project.forms import NewNodeForm
-from website.models import Node, Pointer, WatchConfig, PrivateLink
+from website.project import tasks as project_tasks
+from website.models import Node, Pointer, WatchConfig, PrivateLink, ForkJob
 from website import settings
 from website.views import _render_nodes, find_dashboard, validate_page_num
 from website.profile import utils
@@ -253,9 +255,54 @@ def node_fork_page(auth, node, **kwargs):
             http.FORBIDDEN,
             redirect_url=node.url
         )
+    except NodeStateError as e:
+        raise HTTPError(http.BAD_REQUEST, data=dict(
+            message_short="Can't fork",
+            message_long=e.message
+        ))
     return fork.url
 
 
+@must_be_logged_in
+@must_be_valid_project
+def node_fork_job_start(auth, node, **kwargs):
+    """Fork the project tree in the background; returns the job, whose
+    progress can be polled with `node_fork_job_status`.
+    """
+    if settings.DISK_SAVING_MODE:
+        raise HTTPError(
+            http.METHOD_NOT_ALLOWED,
+            redirect_url=node.url
+        )
+    try:
+        job = ForkJob.create(node, auth)
+    except PermissionsError:
+        raise HTTPError(
+            http.FORBIDDEN,
+            redirect_url=node.url
+        )
+    except NodeStateError as e:
+        raise HTTPError(http.BAD_REQUEST, data=dict(
+            message_short="Can't fork",
+            message_long=e.message
+        ))
+    project_tasks.fork_node(job._id)
+    ret = job.to_json()
+    ret['status_url'] = node.api_url_for('node_fork_job_status', job_id=job._id)
+    return ret, http.ACCEPTED
+
+
+@must_be_logged_in
+@must_be_valid_project
+def node_fork_job_status(auth, node, job_id, **kwargs):
+    job = ForkJob.load(job_id)
+    if job is None or job.src_node != node:
+        raise HTTPError(http.NOT_FOUND)
+    if job.initiator != auth.user:
+        raise HTTPError(http.FORBIDDEN)
+    return job.to_json()
+
+
 @must_be_valid_project
 @must_be_contributor_or_public
 def node_registrations(auth, node, **kwargs):
@@ -717,7 +764,7 @@ def _view_project(node, auth, primary=False):
             'is_public': node.is_public,
             'is_archiving': node.archiving,
             'date_created': iso8601format(node.date_created),
-            'date_modified': iso8601format(node.logs[-1].date) if node.logs else '',
+            'date_modified': iso8601format(node.date_modified),
             'tags': [tag._primary_key for tag in node.tags],
             'children': bool(node.nodes),
             'is_registration': node.is_registration,
@@ -809,20 +856,21 @@ def _get_badge(user):
     return {}
 
 
-def _get_children(node, auth, indent=0):
+def _get_children(node, auth, indent=0, tree=None):
 
+    tree = tree or load_node_tree(node)
     children = []
 
-    for child in node.nodes_primary:
+    for child in tree.primary_children(node):
         if not child.is_deleted and child.can_edit(auth):
             children.append({
                 'id': child._primary_key,
                 'title': child.title,
                 'indent': indent,
                 'is_public': child.is_public,
-                'parent_id': child.parent_id,
+                'parent_id': node._primary_key,
             })
-            children.extend(_get_children(child, auth, indent + 1))
+            children.extend(_get_children(child, auth, indent + 1, tree=tree))
 
     return children
 
@@ -857,17 +905,10 @@ def get_editable_children(auth, node, **kwargs):
 def _get_user_activity(node, auth, rescale_ratio):
 
     # Counters
-    total_count = len(node.logs)
-
-    # Note: It's typically much faster to find logs of a given node
-    # attached to a given user using node.logs.find(...) than by
-    # loading the logs into Python and checking each one. However,
-    # using deep caching might be even faster down the road.
-
-    if auth.user:
-        ua_count = node.logs.find(Q('user', 'eq', auth.user)).count()
-    else:
-        ua_count = 0
+    total_count, ua_count = get_node_log_counts(
+        node._id,
+        auth.user._id if auth.user else None,
+    )
 
     non_ua_count = total_count - ua_count  # base length of blue bar
 
@@ -881,12 +922,12 @@ def _get_user_activity(node, auth, rescale_ratio):
     except ZeroDivisionError:
         non_ua = 0
 
-    return ua_count, ua, non_ua
+    return total_count, ua_count, ua, non_ua
 
 
 @must_be_valid_project
 def get_recent_logs(node, **kwargs):
-    logs = list(reversed(node.logs._to_primary_keys()))[:3]
+    logs = [log._id for log in node.logs.recent(3)]
     return {'logs': logs}
 
 
@@ -931,9 +972,9 @@ def _get_summary(node, auth, rescale_ratio, primary=True, link_id=None, show_pat
             'show_path': show_path
         })
         if rescale_ratio:
-            ua_count, ua, non_ua = _get_user_activity(node, auth, rescale_ratio)
+            total_count, ua_count, ua, non_ua = _get_user_activity(node, auth, rescale_ratio)
             summary.update({
-                'nlogs': len(node.logs),
+                'nlogs': total_count,
                 'ua_count': ua_count,
                 'ua': ua,
                 'non_ua': non_ua,
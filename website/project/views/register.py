@@ -6,7 +6,7 @@ import itertools
 
 from flask import request
 from modularodm import Q
-from modularodm.exceptions import NoResultsFound, ValidationValueError
+from modularodm.exceptions import NoResultsFound
 
 from framework import status
 from framework.exceptions import HTTPError, PermissionsError
@@ -16,6 +16,7 @@ from framework.status import push_status_message
 from framework.mongo.utils import to_mongo
 from framework.forms.utils import process_payload, unprocess_payload
 from framework.auth.decorators import must_be_signed
+from framework.transactions.handlers import force_auto_transaction
 
 from website.archiver import ARCHIVER_SUCCESS, ARCHIVER_FAILURE
 
@@ -35,13 +36,14 @@ from website.identifiers.model import Identifier
 from website.identifiers.metadata import datacite_metadata_for_node
 from website.project.metadata.schemas import OSF_META_SCHEMAS
 from website.project.utils import serialize_node
-from website.project import utils as project_utils
 from website.util.permissions import ADMIN
-from website.models import MetaSchema, NodeLog
+from website.models import MetaSchema, NodeLog, ArchiveJob
+from website.project import tasks as project_tasks
 from website import language, mails
 from website.project import signals as project_signals
 from website import util
 
+from website.archiver import utils as archiver_utils
 from website.archiver.decorators import fail_archive_on_error
 
 from website.identifiers.client import EzidClient
@@ -164,6 +166,7 @@ def _send_retraction_email(node, user):
             registration_link=registration_link
         )
 
+@force_auto_transaction
 @must_be_valid_project
 @must_have_permission(ADMIN)
 def node_registration_retraction_approve(auth, node, token, **kwargs):
@@ -198,6 +201,7 @@ def node_registration_retraction_approve(auth, node, token, **kwargs):
     status.push_status_message('Your approval has been accepted.')
     return redirect(node.web_url_for('view_project'))
 
+@force_auto_transaction
 @must_be_valid_project
 @must_have_permission(ADMIN)
 @must_be_public_registration
@@ -232,6 +236,7 @@ def node_registration_retraction_disapprove(auth, node, token, **kwargs):
     status.push_status_message('Your disapproval has been accepted and the retraction has been cancelled.')
     return redirect(node.web_url_for('view_project'))
 
+@force_auto_transaction
 @must_be_valid_project
 @must_have_permission(ADMIN)
 def node_registration_embargo_approve(auth, node, token, **kwargs):
@@ -265,6 +270,7 @@ def node_registration_embargo_approve(auth, node, token, **kwargs):
     status.push_status_message('Your approval has been accepted.')
     return redirect(node.web_url_for('view_project'))
 
+@force_auto_transaction
 @must_be_valid_project
 @must_have_permission(ADMIN)
 def node_registration_embargo_disapprove(auth, node, token, **kwargs):
@@ -445,32 +451,39 @@ def node_register_template_page_post(auth, node, **kwargs):
         Q('name', 'eq', template)
     ).sort('-schema_version')[0]
 
-    # Create the registration
-    register = node.register_node(
-        schema, auth, template, json.dumps(clean_data),
-    )
-
+    embargo_end_date = None
     if data.get('registrationChoice', 'immediate') == 'embargo':
         embargo_end_date = parse_date(data['embargoEndDate'], ignoretz=True)
+        if not node._is_embargo_date_valid(embargo_end_date):
+            raise HTTPError(http.BAD_REQUEST, data=dict(
+                message_long='Embargo end date must be more than one day in the future'
+            ))
 
-        # Initiate embargo
-        try:
-            register.embargo_registration(auth.user, embargo_end_date)
-            register.save()
-        except ValidationValueError as err:
-            raise HTTPError(http.BAD_REQUEST, data=dict(message_long=err.message))
-        if settings.ENABLE_ARCHIVER:
-            register.archive_job.meta = {
-                'embargo_urls': {
-                    contrib._id: project_utils.get_embargo_urls(register, contrib)
-                    for contrib in node.active_contributors()
-                }
-            }
-            register.archive_job.save()
-    else:
-        register.set_privacy('public', auth, log=False)
-        for child in register.get_descendants_recursive(lambda n: n.primary):
-            child.set_privacy('public', auth, log=False)
+    # Check up front what the pipeline's snapshot stage checks again, so that
+    # the user gets an error rather than a failure email
+    try:
+        archiver_utils.check_registrable(node, auth.user)
+    except NodeStateError as err:
+        raise HTTPError(http.BAD_REQUEST, data=dict(message_long=err.message))
+    except PermissionsError as err:
+        raise HTTPError(http.FORBIDDEN, data=dict(message_long=err.message))
+
+    # Create the registration in the background; the job records the time
+    # spent in each stage
+    job = ArchiveJob(
+        src_node=node,
+        initiator=auth.user,
+        meta={
+            'registration': {
+                'schema': schema._id,
+                'template': template,
+                'data': json.dumps(clean_data),
+                'embargo_end_date': embargo_end_date,
+            },
+        },
+    )
+    job.save()
+    project_tasks.register_node(job._id)
 
     push_status_message('Files are being copied to the newly created registration, and you will receive an email notification containing a link to the registration when the copying is finished.')
 
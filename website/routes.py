@@ -1208,6 +1208,18 @@ def make_url_map(app):
                 '/project/<pid>/node/<nid>/fork/',
             ], 'post', project_views.node.node_fork_page, json_renderer,
         ),
+        Rule(
+            [
+                '/project/<pid>/fork/job/',
+                '/project/<pid>/node/<nid>/fork/job/',
+            ], 'post', project_views.node.node_fork_job_start, json_renderer,
+        ),
+        Rule(
+            [
+                '/project/<pid>/fork/job/<job_id>/',
+                '/project/<pid>/node/<nid>/fork/job/<job_id>/',
+            ], 'get', project_views.node.node_fork_job_status, json_renderer,
+        ),
         Rule(
             [
                 '/project/<pid>/pointer/fork/',
@@ -3,7 +3,6 @@
 from __future__ import division
 
 import re
-import copy
 import math
 import logging
 import unicodedata
@@ -48,6 +47,11 @@ ENGLISH_ANALYZER_PROPERTY = {'type': 'string', 'analyzer': 'english'}
 
 INDEX = settings.ELASTIC_INDEX
 
+# Number of the current user's most frequent co-contributors boosted in
+# contributor search, and the boost applied to them
+COCONTRIBUTOR_BOOST_LIMIT = 100
+COCONTRIBUTOR_BOOST = 2
+
 try:
     es = Elasticsearch(
         settings.ELASTIC_URI,
@@ -85,45 +89,36 @@ def requires_search(func):
     return wrapped
 
 
-@requires_search
-def get_counts(count_query, clean=True):
-    count_query['aggregations'] = {
-        'counts': {
-            'terms': {
-                'field': '_type',
-            }
-        }
-    }
-
-    res = es.search(index=INDEX, doc_type=None, search_type='count', body=count_query)
+COUNTS_AGGREGATION = {'terms': {'field': '_type'}}
+TAGS_AGGREGATION = {'terms': {'field': 'tags'}}
 
-    counts = {x['key']: x['doc_count'] for x in res['aggregations']['counts']['buckets'] if x['key'] in ALIASES.keys()}
 
+def format_counts(aggregation):
+    counts = {x['key']: x['doc_count'] for x in aggregation['buckets'] if x['key'] in ALIASES.keys()}
     counts['total'] = sum([val for val in counts.values()])
     return counts
 
 
-@requires_search
-def get_tags(query, index):
-    query['aggregations'] = {
-        'tag_cloud': {
-            'terms': {'field': 'tags'}
-        }
-    }
-
-    results = es.search(index=index, doc_type=None, body=query)
-    tags = results['aggregations']['tag_cloud']['buckets']
-
-    return tags
+def add_post_filter(query, post_filter):
+    """Filter the hits of ``query`` with ``post_filter`` without changing
+    what its aggregations are computed over.
+    """
+    existing = query.pop('post_filter', None)
+    if existing is not None:
+        post_filter = {'bool': {'must': [existing, post_filter]}}
+    query['post_filter'] = post_filter
 
 
 @requires_search
-def search(query, index=None, doc_type='_all'):
-    """Search for a query
+def search(query, index=None, doc_type='_all', counts=True, tags=True):
+    """Search for a query. Hits, type counts and tags are fetched with a
+    single request.
 
     :param query: The substring of the username/project name/tag to search for
     :param index:
     :param doc_type:
+    :param bool counts: Count matching documents of each type
+    :param bool tags: Aggregate the tags of matching documents
 
     :return: List of dictionaries, each containing the results, counts, tags and typeAliases
         results: All results returned by the query, that are within the index and search type
@@ -132,27 +127,27 @@ def search(query, index=None, doc_type='_all'):
         typeAliases: the doc_types that exist in the search database
     """
     index = index or INDEX
-    tag_query = copy.deepcopy(query)
-    count_query = copy.deepcopy(query)
-
-    for key in ['from', 'size', 'sort']:
-        try:
-            del tag_query[key]
-            del count_query[key]
-        except KeyError:
-            pass
-
-    tags = get_tags(tag_query, index)
-    counts = get_counts(count_query, index)
+    query = dict(query)
+    aggregations = {}
+    if counts:
+        aggregations['counts'] = COUNTS_AGGREGATION
+    if tags:
+        aggregations['tag_cloud'] = TAGS_AGGREGATION
+    if aggregations:
+        query['aggregations'] = aggregations
+        if doc_type and doc_type != '_all':
+            # Counts and tags cover documents of all types; only the hits
+            # are limited to `doc_type`
+            add_post_filter(query, {'terms': {'_type': doc_type.split(',')}})
+            doc_type = None
 
-    # Run the real query and get the results
     raw_results = es.search(index=index, doc_type=doc_type, body=query)
 
     results = [hit['_source'] for hit in raw_results['hits']['hits']]
     return_value = {
         'results': format_results(results),
-        'counts': counts,
-        'tags': tags,
+        'counts': format_counts(raw_results['aggregations']['counts']) if counts else {},
+        'tags': raw_results['aggregations']['tag_cloud']['buckets'] if tags else [],
         'typeAliases': ALIASES
     }
     return return_value
@@ -164,13 +159,17 @@ def format_results(results):
         if result.get('category') == 'user':
             result['url'] = '/profile/' + result['id']
         elif result.get('category') in {'project', 'component', 'registration'}:
-            result = format_result(result, result.get('parent_id'))
+            if 'parent_info' in result:
+                parent_info = result['parent_info']
+            else:
+                # Documents indexed before parent info was stored on them
+                parent_info = load_parent(result.get('parent_id'))
+            result = format_result(result, parent_info)
         ret.append(result)
     return ret
 
 
-def format_result(result, parent_id=None):
-    parent_info = load_parent(parent_id)
+def format_result(result, parent_info=None):
     formatted_result = {
         'contributors': result['contributors'],
         'wiki_link': result['url'] + 'wiki/',
@@ -197,11 +196,18 @@ def format_result(result, parent_id=None):
 
 
 def load_parent(parent_id):
-    parent = Node.load(parent_id)
+    return serialize_parent(Node.load(parent_id))
+
+
+def serialize_parent(parent):
+    """Build the parent information shown with a component or registration
+    in search results. Stored on the child's document so results can be
+    rendered without loading parents.
+    """
     if parent is None:
         return None
     parent_info = {}
-    if parent is not None and parent.is_public:
+    if parent.is_public:
         parent_info['title'] = parent.title
         parent_info['url'] = parent.url
         parent_info['is_registration'] = parent.is_registration
@@ -226,69 +232,81 @@ def get_doctype_from_node(node):
         return node.category
 
 
-@requires_search
-def update_node(node, index=None):
-    index = index or INDEX
+def serialize_node(node, category):
+    """Build the search document for ``node``, or return `None` if the node
+    should not be in the index.
+    """
     from website.addons.wiki.model import NodeWikiPage
 
-    category = get_doctype_from_node(node)
+    if node.is_deleted or not node.is_public or node.archiving:
+        return None
 
     if category == 'project':
-        elastic_document_id = node._id
         parent_id = None
+        parent_info = None
     else:
-        try:
-            elastic_document_id = node._id
-            parent_id = node.parent_id
-        except IndexError:
-            # Skip orphaned components
-            return
-    if node.is_deleted or not node.is_public or node.archiving:
-        delete_doc(elastic_document_id, node)
-    else:
-        try:
-            normalized_title = six.u(node.title)
-        except TypeError:
-            normalized_title = node.title
-        normalized_title = unicodedata.normalize('NFKD', normalized_title).encode('ascii', 'ignore')
-
-        elastic_document = {
-            'id': elastic_document_id,
-            'contributors': [
-                {
-                    'fullname': x.fullname,
-                    'url': x.profile_url if x.is_active else None
-                }
-                for x in node.visible_contributors
-                if x is not None
-            ],
-            'title': node.title,
-            'normalized_title': normalized_title,
-            'category': category,
-            'public': node.is_public,
-            'tags': [tag._id for tag in node.tags if tag],
-            'description': node.description,
-            'url': node.url,
-            'is_registration': node.is_registration,
-            'is_retracted': node.is_retracted,
-            'pending_retraction': node.pending_retraction,
-            'embargo_end_date': node.embargo_end_date.strftime("%A, %b. %d, %Y") if node.embargo_end_date else False,
-            'pending_embargo': node.pending_embargo,
-            'registered_date': node.registered_date,
-            'wikis': {},
-            'parent_id': parent_id,
-            'date_created': node.date_created,
-            'boost': int(not node.is_registration) + 1,  # This is for making registered projects less relevant
-        }
+        parent_id = node.parent_id
+        parent_info = serialize_parent(node.node__parent[0]) if parent_id else None
+
+    try:
+        normalized_title = six.u(node.title)
+    except TypeError:
+        normalized_title = node.title
+    normalized_title = unicodedata.normalize('NFKD', normalized_title).encode('ascii', 'ignore')
+
+    elastic_document = {
+        'id': node._id,
+        'contributors': [
+            {
+                'fullname': x.fullname,
+                'url': x.profile_url if x.is_active else None
+            }
+            for x in node.visible_contributors
+            if x is not None
+        ],
+        'title': node.title,
+        'normalized_title': normalized_title,
+        'category': category,
+        'public': node.is_public,
+        'tags': [tag._id for tag in node.tags if tag],
+        'description': node.description,
+        'url': node.url,
+        'is_registration': node.is_registration,
+        'is_retracted': node.is_retracted,
+        'pending_retraction': node.pending_retraction,
+        'embargo_end_date': node.embargo_end_date.strftime("%A, %b. %d, %Y") if node.embargo_end_date else False,
+        'pending_embargo': node.pending_embargo,
+        'registered_date': node.registered_date,
+        'wikis': {},
+        'parent_id': parent_id,
+        'parent_info': parent_info,
+        'date_created': node.date_created,
+        'boost': int(not node.is_registration) + 1,  # This is for making registered projects less relevant
+    }
 
-        if not node.is_retracted:
-            for wiki in [
-                NodeWikiPage.load(x)
-                for x in node.wiki_pages_current.values()
-            ]:
-                elastic_document['wikis'][wiki.page_name] = wiki.raw_text(node)
+    if not node.is_retracted:
+        for wiki in [
+            NodeWikiPage.load(x)
+            for x in node.wiki_pages_current.values()
+        ]:
+            elastic_document['wikis'][wiki.page_name] = wiki.raw_text(node)
 
-        es.index(index=index, doc_type=category, id=elastic_document_id, body=elastic_document, refresh=True)
+    return elastic_document
+
+
+@requires_search
+def update_node(node, index=None):
+    index = index or INDEX
+    category = get_doctype_from_node(node)
+    try:
+        elastic_document = serialize_node(node, category)
+    except IndexError:
+        # Skip orphaned components
+        return
+    if elastic_document is None:
+        delete_doc(node._id, node)
+    else:
+        es.index(index=index, doc_type=category, id=node._id, body=elastic_document, refresh=True)
 
 
 def bulk_update_contributors(nodes, index=INDEX):
@@ -319,15 +337,12 @@ def bulk_update_contributors(nodes, index=INDEX):
     return helpers.bulk(es, actions)
 
 
-@requires_search
-def update_user(user, index=None):
-    index = index or INDEX
+def serialize_user(user):
+    """Build the search document for ``user``, or return `None` if the user
+    should not be in the index.
+    """
     if not user.is_active:
-        try:
-            es.delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
-        except NotFoundError:
-            pass
-        return
+        return None
 
     names = dict(
         fullname=user.fullname,
@@ -346,7 +361,7 @@ def update_user(user, index=None):
                 pass  # This is fine, will only happen in 2.x if val is already unicode
             normalized_names[key] = unicodedata.normalize('NFKD', val).encode('ascii', 'ignore')
 
-    user_doc = {
+    return {
         'id': user._id,
         'user': user.fullname,
         'normalized_user': normalized_names['fullname'],
@@ -363,9 +378,93 @@ def update_user(user, index=None):
         'boost': 2,  # TODO(fabianvf): Probably should make this a constant or something
     }
 
+
+@requires_search
+def update_user(user, index=None):
+    index = index or INDEX
+    user_doc = serialize_user(user)
+    if user_doc is None:
+        try:
+            es.delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
+        except NotFoundError:
+            pass
+        return
     es.index(index=index, doc_type='user', body=user_doc, id=user._id, refresh=True)
 
 
+def build_node_action(node, index):
+    """Build the bulk action that writes or removes ``node``'s document, or
+    return `None` for orphaned components.
+    """
+    category = get_doctype_from_node(node)
+    try:
+        elastic_document = serialize_node(node, category)
+    except IndexError:
+        # Skip orphaned components
+        return None
+    if elastic_document is None:
+        return {
+            '_op_type': 'delete',
+            '_index': index,
+            '_type': 'registration' if node.is_registration else node.project_or_component,
+            '_id': node._id,
+        }
+    return {
+        '_op_type': 'index',
+        '_index': index,
+        '_type': category,
+        '_id': node._id,
+        '_source': elastic_document,
+    }
+
+
+def build_user_action(user, index):
+    """Build the bulk action that writes or removes ``user``'s document."""
+    user_doc = serialize_user(user)
+    if user_doc is None:
+        return {
+            '_op_type': 'delete',
+            '_index': index,
+            '_type': 'user',
+            '_id': user._id,
+        }
+    return {
+        '_op_type': 'index',
+        '_index': index,
+        '_type': 'user',
+        '_id': user._id,
+        '_source': user_doc,
+    }
+
+
+@requires_search
+def bulk_update(nodes=None, users=None, index=None):
+    """Index or remove the documents of ``nodes`` and ``users`` with one bulk
+    request. The index is not refreshed; documents become searchable after
+    the index's refresh interval.
+
+    :return set: Ids of the documents that could not be written
+    """
+    index = index or INDEX
+    actions = [build_node_action(node, index) for node in nodes or []]
+    actions.extend(build_user_action(user, index) for user in users or [])
+    actions = [action for action in actions if action is not None]
+    if not actions:
+        return set()
+    _, errors = helpers.bulk(es, actions, raise_on_error=False)
+    failed = set()
+    for error in errors:
+        for op_type, item in error.items():
+            # Removing a document that is not in the index is not an error
+            if op_type == 'delete' and item.get('status') == 404:
+                continue
+            logger.error('Could not {0} search document {1}: {2}'.format(
+                op_type, item.get('_id'), item.get('error')
+            ))
+            failed.add(item.get('_id'))
+    return failed
+
+
 @requires_search
 def delete_all():
     delete_index(INDEX)
@@ -393,6 +492,9 @@ def create_index(index=None):
             analyzers = {field: ENGLISH_ANALYZER_PROPERTY
                          for field in analyzed_fields}
             mapping['properties'].update(analyzers)
+            # Parent info is only displayed; don't match children on their
+            # parent's title
+            mapping['properties']['parent_info'] = {'type': 'object', 'enabled': False}
 
         if type_ == 'user':
             fields = {
@@ -455,20 +557,37 @@ def search_contributor(query, page=0, size=10, exclude=None, current_user=None):
     query = "  AND ".join('{}*~'.format(re.escape(item)) for item in items) + \
             "".join(' NOT id:"{}"'.format(excluded._id) for excluded in exclude)
 
-    results = search(build_query(query, start=start, size=size), index=INDEX, doc_type='user')
+    cocontributor_counts = current_user.get_cocontributor_counts() if current_user else {}
+    query = build_query(query, start=start, size=size)
+    if cocontributor_counts:
+        # Rank users who share projects with the current user higher
+        cocontributor_ids = sorted(
+            cocontributor_counts, key=cocontributor_counts.get, reverse=True
+        )[:COCONTRIBUTOR_BOOST_LIMIT]
+        query['query'] = {
+            'bool': {
+                'must': query['query'],
+                'should': {
+                    'terms': {'id': cocontributor_ids, 'boost': COCONTRIBUTOR_BOOST},
+                },
+            },
+        }
+
+    results = search(query, index=INDEX, doc_type='user', tags=False)
     docs = results['results']
     pages = math.ceil(results['counts'].get('user', 0) / size)
     validate_page_num(page, pages)
 
     users = []
+    users_by_id = {
+        user._id: user
+        for user in User.load_many(doc['id'] for doc in docs)
+    }
     for doc in docs:
         # TODO: use utils.serialize_user
-        user = User.load(doc['id'])
+        user = users_by_id.get(doc['id'])
 
-        if current_user:
-            n_projects_in_common = current_user.n_projects_in_common(user)
-        else:
-            n_projects_in_common = 0
+        n_projects_in_common = cocontributor_counts.get(doc['id'], 0)
 
         if user is None:
             logger.error('Could not load user {0}'.format(doc['id']))
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""Queue of nodes and users whose search documents need to be rewritten.
+`enqueue` records that a document changed and, at most once every
+`SEARCH_INDEX_INTERVAL` per process, schedules the
+`website.search.tasks.index_queued` task to run at the end of the interval.
+Within a request, the task is sent when the request is torn down, after its
+transaction has ended. The task writes the queued documents with bulk
+requests. A document queued several times before the queue is drained is
+written once, from the record's current state. Each drain claims the entries
+it writes a batch at a time, so concurrent drains do not write the same
+documents. Documents that cannot be written stay in the queue and are
+retried by the next drain, up to `SEARCH_INDEX_MAX_ATTEMPTS` times.
+"""
+
+import time
+import logging
+import datetime
+import threading
+
+from flask import has_request_context
+
+from framework.mongo import database, ObjectId
+from framework.tasks import handlers as task_handlers
+
+from website import settings
+
+
+logger = logging.getLogger(__name__)
+
+NODE = 'node'
+USER = 'user'
+
+_schedule_lock = threading.Lock()
+# Time at which this process last scheduled a drain
+_last_scheduled = None
+
+
+def get_queue(db=None):
+    db = db or database
+    return db['searchindexqueue']
+
+
+def is_enabled():
+    """Whether search documents are queued rather than written during the
+    request.
+    """
+    return settings.SEARCH_INDEX_ASYNC and settings.USE_CELERY
+
+
+def _get_key(doc_type, doc_id):
+    return '{0}:{1}'.format(doc_type, doc_id)
+
+
+def enqueue(doc_type, doc_id, db=None):
+    """Queue the search document of the node or user with id ``doc_id``.
+
+    :param str doc_type: `NODE` or `USER`
+    :param str doc_id: Primary key of the record
+    """
+    get_queue(db).update(
+        {'_id': _get_key(doc_type, doc_id)},
+        {
+            '$set': {
+                'doc_type': doc_type,
+                'doc_id': doc_id,
+                'attempts': 0,
+                'claim': None,
+                'claimed_until': None,
+            },
+            # Changes made while the document is being written bump the
+            # version, so that the entry is kept for the next drain
+            '$inc': {'version': 1},
+            '$setOnInsert': {'date_queued': datetime.datetime.utcnow()},
+        },
+        upsert=True,
+    )
+    schedule_drain()
+
+
+def schedule_drain(force=False):
+    """Schedule `index_queued` to run at the end of the current interval,
+    unless this process already scheduled it in the interval.
+
+    :param bool force: Schedule even if a drain was scheduled recently
+    """
+    global _last_scheduled
+    interval = settings.SEARCH_INDEX_INTERVAL.total_seconds()
+    now = time.time()
+    with _schedule_lock:
+        if not force and _last_scheduled is not None and now - _last_scheduled < interval:
+            return False
+        _last_scheduled = now
+    # Avoid circular imports
+    from website.search import tasks
+    signature = tasks.index_queued.si().set(countdown=interval)
+    if has_request_context():
+        task_handlers.enqueue_task(signature)
+    else:
+        signature.apply_async()
+    return True
+
+
+def _load(entries):
+    # Avoid circular imports
+    from website.models import Node, User
+    ids = {NODE: [], USER: []}
+    for entry in entries:
+        ids[entry['doc_type']].append(entry['doc_id'])
+    return Node.load_many(ids[NODE]), User.load_many(ids[USER])
+
+
+def index_queued(batch_size=None, db=None):
+    """Write the documents in the queue, ``batch_size`` documents per bulk
+    request, and remove them from the queue.
+
+    :return int: Number of documents that could not be written
+    """
+    # Avoid circular imports
+    from website.search import search
+    from website.search.exceptions import SearchUnavailableError
+    queue = get_queue(db)
+    batch_size = batch_size or settings.SEARCH_INDEX_BATCH_SIZE
+    # Entries that fail keep this drain's claim, so that it does not retry
+    # them
+    claim = str(ObjectId())
+    failed_count = 0
+    while True:
+        entries = _claim_batch(queue, claim, batch_size)
+        if not entries:
+            break
+        nodes, users = _load(entries)
+        try:
+            failed = search.bulk_update(nodes=nodes, users=users) or set()
+        except SearchUnavailableError:
+            logger.exception('Could not write queued search documents')
+            failed = set(entry['doc_id'] for entry in entries)
+        for entry in entries:
+            if entry['doc_id'] in failed:
+                _record_failure(queue, entry)
+                failed_count += 1
+            else:
+                queue.remove({'_id': entry['_id'], 'version': entry['version']})
+    return failed_count
+
+
+def _claim_batch(queue, claim, batch_size):
+    """Claim up to ``batch_size`` of the oldest queued entries that are not
+    claimed by another drain and were not tried by this one, and return them.
+    """
+    now = datetime.datetime.utcnow()
+    claimable = {
+        'attempts': {'$lt': settings.SEARCH_INDEX_MAX_ATTEMPTS},
+        'claim': {'$ne': claim},
+        '$or': [
+            {'claimed_until': None},
+            {'claimed_until': {'$lt': now}},
+        ],
+    }
+    ids = [
+        entry['_id']
+        for entry in queue.find(claimable, fields=['_id']).sort('date_queued', 1).limit(batch_size)
+    ]
+    if not ids:
+        return []
+    # Entries claimed by another drain since the query above are skipped
+    queue.update(
+        dict(claimable, _id={'$in': ids}),
+        {'$set': {
+            'claim': claim,
+            'claimed_until': now + settings.SEARCH_INDEX_CLAIM_TIMEOUT,
+        }},
+        multi=True,
+    )
+    return list(
+        queue.find({'_id': {'$in': ids}, 'claim': claim}).sort('date_queued', 1)
+    )
+
+
+def _record_failure(queue, entry):
+    queue.update(
+        {'_id': entry['_id'], 'version': entry['version']},
+        {'$inc': {'attempts': 1}, '$set': {'claimed_until': None}},
+    )
+    if entry['attempts'] + 1 >= settings.SEARCH_INDEX_MAX_ATTEMPTS:
+        logger.error('Giving up on search document {0} after {1} attempts'.format(
+            entry['_id'], entry['attempts'] + 1
+        ))
+
+
+def queue_stats(db=None):
+    """Return the number of documents waiting to be written, the number that
+    failed too many times to be retried, and the age in seconds of the oldest
+    waiting document.
+    """
+    queue = get_queue(db)
+    pending = {'attempts': {'$lt': settings.SEARCH_INDEX_MAX_ATTEMPTS}}
+    oldest = list(queue.find(pending).sort('date_queued', 1).limit(1))
+    lag = 0
+    if oldest:
+        lag = (datetime.datetime.utcnow() - oldest[0]['date_queued']).total_seconds()
+    return {
+        'depth': queue.find(pending).count(),
+        'failed': queue.find({
+            'attempts': {'$gte': settings.SEARCH_INDEX_MAX_ATTEMPTS},
+        }).count(),
+        'lag': lag,
+    }
@@ -1,7 +1,7 @@
 import logging
 
 from website import settings
-from website.search import share_search
+from website.search import indexer, share_search
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +26,9 @@ def search(query, index=None, doc_type=None):
 
 @requires_search
 def update_node(node, index=None):
+    if indexer.is_enabled() and index is None:
+        indexer.enqueue(indexer.NODE, node._id)
+        return
     index = index or settings.ELASTIC_INDEX
     search_engine.update_node(node, index=index)
 
@@ -43,10 +46,19 @@ def update_contributors(nodes):
 
 @requires_search
 def update_user(user, index=None):
+    if indexer.is_enabled() and index is None:
+        indexer.enqueue(indexer.USER, user._id)
+        return
     index = index or settings.ELASTIC_INDEX
     search_engine.update_user(user, index=index)
 
 
+@requires_search
+def bulk_update(nodes=None, users=None, index=None):
+    index = index or settings.ELASTIC_INDEX
+    return search_engine.bulk_update(nodes=nodes, users=users, index=index)
+
+
 @requires_search
 def delete_all():
     search_engine.delete_all()
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from framework.tasks import app
+
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(bind=True, max_retries=5, default_retry_delay=60, ignore_result=True)
+def index_queued(self):
+    """Write queued search documents; retry later if any failed. Scheduled by
+    `website.search.indexer.enqueue`; when called directly, failed documents
+    are left for the next drain.
+    """
+    from website.search import indexer
+    failed = indexer.index_queued()
+    stats = indexer.queue_stats()
+    logger.info('Search index queue: {0!r}'.format(stats))
+    if failed and not self.request.called_directly:
+        raise self.retry()
+    if stats['depth']:
+        # Documents queued by transactions that committed after this drain
+        # read the queue
+        indexer.schedule_drain(force=True)
@@ -1,66 +1,200 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-'''Migration script for Search-enabled Models.'''
+'''Migration script for Search-enabled Models.
+
+Builds a new versioned index and points the index alias at it. Documents are
+built in a process pool from batches of ids and written with bulk requests,
+with refresh disabled until loading finishes. Progress is saved after each
+batch, so an interrupted migration resumes into the same new index.
+'''
 from __future__ import absolute_import
 
+import time
 import logging
+import datetime
+import multiprocessing
 
 from elasticsearch import helpers
-from modularodm.query.querydialect import DefaultQueryDialect as Q
 
 from website import settings
 from framework.auth import User
+from framework.mongo import database
 from website.models import Node
 from website.app import init_app
 import website.search.search as search
 from scripts import utils as script_utils
+from website.search import elastic_search
 from website.search.elastic_search import es
 
 
 logger = logging.getLogger(__name__)
 
-def migrate_nodes(index):
-    logger.info("Migrating nodes to index: {}".format(index))
-    n_iter = 0
-    nodes = Node.find(Q('is_public', 'eq', True) & Q('is_deleted', 'eq', False))
-    for node in nodes:
-        search.update_node(node, index=index)
-        n_iter += 1
-
-    logger.info('Nodes migrated: {}'.format(n_iter))
-
-
-def migrate_users(index):
-    logger.info("Migrating users to index: {}".format(index))
+BATCH_SIZE = 1000
+
+# Elasticsearch's refresh interval for indices that do not set one
+DEFAULT_REFRESH_INTERVAL = '1s'
+
+NODE = 'node'
+USER = 'user'
+
+# Documents to migrate: model and raw query for each type
+SOURCES = (
+    (NODE, Node, {'is_public': True, 'is_deleted': False}),
+    (USER, User, {}),
+)
+
+
+def get_checkpoints(db=None):
+    db = db or database
+    return db['searchmigration']
+
+
+def load_checkpoint(index):
+    """Return the saved progress of an unfinished migration of ``index`` whose
+    new index still exists, or `None`.
+    """
+    checkpoint = get_checkpoints().find_one({'_id': index})
+    if checkpoint and es.indices.exists(index=checkpoint['index']):
+        return checkpoint
+    return None
+
+
+def save_checkpoint(index, new_index, refresh_interval):
+    checkpoint = {
+        '_id': index,
+        'index': new_index,
+        'refresh_interval': refresh_interval,
+        'date_started': datetime.datetime.utcnow(),
+    }
+    get_checkpoints().save(checkpoint)
+    return checkpoint
+
+
+def iter_id_batches(model, query, after=None, batch_size=BATCH_SIZE):
+    """Yield lists of the primary keys of ``model`` records matching the raw
+    ``query``, in order, starting after the key ``after``.
+    """
+    collection = model._storage[0].store
+    while True:
+        spec = query
+        if after is not None:
+            spec = {'$and': [query, {'_id': {'$gt': after}}]}
+        ids = [
+            record['_id']
+            for record in collection.find(spec, fields=['_id']).sort('_id', 1).limit(batch_size)
+        ]
+        if not ids:
+            return
+        yield ids
+        after = ids[-1]
+
+
+def build_actions(args):
+    """Build the bulk index actions for a batch of records. Records that
+    should not be searchable are skipped, since the new index has no
+    documents to remove.
+
+    :param tuple args: Document type, primary keys and index name
+    :return tuple: Last primary key of the batch and the actions
+    """
+    doc_type, ids, index = args
+    if doc_type == NODE:
+        actions = [elastic_search.build_node_action(node, index) for node in Node.load_many(ids)]
+    else:
+        actions = [elastic_search.build_user_action(user, index) for user in User.load_many(ids)]
+    return ids[-1], [
+        action for action in actions
+        if action is not None and action['_op_type'] == 'index'
+    ]
+
+
+def get_refresh_interval(index):
+    index_settings = es.indices.get_settings(index=index)[index]['settings']
+    return index_settings.get('index', {}).get('refresh_interval', DEFAULT_REFRESH_INTERVAL)
+
+
+def _init_worker():
+    # Avoid circular imports
+    from flask import g
+    from framework.flask import app
+    from framework.mongo import handlers as mongo_handlers
+    # Serializing nodes builds URLs, which needs a request context
+    app.test_request_context().push()
+    # Connect to MongoDB from the worker rather than sharing the sockets of
+    # the client inherited from the parent process
+    g._mongo_client = mongo_handlers.get_mongo_client()
+
+
+def migrate_documents(doc_type, model, query, index, checkpoint, pool=None):
+    logger.info('Migrating {0}s to index: {1}'.format(doc_type, index))
+    batches = (
+        (doc_type, ids, index)
+        for ids in iter_id_batches(model, query, after=checkpoint.get(doc_type))
+    )
+    results = pool.imap(build_actions, batches) if pool else (build_actions(batch) for batch in batches)
     n_migr = 0
-    n_iter = 0
-    for user in User.find():
-        if user.is_active:
-            search.update_user(user, index=index)
-            n_migr += 1
-        n_iter += 1
-
-    logger.info('Users iterated: {0}\nUsers migrated: {1}'.format(n_iter, n_migr))
-
-
-def migrate(delete, index=None, app=None):
+    start = time.time()
+    for last_id, actions in results:
+        if actions:
+            helpers.bulk(es, actions)
+        n_migr += len(actions)
+        checkpoint[doc_type] = last_id
+        get_checkpoints().update({'_id': checkpoint['_id']}, {'$set': {doc_type: last_id}})
+        elapsed = time.time() - start
+        logger.info('{0} {1}s migrated ({2:.1f} documents/sec)'.format(
+            n_migr, doc_type, n_migr / elapsed if elapsed else 0
+        ))
+    logger.info('{0}s migrated: {1}'.format(doc_type.capitalize(), n_migr))
+
+
+def migrate(delete, index=None, app=None, processes=1):
+    """Rebuild ``index`` in a new versioned index and point the alias at it.
+
+    :param bool delete: Delete the previous version of the index
+    :param str index: Alias of the index to rebuild
+    :param int processes: Number of processes building documents; with 1,
+        documents are built in this process
+    """
     index = index or settings.ELASTIC_INDEX
     app = app or init_app("website.settings", set_backends=True, routes=True)
 
     script_utils.add_file_logger(logger, __file__)
     ctx = app.test_request_context()
     ctx.push()
-    new_index = set_up_index(index)
-
-    migrate_nodes(new_index)
-    migrate_users(new_index)
+    try:
+        new_index = migrate_index(index, processes)
+        if delete:
+            delete_old(new_index)
+    finally:
+        ctx.pop()
+
+
+def migrate_index(index, processes):
+    checkpoint = load_checkpoint(index)
+    if checkpoint:
+        new_index = checkpoint['index']
+        logger.info('Resuming migration to {}'.format(new_index))
+    else:
+        new_index = set_up_index(index)
+        checkpoint = save_checkpoint(index, new_index, get_refresh_interval(new_index))
+
+    # Refreshing while loading slows down indexing; refresh once at the end
+    es.indices.put_settings(index=new_index, body={'index': {'refresh_interval': '-1'}})
+    pool = multiprocessing.Pool(processes, initializer=_init_worker) if processes > 1 else None
+    try:
+        for doc_type, model, query in SOURCES:
+            migrate_documents(doc_type, model, query, new_index, checkpoint, pool=pool)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    refresh_interval = checkpoint.get('refresh_interval', DEFAULT_REFRESH_INTERVAL)
+    es.indices.put_settings(index=new_index, body={'index': {'refresh_interval': refresh_interval}})
+    es.indices.refresh(index=new_index)
 
     set_up_alias(index, new_index)
-
-    if delete:
-        delete_old(new_index)
-
-    ctx.pop()
+    get_checkpoints().remove({'_id': index})
+    return new_index
 
 
 def set_up_index(idx):
@@ -106,4 +240,4 @@ def delete_old(index):
 
 
 if __name__ == '__main__':
-    migrate(False)
+    migrate(False, processes=multiprocessing.cpu_count())
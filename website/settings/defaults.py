@@ -64,6 +64,20 @@ SEARCH_ENGINE = 'elastic'  # Can be 'elastic', or None
 ELASTIC_URI = 'localhost:9200'
 ELASTIC_TIMEOUT = 10
 ELASTIC_INDEX = 'website'
+# Queue search documents and write them in bulk from a Celery task instead
+# of writing each document during the request. Ignored if USE_CELERY is
+# False.
+SEARCH_INDEX_ASYNC = True
+# Number of queued documents written per bulk request
+SEARCH_INDEX_BATCH_SIZE = 500
+# Number of times a queued document is written before giving up
+SEARCH_INDEX_MAX_ATTEMPTS = 5
+# Each process schedules at most one task per interval to write queued
+# documents
+SEARCH_INDEX_INTERVAL = timedelta(seconds=10)
+# Time after which a queued document claimed by a task that did not finish
+# writing it can be claimed by another task
+SEARCH_INDEX_CLAIM_TIMEOUT = timedelta(minutes=5)
 SHARE_ELASTIC_URI = ELASTIC_URI
 SHARE_ELASTIC_INDEX = 'share'
 # For old indices
@@ -125,6 +139,62 @@ DB_NAME = 'osf20130903'
 DB_USER = None
 DB_PASS = None
 
+# Share one MongoDB client (and its connection pool) between all requests
+# handled by a worker process. Set to False to create and close a new client
+# for every request.
+DB_POOLED_CLIENT = True
+DB_MAX_POOL_SIZE = 100
+# Only supported by pymongo >= 2.6; ignored if None
+DB_WAIT_QUEUE_TIMEOUT_MS = None
+DB_WAIT_QUEUE_MULTIPLE = None
+
+# Record queries per collection for each request; the summary is sent as a
+# response header in debug mode and logged otherwise
+ENABLE_QUERY_PROFILER = True
+# Flag collections loaded one key at a time at least this many times per
+# request as likely N+1 query patterns
+QUERY_PROFILER_N_PLUS_ONE_THRESHOLD = 10
+
+# Don't wrap GET, HEAD, and OPTIONS requests in TokuMX transactions; views
+# that write on safe methods must use `force_auto_transaction`
+SKIP_SAFE_METHOD_TRANSACTIONS = True
+
+# Re-run views whose transaction fails to commit because of a lock conflict,
+# up to this many attempts in total, with jittered exponential backoff (in
+# seconds)
+TRANSACTION_RETRY_ATTEMPTS = 3
+TRANSACTION_RETRY_BACKOFF = 0.05
+TRANSACTION_RETRY_MAX_BACKOFF = 1.0
+
+# Unchanged sessions are saved at most this often, to keep `date_modified`
+# current for `scripts/clear_sessions.py`
+SESSION_REFRESH_INTERVAL = timedelta(minutes=10)
+
+# Session backend: 'mongo', 'lru' (per-process cache in front of the
+# database), or 'ttl' (expire sessions with a TTL index); see
+# framework.sessions.stores
+SESSION_STORE = 'mongo'
+SESSION_CACHE_SIZE = 10000
+# Cached sessions are dropped after this long; every hit is also checked
+# against the database, so removed and changed sessions are never served
+SESSION_CACHE_MAX_AGE = timedelta(seconds=60)
+SESSION_TTL = timedelta(days=30)
+
+# The Bloom filters used to track unique page visits per session are sized
+# to hold this many pages at this false positive rate (about 600 bytes each);
+# a filter that fills up is cleared
+ANALYTICS_VISITED_FILTER_CAPACITY = 500
+ANALYTICS_VISITED_FILTER_ERROR_RATE = 0.01
+
+# Sum page counter increments in memory and write them in batches from a
+# background thread, every this many seconds or as soon as the buffer holds
+# this many pages
+ANALYTICS_BUFFER_PAGE_COUNTERS = True
+ANALYTICS_BUFFER_MAX_PAGES = 500
+ANALYTICS_BUFFER_FLUSH_INTERVAL = 10
+# Write batches from a Celery task instead of the web process
+ANALYTICS_FLUSH_WITH_CELERY = False
+
 # Cache settings
 SESSION_HISTORY_LENGTH = 5
 SESSION_HISTORY_IGNORE_RULES = [
@@ -187,6 +257,7 @@ CELERY_IMPORTS = (
     'framework.tasks.signals',
     'framework.email.tasks',
     'framework.analytics.tasks',
+    'website.search.tasks',
     'website.mailchimp_utils',
     'scripts.send_digest'
 )
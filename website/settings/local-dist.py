@@ -11,6 +11,8 @@ DEV_MODE = True
 DEBUG_MODE = True  # Sets app to debug mode, turns off template caching, etc.
 
 SEARCH_ENGINE = 'elastic'
+# Write search documents during the request so they can be searched right away
+SEARCH_INDEX_ASYNC = False
 ELASTIC_TIMEOUT = 10
 
 # Comment out to use SHARE in development
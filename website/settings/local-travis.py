@@ -13,6 +13,8 @@ DEV_MODE = True
 DEBUG_MODE = True  # Sets app to debug mode, turns off template caching, etc.
 
 SEARCH_ENGINE = 'elastic'
+# Write search documents during the request so they can be searched right away
+SEARCH_INDEX_ASYNC = False
 
 USE_EMAIL = False
 USE_CELERY = False
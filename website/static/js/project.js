@@ -36,19 +36,39 @@ NodeActions.forkNode = function() {
     NodeActions.beforeForkNode(ctx.node.urls.api + 'fork/before/', function() {
         // Block page
         $osf.block();
+        var forkFailed = function() {
+            $osf.unblock();
+            $osf.growl('Error:', 'Forking failed');
+            Raven.captureMessage('Error occurred during forking');
+        };
+        // Poll the fork job until the whole tree has been forked
+        var pollForkJob = function(statusUrl) {
+            $.getJSON(statusUrl).done(function(job) {
+                if (job.status === 'success') {
+                    window.location = job.fork_url;
+                } else if (job.status === 'failure') {
+                    forkFailed();
+                } else {
+                    setTimeout(function() { pollForkJob(statusUrl); }, 1000);
+                }
+            }).fail(forkFailed);
+        };
         // Fork node
         $osf.postJSON(
-            ctx.node.urls.api + 'fork/',
+            ctx.node.urls.api + 'fork/job/',
             {}
         ).done(function(response) {
-            window.location = response;
+            if (response.fork_url) {
+                window.location = response.fork_url;
+            } else {
+                pollForkJob(response.status_url);
+            }
         }).fail(function(response) {
-            $osf.unblock();
             if (response.status === 403) {
+                $osf.unblock();
                 $osf.growl('Sorry:', 'you do not have permission to fork this project');
             } else {
-                $osf.growl('Error:', 'Forking failed');
-                Raven.captureMessage('Error occurred during forking');
+                forkFailed();
             }
         });
     });
@@ -167,8 +167,13 @@ class NodeProjectCollector(object):
         self.just_one_level = just_one_level
 
     def _collect_components(self, node, visited):
+        # Avoid circular imports
+        from website.project.model import load_node_tree
         rv = []
-        for child in reversed(node.nodes):  # (child.resolve()._id not in visited or node.is_folder) and
+        # Load the children and the nodes they point to with a fixed number
+        # of queries
+        children = load_node_tree(node, recursive=False).children(node)
+        for child in reversed(children):  # (child.resolve()._id not in visited or node.is_folder) and
             if child is not None and not child.is_deleted and child.resolve().can_view(auth=self.auth) and node.can_view(self.auth):
                 # visited.append(child.resolve()._id)
                 rv.append(self._serialize_node(child, visited=None, parent_is_folder=node.is_folder))
@@ -417,6 +422,16 @@ class NodeFileCollector(object):
         self.extra = kwargs
         self.can_view = node.can_view(auth)
         self.can_edit = node.can_edit(auth) and not node.is_registration
+        self._tree = None
+
+    @property
+    def tree(self):
+        """The node's components and pointers, loaded on first use."""
+        if self._tree is None:
+            # Avoid circular imports
+            from website.project.model import load_node_tree
+            self._tree = load_node_tree(self.node)
+        return self._tree
 
     def to_hgrid(self):
         """Return the Rubeus.JS representation of the node's file data, including
@@ -427,7 +442,7 @@ class NodeFileCollector(object):
 
     def _collect_components(self, node, visited):
         rv = []
-        for child in node.nodes:
+        for child in self.tree.children(node):
             if child.resolve()._id not in visited and not child.is_deleted and node.can_view(self.auth):
                 visited.append(child.resolve()._id)
                 rv.append(self._serialize_node(child, visited=visited))
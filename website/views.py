@@ -11,6 +11,8 @@ from framework import utils
 from framework import sentry
 from framework.auth.core import User
 from framework.flask import redirect  # VOL-aware redirect
+from framework.mongo import prefetch
+from framework.analytics import get_node_log_counters
 from framework.routing import proxy_url
 from framework.exceptions import HTTPError
 from framework.auth.forms import SignInForm
@@ -21,6 +23,7 @@ from framework.auth.forms import ResetPasswordForm
 from framework.auth.forms import ForgotPasswordForm
 from framework.auth.decorators import collect_auth
 from framework.auth.decorators import must_be_logged_in
+from framework.transactions.handlers import force_auto_transaction, safe_request_transaction
 
 from website.models import Guid
 from website.models import Node
@@ -45,13 +48,13 @@ def _rescale_ratio(auth, nodes):
     """
     if not nodes:
         return 0
-    counts = [
-        len(node.logs)
+    counters = get_node_log_counters(
+        node._id
         for node in nodes
         if node.can_view(auth)
-    ]
-    if counts:
-        return float(max(counts))
+    )
+    if counters:
+        return float(max(counter['total'] for counter in counters.values()))
     return 0.0
 
 
@@ -115,13 +118,16 @@ def find_dashboard(user):
     )
 
     if dashboard_folder.count() == 0:
-        new_dashboard(user)
+        # Also reached from project pages, which do not force a transaction
+        with safe_request_transaction():
+            new_dashboard(user)
         dashboard_folder = user.node__contributed.find(
             Q('is_dashboard', 'eq', True)
         )
     return dashboard_folder[0]
 
 
+@force_auto_transaction
 @must_be_logged_in
 def get_dashboard(auth, nid=None, **kwargs):
     user = auth.user
@@ -198,7 +204,7 @@ def get_dashboard_nodes(auth):
         Q('is_deleted', 'eq', False) &
         Q('is_registration', 'eq', False) &
         Q('is_folder', 'eq', False)
-    )
+    ).sort('-date_modified')
 
     if request.args.get('no_components') not in [True, 'true', 'True', '1', 1]:
         comps = contributed.find(
@@ -208,7 +214,7 @@ def get_dashboard_nodes(auth):
             Q('is_deleted', 'eq', False) &
             # exclude registrations
             Q('is_registration', 'eq', False)
-        )
+        ).sort('-date_modified')
     else:
         comps = []
 
@@ -226,6 +232,7 @@ def get_dashboard_nodes(auth):
     return _render_nodes(response_nodes, auth)
 
 
+@force_auto_transaction
 @must_be_logged_in
 def dashboard(auth):
     user = auth.user
@@ -271,7 +278,7 @@ def watched_logs_get(**kwargs):
 
     total = sum(1 for x in user.get_recent_log_ids())
     paginated_logs, pages = paginate(user.get_recent_log_ids(), total, page, size)
-    logs = (model.NodeLog.load(id) for id in paginated_logs)
+    logs = prefetch_log_targets(model.NodeLog.load_many(paginated_logs))
 
     return {
         "logs": [serialize_log(log) for log in logs],
@@ -281,6 +288,22 @@ def watched_logs_get(**kwargs):
     }
 
 
+def prefetch_log_targets(logs):
+    """Load the users and nodes referenced by ``logs`` in bulk, so that
+    serializing the logs does not load them one at a time.
+
+    :return list: The logs, as a list
+    """
+    logs = prefetch(logs, 'user')
+    Node.load_many(set(
+        log.params.get('node') or log.params.get('project') for log in logs
+    ) - {None})
+    User.load_many(set(itertools.chain.from_iterable(
+        log.params.get('contributors', []) for log in logs
+    )))
+    return logs
+
+
 def serialize_log(node_log, auth=None, anonymous=False):
     '''Return a dictionary representation of the log.'''
     return {